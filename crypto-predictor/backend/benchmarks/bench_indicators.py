@@ -0,0 +1,39 @@
+"""
+Compares the NumPy indicator kernel against the per-indicator pandas_ta path,
+and the full kernel against the subset the chart reads.
+
+Run from the backend directory:
+    python -m benchmarks.bench_indicators
+"""
+import timeit
+
+import pandas as pd
+
+from services.indicators import IndicatorService
+from services.ohlcv_encoding import CHART_COLUMNS
+from tests.candles import make_candles
+
+SIZES = [100, 1_000, 100_000]
+
+
+def best_of(func, df: pd.DataFrame) -> float:
+    timer = timeit.Timer(lambda: func(df))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main():
+    print(f"{'rows':>8} {'pandas_ta (ms)':>16} {'kernel (ms)':>12} {'speedup':>8} {'chart only (ms)':>16}")
+    for n in SIZES:
+        df = make_candles(n)
+        try:
+            reference = best_of(IndicatorService.compute_all_pandas_ta, df)
+        except ImportError:
+            reference = float('nan')
+        kernel = best_of(IndicatorService.compute_all, df)
+        chart = best_of(lambda d: IndicatorService.compute(d, CHART_COLUMNS), df)
+        print(f"{n:>8} {reference * 1e3:>16.2f} {kernel * 1e3:>12.2f} {reference / kernel:>7.1f}x {chart * 1e3:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
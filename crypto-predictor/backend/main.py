@@ -1,11 +1,56 @@
-from fastapi import FastAPI
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 try:
-    from .routers import market, prediction, trading
+    from .routers import market, prediction, trading, system, stream
+    from .services.coingecko import CoinGeckoService
+    from .services.upstream_scheduler import UpstreamRateLimited
+    from .services.compute_executor import ComputeSaturated, compute_executor
+    from .services.stream_hub import stream_hub
+    from .services.prefetch_scheduler import prefetch_scheduler
+    from .services.scalper_coordinator import scalper_coordinator
+    from .services.shared_cache import shared_store
+    from .services.exchange_service import exchange_pool
+    from .services.http_caching import CompressionMiddleware
 except ImportError:
-    from routers import market, prediction, trading
+    from routers import market, prediction, trading, system, stream
+    from services.coingecko import CoinGeckoService
+    from services.upstream_scheduler import UpstreamRateLimited
+    from services.compute_executor import ComputeSaturated, compute_executor
+    from services.stream_hub import stream_hub
+    from services.prefetch_scheduler import prefetch_scheduler
+    from services.scalper_coordinator import scalper_coordinator
+    from services.shared_cache import shared_store
+    from services.exchange_service import exchange_pool
+    from services.http_caching import CompressionMiddleware
 
-app = FastAPI(title="Crypto Price Prediction API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream client for the whole application lifetime
+    await CoinGeckoService.startup()
+    # Deletes expired shared cache files
+    shared_store.start()
+    # Keeps the most requested windows and their predictions warm
+    prefetch_scheduler.start()
+    # Authenticated exchange clients are reused until idle
+    exchange_pool.start()
+    # With several workers, one of them runs the scalper
+    await scalper_coordinator.start()
+    yield
+    await scalper_coordinator.stop()
+    await exchange_pool.close()
+    await prefetch_scheduler.stop()
+    await stream_hub.close()
+    await CoinGeckoService.shutdown()
+    await shared_store.close()
+    compute_executor.shutdown()
+
+app = FastAPI(title="Crypto Price Prediction API", lifespan=lifespan)
+
+# brotli/gzip for larger bodies; 304s and small JSON go out as they are
+app.add_middleware(CompressionMiddleware)
 
 # Enable CORS for local development
 app.add_middleware(
@@ -16,9 +61,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(UpstreamRateLimited)
+@app.exception_handler(ComputeSaturated)
+async def upstream_rate_limited(request: Request, exc: UpstreamRateLimited):
+    # Upstream throttling and a full compute queue are temporary: tell clients when to come back instead of a 500
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
 app.include_router(market.router, prefix="/api")
 app.include_router(prediction.router, prefix="/api")
 app.include_router(trading.router, prefix="/api")
+app.include_router(system.router, prefix="/api")
+app.include_router(stream.router, prefix="/api")
 
 @app.get("/")
 async def root():
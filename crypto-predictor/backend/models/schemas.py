@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Union
+from typing import Any, List, Dict, Optional, Union
 
 class OHLCVData(BaseModel):
     time: int
@@ -32,6 +32,10 @@ class MarketOverviewResponse(BaseModel):
     atl: float
     circulating_supply: float
 
+class MarketOverviewBatchResponse(BaseModel):
+    overviews: Dict[str, MarketOverviewResponse]
+    errors: Dict[str, str] = {}
+
 class SignalDetail(BaseModel):
     indicator: str
     value: float
@@ -53,6 +57,34 @@ class PredictionResponse(BaseModel):
     signals: List[SignalDetail]
     summary: str
 
+class BatchPredictionResponse(BaseModel):
+    predictions: Dict[str, PredictionResponse]
+    errors: Dict[str, str] = {}
+
+class BacktestSignalStats(BaseModel):
+    signal: str
+    count: int
+    hit_rate: Optional[float] = None
+    avg_return: Optional[float] = None
+
+class BacktestResult(BaseModel):
+    bars: int
+    evaluated_bars: int
+    horizon_bars: int
+    directional_calls: int
+    hit_rate: Optional[float] = None
+    range_coverage: Optional[float] = None
+    total_return: float
+    buy_and_hold_return: float
+    max_drawdown: float
+    trades: int
+    signals: List[BacktestSignalStats]
+
+class BacktestResponse(BaseModel):
+    days: int
+    results: Dict[str, BacktestResult]
+    errors: Dict[str, str] = {}
+
 class ExchangeConfig(BaseModel):
     exchange_id: str
     api_key: str
@@ -66,6 +98,27 @@ class TradeSignal(BaseModel):
     side: str # "buy" | "sell"
     price: float
     reason: str
+    seq: Optional[int] = None # Position in the scalper's history, for paging with `since`
+
+class ScalperLogEvent(BaseModel):
+    seq: int
+    time: int # ms
+    level: str # "info" | "warning" | "error"
+    event: str # e.g. "tick", "signal", "started"
+    fields: Dict[str, Any] = {}
+    message: str
+
+class ScalperSessionStatus(BaseModel):
+    session_id: str # "<exchange_id>:<symbol>"
+    exchange_id: str
+    symbol: str
+    last_candle: Optional[int] = None
+    last_price: Optional[float] = None
+    candles_processed: int = 0
+    forming: Optional[Dict[str, Any]] = None # Streamed candle still forming: time, close, signal if it closed now
+    recent_trades: List[TradeSignal] = []
+    logs: List[str] = []
+    events: List[ScalperLogEvent] = []
 
 class ScalperStatus(BaseModel):
     is_running: bool
@@ -73,3 +126,11 @@ class ScalperStatus(BaseModel):
     symbol: Optional[str] = None
     balance: Optional[float] = None
     recent_trades: List[TradeSignal] = []
+    logs: List[str] = []
+    events: List[ScalperLogEvent] = []
+    sessions: List[ScalperSessionStatus] = []
+    cursor: int = 0 # Pass as `since` to get only newer trades and logs
+
+class ScalperSessionsRequest(BaseModel):
+    exchange: ExchangeConfig
+    symbols: List[str]
@@ -1,55 +1,170 @@
+import time
 import pandas as pd
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 try:
-    from ..services.coingecko import CoinGeckoService
-    from ..services.indicators import IndicatorService
-    from ..models.schemas import MarketOHLCVResponse, MarketOverviewResponse, OHLCVData
+    from ..services.coingecko import CoinGeckoService, CoinNotFound
+    from ..services.upstream_scheduler import UpstreamRateLimited
+    from ..services.compute_executor import ComputeSaturated, compute_executor
+    from ..services.incremental_indicators import IncrementalIndicatorService
+    from ..services.ohlcv_encoding import CHART_COLUMNS, JSON_MEDIA_TYPE, OHLCVEncoder
+    from ..services.prefetch_scheduler import prefetch_scheduler
+    from ..services.derived_cache import derived_cache, frame_fingerprint
+    from ..services.indicator_kernel import INDICATOR_PARAMS
+    from ..services.http_caching import etag_matches, make_etag, not_modified, versioned
+    from ..services.downsampling import MAX_POINTS_LIMIT, Downsampler
+    from ..models.schemas import MarketOHLCVResponse, MarketOverviewBatchResponse, MarketOverviewResponse, OHLCVData
 except ImportError:
-    from services.coingecko import CoinGeckoService
-    from services.indicators import IndicatorService
-    from models.schemas import MarketOHLCVResponse, MarketOverviewResponse, OHLCVData
-from typing import List
+    from services.coingecko import CoinGeckoService, CoinNotFound
+    from services.upstream_scheduler import UpstreamRateLimited
+    from services.compute_executor import ComputeSaturated, compute_executor
+    from services.incremental_indicators import IncrementalIndicatorService
+    from services.ohlcv_encoding import CHART_COLUMNS, JSON_MEDIA_TYPE, OHLCVEncoder
+    from services.prefetch_scheduler import prefetch_scheduler
+    from services.derived_cache import derived_cache, frame_fingerprint
+    from services.indicator_kernel import INDICATOR_PARAMS
+    from services.http_caching import etag_matches, make_etag, not_modified, versioned
+    from services.downsampling import MAX_POINTS_LIMIT, Downsampler
+    from models.schemas import MarketOHLCVResponse, MarketOverviewBatchResponse, MarketOverviewResponse, OHLCVData
+from typing import List, Optional, Tuple
 
 router = APIRouter(prefix="/market", tags=["market"])
 
+# Coins per /overview/batch request: four /coins/markets pages at most
+MAX_OVERVIEW_COINS = 1000
+
+def _build_rows(df: pd.DataFrame) -> List[OHLCVData]:
+    prices = []
+    for _, row in df.iterrows():
+        prices.append(OHLCVData(
+            time=int(row['time']),
+            open=float(row['open']),
+            high=float(row['high']),
+            low=float(row['low']),
+            close=float(row['close']),
+            volume=float(row['volume']),
+            rsi=float(row['RSI']) if 'RSI' in row and not pd.isna(row['RSI']) else None,
+            macd=float(row['MACD_12_26_9']) if 'MACD_12_26_9' in row and not pd.isna(row['MACD_12_26_9']) else None,
+            macd_signal=float(row['MACDs_12_26_9']) if 'MACDs_12_26_9' in row and not pd.isna(row['MACDs_12_26_9']) else None,
+            macd_hist=float(row['MACDh_12_26_9']) if 'MACDh_12_26_9' in row and not pd.isna(row['MACDh_12_26_9']) else None,
+            bb_upper=float(row['BBU_20_2.0']) if 'BBU_20_2.0' in row and not pd.isna(row['BBU_20_2.0']) else None,
+            bb_lower=float(row['BBL_20_2.0']) if 'BBL_20_2.0' in row and not pd.isna(row['BBL_20_2.0']) else None,
+            bb_middle=float(row['BBM_20_2.0']) if 'BBM_20_2.0' in row and not pd.isna(row['BBM_20_2.0']) else None
+        ))
+    return prices
+
 @router.get("/ohlcv", response_model=MarketOHLCVResponse)
 async def get_ohlcv(
+    response: Response,
     coin_id: str = Query(..., description="Coin ID (e.g., bitcoin)"),
     days: int = Query(30, description="Number of days (7|14|30|90)"),
-    vs_currency: str = Query("usd", description="Currency (e.g., usd)")
+    vs_currency: str = Query("usd", description="Currency (e.g., usd)"),
+    format: str = Query("rows", pattern="^(rows|columnar)$", description="Response layout (rows|columnar)"),
+    start: Optional[int] = Query(None, description="First candle time (ms); widens `days` to reach back to it (up to 365)"),
+    end: Optional[int] = Query(None, description="Last candle time (ms)"),
+    max_points: Optional[int] = Query(None, ge=2, le=MAX_POINTS_LIMIT, description="Downsample to at most this many points"),
+    downsample: str = Query("ohlc", pattern="^(ohlc|lttb)$", description="Merge candles (ohlc) or keep the rows that shape the close line (lttb)"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
 ):
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if start is not None:
+        days = Downsampler.days_for(start, days, int(time.time() * 1000))
+    prefetch_scheduler.record(coin_id, days, vs_currency)
     try:
-        df = await CoinGeckoService.get_ohlcv(coin_id, days, vs_currency)
-        # Compute indicators for the chart
-        df = IndicatorService.compute_all(df)
-
-        prices = []
-        for _, row in df.iterrows():
-            prices.append(OHLCVData(
-                time=int(row['time']),
-                open=float(row['open']),
-                high=float(row['high']),
-                low=float(row['low']),
-                close=float(row['close']),
-                volume=float(row['volume']),
-                rsi=float(row['RSI']) if 'RSI' in row and not pd.isna(row['RSI']) else None,
-                macd=float(row['MACD_12_26_9']) if 'MACD_12_26_9' in row and not pd.isna(row['MACD_12_26_9']) else None,
-                macd_signal=float(row['MACDs_12_26_9']) if 'MACDs_12_26_9' in row and not pd.isna(row['MACDs_12_26_9']) else None,
-                macd_hist=float(row['MACDh_12_26_9']) if 'MACDh_12_26_9' in row and not pd.isna(row['MACDh_12_26_9']) else None,
-                bb_upper=float(row['BBU_20_2.0']) if 'BBU_20_2.0' in row and not pd.isna(row['BBU_20_2.0']) else None,
-                bb_lower=float(row['BBL_20_2.0']) if 'BBL_20_2.0' in row and not pd.isna(row['BBL_20_2.0']) else None,
-                bb_middle=float(row['BBM_20_2.0']) if 'BBM_20_2.0' in row and not pd.isna(row['BBM_20_2.0']) else None
-            ))
-        return MarketOHLCVResponse(symbol=coin_id.upper(), prices=prices)
+        candles = await CoinGeckoService.get_ohlcv(coin_id, days, vs_currency)
+        source = (coin_id, vs_currency, days)
+        fingerprint = frame_fingerprint(candles)
+        symbol = coin_id.upper()
+        # The part of the window shipped, and at what resolution
+        view = (start, end, max_points, downsample if max_points else None)
+
+        # Arrow / MessagePack (via Accept) are always columnar
+        media_type = OHLCVEncoder.media_type_for(accept)
+        columnar = format == "columnar" or media_type != JSON_MEDIA_TYPE
+        # Unchanged candles: 304 before any indicator or serialization work
+        etag = make_etag("ohlcv", source, fingerprint, INDICATOR_PARAMS, columnar, media_type, view)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, vary="Accept")
+
+        # Indicators and serialized output are reused until the candles change;
+        # on a miss only new or updated candles are folded into the indicators.
+        # Indicators see the full-resolution window, before it is cut down to the view.
+        # All of it runs on the compute executor, off the event loop.
+        async def chart_frame() -> pd.DataFrame:
+            frame = await IncrementalIndicatorService.compute_async(source, candles, fingerprint, CHART_COLUMNS)
+            if view == (None, None, None, None):
+                return frame
+            return await compute_executor.run(Downsampler.view, frame, start, end, max_points, downsample)
+
+        async def encode() -> Tuple[bytes, str]:
+            return await compute_executor.run(OHLCVEncoder.encode, symbol, await chart_frame(), media_type)
+
+        async def build_rows() -> List[OHLCVData]:
+            return await compute_executor.run(_build_rows, await chart_frame())
+
+        if columnar:
+            body, media_type = await derived_cache.get_or_compute_async(
+                "ohlcv_body", source, fingerprint, encode, (INDICATOR_PARAMS, media_type, view)
+            )
+            return versioned(Response(content=body, media_type=media_type, headers={"Vary": "Accept"}), etag)
+
+        prices = await derived_cache.get_or_compute_async(
+            "ohlcv_rows", source, fingerprint, build_rows, (INDICATOR_PARAMS, view)
+        )
+        versioned(response, etag)
+        response.headers["Vary"] = "Accept"
+        return MarketOHLCVResponse(symbol=symbol, prices=prices)
+    except (UpstreamRateLimited, ComputeSaturated):
+        # Mapped to 503 + Retry-After by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/overview", response_model=MarketOverviewResponse)
 async def get_overview(
-    coin_id: str = Query(..., description="Coin ID (e.g., bitcoin)")
+    response: Response,
+    coin_id: str = Query(..., description="Coin ID (e.g., bitcoin)"),
+    if_none_match: Optional[str] = Header(None)
 ):
     try:
         data = await CoinGeckoService.get_market_overview(coin_id)
+        etag = make_etag("overview", coin_id, data)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        versioned(response, etag)
         return MarketOverviewResponse(**data)
+    except CoinNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown coin: {coin_id}")
+    except UpstreamRateLimited:
+        # Mapped to 503 + Retry-After by the app-level handler
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/overview/batch", response_model=MarketOverviewBatchResponse)
+async def get_overview_batch(
+    response: Response,
+    coin_ids: Optional[str] = Query(None, description="Comma-separated coin IDs or symbols; all tracked coins when omitted"),
+    if_none_match: Optional[str] = Header(None)
+):
+    ids = None
+    if coin_ids is not None:
+        ids = list(dict.fromkeys(c.strip() for c in coin_ids.split(",") if c.strip()))
+        if not ids:
+            raise HTTPException(status_code=400, detail="No coin IDs provided")
+        if len(ids) > MAX_OVERVIEW_COINS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_OVERVIEW_COINS} coins per request")
+    try:
+        overviews = await CoinGeckoService.get_market_overviews(ids)
+    except UpstreamRateLimited:
+        # Mapped to 503 + Retry-After by the app-level handler
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    errors = {c: "Unknown coin" for c in ids or () if c not in overviews}
+    etag = make_etag("overviews", overviews, errors)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    versioned(response, etag)
+    return MarketOverviewBatchResponse(overviews=overviews, errors=errors)
@@ -1,26 +1,163 @@
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import pandas as pd
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 try:
     from ..services.coingecko import CoinGeckoService
-    from ..services.prediction_engine import PredictionEngine
-    from ..models.schemas import PredictionResponse
+    from ..services.upstream_scheduler import Priority, UpstreamRateLimited, upstream_priority
+    from ..services.compute_executor import ComputeSaturated, compute_executor
+    from ..services.signal_service import SignalService
+    from ..services.prefetch_scheduler import prefetch_scheduler
+    from ..services.prediction_engine import PredictionEngine, compiled_rules
+    from ..services.derived_cache import derived_cache, frame_fingerprint
+    from ..services.backtest import BacktestService
+    from ..services.candle_resampler import TIMEFRAME_GRANULARITY, TIMEFRAME_HISTORY_DAYS, CandleResampler
+    from ..services.http_caching import etag_matches, make_etag, not_modified, versioned
+    from ..models.schemas import PredictionResponse, BatchPredictionResponse, BacktestResponse
 except ImportError:
     from services.coingecko import CoinGeckoService
-    from services.prediction_engine import PredictionEngine
-    from models.schemas import PredictionResponse
+    from services.upstream_scheduler import Priority, UpstreamRateLimited, upstream_priority
+    from services.compute_executor import ComputeSaturated, compute_executor
+    from services.signal_service import SignalService
+    from services.prefetch_scheduler import prefetch_scheduler
+    from services.prediction_engine import PredictionEngine, compiled_rules
+    from services.derived_cache import derived_cache, frame_fingerprint
+    from services.backtest import BacktestService
+    from services.candle_resampler import TIMEFRAME_GRANULARITY, TIMEFRAME_HISTORY_DAYS, CandleResampler
+    from services.http_caching import etag_matches, make_etag, not_modified, versioned
+    from models.schemas import PredictionResponse, BatchPredictionResponse, BacktestResponse
+from typing import Dict, List, Optional, Tuple
 
 router = APIRouter(prefix="/prediction", tags=["prediction"])
 
+# Upper bound on coins per batch request and on concurrent upstream fetches
+MAX_BATCH_COINS = 250
+BATCH_FETCH_CONCURRENCY = 8
+# Longest history a backtest replays
+MAX_BACKTEST_DAYS = 365
+
 @router.get("/signals", response_model=PredictionResponse)
 async def get_signals(
+    response: Response,
     coin_id: str = Query(..., description="Coin ID (e.g., bitcoin)"),
-    timeframe: str = Query("1d", description="Timeframe (1d|4h|1h)")
+    timeframe: str = Query("1d", pattern="^(1d|4h|1h)$", description="Timeframe (1d|4h|1h)"),
+    if_none_match: Optional[str] = Header(None)
 ):
+    # Keeps the base series the timeframe is rolled up from warm
+    prefetch_scheduler.record(coin_id, TIMEFRAME_HISTORY_DAYS[timeframe], timeframe=timeframe)
     try:
-        # We use 'days' to get enough data for indicators
-        # For 1d prediction, 90 days of history is good
-        days = 90
-        df = await CoinGeckoService.get_ohlcv(coin_id, days)
-        prediction = PredictionEngine.calculate_signals(df)
+        candles = await SignalService.get_candles(coin_id, timeframe=timeframe)
+        # Same candles and rules, same prediction: 304 without scoring or serializing
+        etag = make_etag("prediction", candles[1], *SignalService.version(candles))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        prediction = await SignalService.predict(candles, timeframe)
+        versioned(response, etag)
         return PredictionResponse(**prediction)
+    except (UpstreamRateLimited, ComputeSaturated):
+        # Mapped to 503 + Retry-After by the app-level handler
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _parse_coin_ids(coin_ids: str) -> List[str]:
+    ids = list(dict.fromkeys(c.strip() for c in coin_ids.split(",") if c.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No coin IDs provided")
+    if len(ids) > MAX_BATCH_COINS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_COINS} coins per request")
+    return ids
+
+async def _fetch_histories(ids: List[str], days: int,
+                           granularity: Optional[str] = None) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """Fetches OHLCV for many coins with bounded concurrency, collecting per-coin errors."""
+    semaphore = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+
+    async def fetch(coin_id: str):
+        async with semaphore:
+            return await CoinGeckoService.get_ohlcv(coin_id, days, granularity=granularity)
+
+    # Batch work queues behind interactive requests for the upstream rate limit
+    with upstream_priority(Priority.BATCH):
+        fetched = await asyncio.gather(*(fetch(c) for c in ids), return_exceptions=True)
+
+    frames = {}
+    errors = {}
+    for coin_id, result in zip(ids, fetched):
+        if isinstance(result, Exception):
+            errors[coin_id] = str(result)
+        else:
+            frames[coin_id] = result
+
+    # Nothing came back because upstream throttled us: surface it as 503 + Retry-After
+    limited = [r for r in fetched if isinstance(r, UpstreamRateLimited)]
+    if limited and len(limited) == len(fetched):
+        raise limited[0]
+    return frames, errors
+
+@router.get("/signals/batch", response_model=BatchPredictionResponse)
+async def get_signals_batch(
+    coin_ids: str = Query(..., description="Comma-separated coin IDs (e.g., bitcoin,ethereum)"),
+    timeframe: str = Query("1d", pattern="^(1d|4h|1h)$", description="Timeframe (1d|4h|1h)")
+):
+    ids = _parse_coin_ids(coin_ids)
+    days = TIMEFRAME_HISTORY_DAYS[timeframe]
+    bases, errors = await _fetch_histories(ids, days, TIMEFRAME_GRANULARITY[timeframe])
+    frames = {c: CandleResampler.rollup((c, "usd", days), df, timeframe) for c, df in bases.items()}
+
+    # Coins whose candles are unchanged since the last request are served from the cache
+    predictions = {}
+    fingerprints = {c: frame_fingerprint(df) for c, df in frames.items()}
+    for coin_id, fingerprint in fingerprints.items():
+        cached = derived_cache.get("prediction", (coin_id, "usd", timeframe), fingerprint, compiled_rules.fingerprint)
+        if cached is not None:
+            predictions[coin_id] = cached
+    misses = {c: df for c, df in frames.items() if c not in predictions}
+
+    try:
+        computed = await compute_executor.run(PredictionEngine.calculate_signals_batch, misses) if misses else {}
+    except ComputeSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    for coin_id, prediction in computed.items():
+        prediction["horizon"] = timeframe
+        derived_cache.put("prediction", (coin_id, "usd", timeframe), fingerprints[coin_id], prediction, compiled_rules.fingerprint)
+    predictions.update(computed)
+
+    for coin_id in frames:
+        if coin_id not in predictions:
+            errors[coin_id] = "Empty DataFrame provided to prediction engine"
+
+    ordered = {c: predictions[c] for c in ids if c in predictions}
+    return BatchPredictionResponse(predictions=ordered, errors=errors)
+
+@router.get("/backtest", response_model=BacktestResponse)
+async def get_backtest(
+    coin_ids: str = Query(..., description="Comma-separated coin IDs (e.g., bitcoin,ethereum)"),
+    days: int = Query(365, ge=1, le=MAX_BACKTEST_DAYS, description="Days of history to replay (e.g., 90|180|365)"),
+    fee: float = Query(0.0, ge=0, description="Fee charged per unit of position change (e.g., 0.001)")
+):
+    ids = _parse_coin_ids(coin_ids)
+    frames, errors = await _fetch_histories(ids, days)
+
+    # Coins are replayed in parallel, one per compute worker, so a long list doesn't fill the queue
+    semaphore = asyncio.Semaphore(compute_executor.workers)
+
+    async def backtest(coin_id: str, df: pd.DataFrame):
+        async with semaphore:
+            return await derived_cache.get_or_compute_async(
+                "backtest", (coin_id, "usd", days), frame_fingerprint(df),
+                lambda: compute_executor.run(BacktestService.run, df, fee=fee), (compiled_rules.fingerprint, fee)
+            )
+
+    outcomes = await asyncio.gather(*(backtest(c, df) for c, df in frames.items()), return_exceptions=True)
+    results = {}
+    for coin_id, outcome in zip(frames, outcomes):
+        if isinstance(outcome, ComputeSaturated):
+            raise outcome
+        if isinstance(outcome, Exception):
+            errors[coin_id] = str(outcome)
+        else:
+            results[coin_id] = outcome
+
+    return BacktestResponse(days=days, results=results, errors=errors)
@@ -0,0 +1,55 @@
+import asyncio
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+try:
+    from ..services.stream_hub import SUBSCRIBER_QUEUE_SIZE, stream_hub
+except ImportError:
+    from services.stream_hub import SUBSCRIBER_QUEUE_SIZE, stream_hub
+
+router = APIRouter(tags=["stream"])
+
+MAX_TOPICS_PER_CONNECTION = 20
+
+async def _forward(queue: asyncio.Queue, websocket: WebSocket):
+    while True:
+        await websocket.send_text(await queue.get())
+
+@router.websocket("/stream")
+async def stream(websocket: WebSocket):
+    """
+    Push channel for candles, indicators, predictions and overview.
+
+    Client messages: {"action": "subscribe" | "unsubscribe", "coin_id": "bitcoin", "days": 30}
+    Server messages: {"type": "snapshot" | "delta" | "error", "topic": {...}, ...}
+    """
+    await websocket.accept()
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    topics = set()
+    sender = asyncio.ensure_future(_forward(queue, websocket))
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                action = message["action"]
+                topic = (str(message["coin_id"]), int(message.get("days", 30)))
+                if action not in ("subscribe", "unsubscribe") or topic[1] <= 0:
+                    raise ValueError
+            except (ValueError, KeyError, TypeError):
+                await queue.put(json.dumps({"type": "error", "detail": "Expected {action, coin_id, days}"}))
+                continue
+
+            if action == "subscribe" and topic not in topics:
+                if len(topics) >= MAX_TOPICS_PER_CONNECTION:
+                    await queue.put(json.dumps({"type": "error", "detail": f"At most {MAX_TOPICS_PER_CONNECTION} topics per connection"}))
+                    continue
+                topics.add(topic)
+                stream_hub.subscribe(topic, queue)
+            elif action == "unsubscribe" and topic in topics:
+                topics.discard(topic)
+                stream_hub.unsubscribe(topic, queue)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for topic in topics:
+            stream_hub.unsubscribe(topic, queue)
+        sender.cancel()
@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+try:
+    from ..services.coingecko import CoinGeckoService
+    from ..services.stream_hub import stream_hub
+    from ..services.prefetch_scheduler import prefetch_scheduler
+    from ..services.derived_cache import derived_cache
+    from ..services.scalper_coordinator import scalper_coordinator
+    from ..services.compute_executor import compute_executor
+    from ..services.exchange_service import exchange_pool
+except ImportError:
+    from services.coingecko import CoinGeckoService
+    from services.stream_hub import stream_hub
+    from services.prefetch_scheduler import prefetch_scheduler
+    from services.derived_cache import derived_cache
+    from services.scalper_coordinator import scalper_coordinator
+    from services.compute_executor import compute_executor
+    from services.exchange_service import exchange_pool
+
+router = APIRouter(prefix="/system", tags=["system"])
+
+@router.get("/stats")
+async def get_stats():
+    """Runtime counters for caches and upstream traffic."""
+    return {
+        "coingecko_cache": CoinGeckoService.cache_stats(),
+        "coingecko_upstream": CoinGeckoService.upstream_stats(),
+        "derived_cache": derived_cache.stats(),
+        "stream": stream_hub.stats(),
+        "prefetch": prefetch_scheduler.stats(),
+        "scalper": scalper_coordinator.stats(),
+        "compute": compute_executor.stats(),
+        "exchange_clients": exchange_pool.stats(),
+    }
@@ -1,40 +1,83 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import ccxt.async_support as ccxt
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
 try:
-    from ..models.schemas import ExchangeConfig, ScalperStatus
-    from ..services.exchange_service import ExchangeService
-    from ..services.scalper_service import ScalperService
+    from ..models.schemas import ExchangeConfig, ScalperStatus, ScalperSessionsRequest
+    from ..services.scalper_coordinator import ScalperCommandError, ScalperUnavailable, scalper_coordinator
+    from ..services.exchange_service import exchange_pool
 except ImportError:
-    from models.schemas import ExchangeConfig, ScalperStatus
-    from services.exchange_service import ExchangeService
-    from services.scalper_service import ScalperService
-from typing import Dict, Any
+    from models.schemas import ExchangeConfig, ScalperStatus, ScalperSessionsRequest
+    from services.scalper_coordinator import ScalperCommandError, ScalperUnavailable, scalper_coordinator
+    from services.exchange_service import exchange_pool
+from typing import Dict, Any, List, Optional
 
 router = APIRouter(prefix="/trading", tags=["trading"])
-scalper_service = ScalperService()
 
-@router.post("/start")
-async def start_scalper(config: ExchangeConfig, symbol: str = "BTC/USDT"):
+# The scalper runs in one worker; commands from other workers are relayed to it
+# (credentials pass through the shared store sealed to that worker's key)
+
+async def _start(config: ExchangeConfig, symbols: List[str]) -> Dict[str, Any]:
     try:
-        exchange_service = ExchangeService(
-            exchange_id=config.exchange_id,
-            api_key=config.api_key,
-            secret=config.secret,
-            passphrase=config.passphrase,
-            testnet=config.testnet
-        )
-        # Check connection
-        await exchange_service.get_balance()
-
-        scalper_service.start(exchange_service, symbol)
-        return {"message": "Scalper started successfully", "status": scalper_service.get_status()}
+        return await scalper_coordinator.start_scalper(config.model_dump(), symbols)
+    except ScalperUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ScalperCommandError as e:
+        # Failed on the worker running the scalper (e.g. rejected credentials)
+        raise HTTPException(status_code=400, detail=f"Failed to start scalper: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to start scalper: {str(e)}")
 
+async def _stop(session_id: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        return await scalper_coordinator.stop_scalper(session_id)
+    except ScalperUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ScalperCommandError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to stop scalper: {str(e)}")
+
+@router.post("/start")
+async def start_scalper(config: ExchangeConfig, symbol: str = "BTC/USDT"):
+    status = await _start(config, [symbol])
+    return {"message": "Scalper started successfully", "status": status}
+
 @router.post("/stop")
 async def stop_scalper():
-    scalper_service.stop()
-    return {"message": "Scalper stopped successfully", "status": scalper_service.get_status()}
+    """Stops every session."""
+    status = await _stop()
+    return {"message": "Scalper stopped successfully", "status": status}
+
+@router.post("/balance")
+async def get_balance(config: ExchangeConfig, currency: str = "USDT"):
+    """Balance on the exchange, through the pooled client for these credentials."""
+    try:
+        async with exchange_pool.client(**config.model_dump()) as exchange_service:
+            return {"currency": currency, "balance": await exchange_service.get_balance(currency)}
+    except (ccxt.AuthenticationError, ccxt.PermissionDenied) as e:
+        raise HTTPException(status_code=401, detail=f"{config.exchange_id} rejected the credentials: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to connect to {config.exchange_id}: {str(e)}")
+
+@router.get("/status", response_model=ScalperStatus)
+async def get_scalper_status(since: Optional[int] = Query(None, ge=0)):
+    """Pass the `cursor` of the previous response as `since` to get only newer trades and logs."""
+    return await scalper_coordinator.status(since)
+
+@router.get("/sessions")
+async def list_sessions(since: Optional[int] = Query(None, ge=0)):
+    return (await scalper_coordinator.status(since))["sessions"]
+
+@router.post("/sessions")
+async def start_sessions(request: ScalperSessionsRequest):
+    """Starts one session per symbol on the exchange; symbols that already run are skipped."""
+    symbols = list(dict.fromkeys(s.strip() for s in request.symbols if s.strip()))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+    status = await _start(request.exchange, symbols)
+    return {"message": f"Started {len(symbols)} session(s)", "status": status}
 
-@router.get("/status")
-async def get_scalper_status():
-    return scalper_service.get_status()
+@router.delete("/sessions/{session_id:path}")
+async def stop_session(session_id: str):
+    """Stops one session; `session_id` is "<exchange_id>:<symbol>", e.g. binance:BTC/USDT."""
+    if session_id not in {s["session_id"] for s in (await scalper_coordinator.status())["sessions"]}:
+        raise HTTPException(status_code=404, detail=f"No session {session_id}")
+    status = await _stop(session_id)
+    return {"message": f"Session {session_id} stopped", "status": status}
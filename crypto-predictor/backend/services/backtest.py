@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Optional
+try:
+    from .indicators import IndicatorService
+    from .prediction_engine import PredictionEngine, compiled_rules
+except ImportError:
+    from services.indicators import IndicatorService
+    from services.prediction_engine import PredictionEngine, compiled_rules
+
+# Predictions are made for a 24h horizon
+HORIZON_MS = 24 * 60 * 60 * 1000
+
+SIGNAL_POSITIONS = {
+    "STRONG BUY": 1,
+    "BUY": 1,
+    "NEUTRAL": 0,
+    "SELL": -1,
+    "STRONG SELL": -1,
+}
+
+
+class BacktestService:
+    @staticmethod
+    def horizon_bars(times: np.ndarray) -> int:
+        """Number of candles covering the 24h prediction horizon."""
+        if len(times) < 2:
+            return 1
+        interval = float(np.median(np.diff(times)))
+        if interval <= 0:
+            return 1
+        return max(1, int(round(HORIZON_MS / interval)))
+
+    @staticmethod
+    def run(df: pd.DataFrame, horizon: Optional[int] = None, fee: float = 0.0) -> Dict[str, Any]:
+        """
+        Replays PredictionEngine over the whole history in one vectorized pass.
+
+        Indicators are computed once for the full series and every bar is scored
+        with the rule table, then compared with the close `horizon` bars later:
+        - hit rate: UP/DOWN calls whose sign matches the realised move
+        - range coverage: realised close inside the predicted low/high range
+        - P&L: long on BUY/STRONG BUY, short on SELL/STRONG SELL, flat otherwise,
+          each bar's call held for the same `horizon` bars as the hit rate and
+          charged `fee` per unit of position change
+        """
+        if df.empty:
+            raise ValueError("Empty DataFrame provided to backtest")
+
+        # The rule columns, plus SMA_50 to tell when indicators have warmed up
+        columns = list(dict.fromkeys(compiled_rules.indicator_columns + ['SMA_50']))
+        indicators = IndicatorService.compute(df, columns)
+        scored = PredictionEngine.score_history(indicators)
+
+        times = indicators['time'].to_numpy(dtype=np.int64)
+        close = indicators['close'].to_numpy(dtype=float)
+        if horizon is None:
+            horizon = BacktestService.horizon_bars(times)
+
+        # Only bars with fully warmed-up indicators and a known outcome are scored
+        warm = ~np.isnan(indicators['SMA_50'].to_numpy(dtype=float))
+        evaluated = np.zeros(len(close), dtype=bool)
+        if len(close) > horizon:
+            evaluated[:-horizon] = warm[:-horizon]
+
+        future = np.full(len(close), np.nan)
+        future[:len(close) - horizon] = close[horizon:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            forward_return = future / close - 1
+
+        direction = scored["predicted_direction"]
+        called = evaluated & (direction != "SIDEWAYS")
+        hits = called & (((direction == "UP") & (forward_return > 0)) | ((direction == "DOWN") & (forward_return < 0)))
+        covered = evaluated & (future >= scored["low"]) & (future <= scored["high"])
+
+        overall = scored["overall_signal"]
+        position = np.zeros(len(close))
+        for label, pos in SIGNAL_POSITIONS.items():
+            position[overall == label] = pos
+        position[~warm] = 0
+
+        # Every bar commits 1/horizon of the capital to its call for `horizon` bars, so the
+        # book held over bar t is the average of the calls made at bars t-horizon..t-1
+        bar_return = np.zeros(len(close))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bar_return[1:] = close[1:] / close[:-1] - 1
+        bar_return = np.nan_to_num(bar_return, nan=0.0, posinf=0.0, neginf=0.0)
+        held = np.zeros(len(close))
+        held[1:] = np.convolve(position, np.full(horizon, 1 / horizon))[:len(close) - 1]
+        turnover = np.abs(np.diff(held, prepend=0.0))
+        strategy_return = held * bar_return - turnover * fee
+        equity = np.cumprod(1 + strategy_return)
+
+        breakdown = []
+        for label in SIGNAL_POSITIONS:
+            mask = evaluated & (overall == label)
+            count = int(mask.sum())
+            signed = SIGNAL_POSITIONS[label] * forward_return[mask]
+            breakdown.append({
+                "signal": label,
+                "count": count,
+                "hit_rate": round(float((signed > 0).mean()), 4) if count and SIGNAL_POSITIONS[label] else None,
+                "avg_return": round(float(forward_return[mask].mean()), 6) if count else None,
+            })
+
+        n_eval = int(evaluated.sum())
+        n_called = int(called.sum())
+        running_peak = np.maximum.accumulate(equity)
+        return {
+            "bars": int(len(close)),
+            "evaluated_bars": n_eval,
+            "horizon_bars": int(horizon),
+            "directional_calls": n_called,
+            "hit_rate": round(float(hits.sum() / n_called), 4) if n_called else None,
+            "range_coverage": round(float(covered.sum() / n_eval), 4) if n_eval else None,
+            "total_return": round(float(equity[-1] - 1), 6),
+            "buy_and_hold_return": round(float(close[-1] / close[warm][0] - 1), 6) if warm.any() else 0.0,
+            "max_drawdown": round(float((1 - equity / running_peak).max()), 6),
+            "trades": int(np.count_nonzero(turnover)),
+            "signals": breakdown,
+        }
@@ -0,0 +1,162 @@
+import threading
+from typing import Hashable, Optional
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+try:
+    from .coingecko import CoinGeckoService
+except ImportError:
+    from services.coingecko import CoinGeckoService
+
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+
+TIMEFRAMES = {"1h": HOUR_MS, "4h": 4 * HOUR_MS, "1d": DAY_MS}
+# Candles the longest indicator needs before it scores (SMA 50; the MACD signal line needs 34),
+# plus the partial bucket a window starts inside of
+INDICATOR_HISTORY = 51
+# Base series each timeframe is rolled up from: 1h from the 30m candles, 4h and 1d from the 4h ones
+TIMEFRAME_GRANULARITY = {"1h": "30m", "4h": "4h", "1d": "4h"}
+# Days of base candles read for each timeframe: at least INDICATOR_HISTORY candles of it.
+# CoinGecko serves 30m candles for only 2 days and 4h candles for 30, so 1h (3 days) and
+# 1d (60 days) reach back into what the candle store kept from earlier fetches; until it
+# has that much (e.g. right after a cold start) SMA 50 and MACD report insufficient data
+# instead of scoring (see CompiledRules.score).
+TIMEFRAME_HISTORY_DAYS = {"1h": 3, "4h": 30, "1d": 60}
+
+COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+# One rollup per (series, timeframe)
+rollup_engines = LRUCache(maxsize=256)
+_rollups_lock = threading.Lock()
+
+
+class RollupEngine:
+    """
+    Candles of one timeframe rolled up from a base series. Each update
+    re-aggregates only the buckets from the first new or revised base candle
+    on; earlier buckets are kept as they were.
+
+    Like CoinGecko's, candle times are close times: a base candle stamped t
+    covers (t - base_interval_ms, t], and a rolled-up candle is stamped with
+    the close of its bucket.
+    """
+
+    def __init__(self, interval_ms: int, base_interval_ms: int):
+        self.interval_ms = interval_ms
+        self.base_interval_ms = base_interval_ms
+        self.rebuilds = 0
+        self.buckets_aggregated = 0
+        self._lock = threading.Lock()
+        self._base = np.empty((0, len(COLUMNS)))
+        self._rolled = np.empty((0, len(COLUMNS)))
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        with self._lock:
+            return self._update(df)
+
+    def _update(self, df: pd.DataFrame) -> pd.DataFrame:
+        base = df[COLUMNS].sort_values('time').to_numpy(dtype=float)
+        closes = CandleResampler.bucket_closes(base[:, 0], self.interval_ms, self.base_interval_ms)
+        changed = self._first_changed(base)
+        if changed is None:
+            self.rebuilds += 1
+            kept = self._rolled[:0]
+            changed = 0
+        else:
+            # Buckets before the one holding the first new or revised candle stay as they are
+            from_bucket = closes[changed] if changed < len(base) else np.inf
+            kept = self._rolled[self._rolled[:, 0] < from_bucket]
+            changed = int(np.searchsorted(closes, from_bucket)) if changed < len(base) else len(base)
+        fresh = CandleResampler.aggregate(base[changed:], self.interval_ms, self.base_interval_ms)
+        self.buckets_aggregated += len(fresh)
+        self._rolled = np.concatenate([kept, fresh])
+        self._base = base
+
+        rolled = self._rolled
+        if len(base):
+            # Drop buckets that slid out of the window, and a first bucket the window starts inside of
+            first_open = base[0, 0] - self.base_interval_ms
+            partial = first_open != closes[0] - self.interval_ms
+            rolled = rolled[rolled[:, 0] >= closes[0] + (self.interval_ms if partial else 0)]
+        result = pd.DataFrame(rolled, columns=COLUMNS)
+        result['time'] = result['time'].astype(np.int64)
+        return result
+
+    def _first_changed(self, base: np.ndarray) -> Optional[int]:
+        """
+        Index of the first base candle that is new or differs from the stored
+        one, or None when `base` doesn't continue the stored series.
+        """
+        stored = self._base
+        if not len(stored) or not len(base) or base[0, 0] < stored[0, 0]:
+            return None
+        at = np.searchsorted(stored[:, 0], base[:, 0])
+        inside = at < len(stored)
+        same = np.zeros(len(base), dtype=bool)
+        same[inside] = (stored[at[inside]] == base[inside]).all(axis=1)
+        if not same.any() and base[0, 0] <= stored[-1, 0]:
+            return None
+        differs = np.flatnonzero(~same)
+        return int(differs[0]) if len(differs) else len(base)
+
+
+class CandleResampler:
+    @staticmethod
+    def bucket_closes(times: np.ndarray, interval_ms: int, base_interval_ms: int) -> np.ndarray:
+        """Close time of the `interval_ms` bucket holding each base candle, given the candles' close times."""
+        return (times - base_interval_ms) // interval_ms * interval_ms + interval_ms
+
+    @staticmethod
+    def aggregate(base: np.ndarray, interval_ms: int, base_interval_ms: int) -> np.ndarray:
+        """
+        Rolls rows of [time, open, high, low, close, volume] sorted by (close)
+        time into `interval_ms` buckets: first open, highest high, lowest low,
+        last close and summed volume, with one reduceat per column.
+        """
+        if not len(base):
+            return np.empty((0, len(COLUMNS)))
+        buckets = CandleResampler.bucket_closes(base[:, 0], interval_ms, base_interval_ms)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(base)] - 1
+        return np.column_stack([
+            buckets[starts],
+            base[starts, 1],
+            np.maximum.reduceat(base[:, 2], starts),
+            np.minimum.reduceat(base[:, 3], starts),
+            base[ends, 4],
+            np.add.reduceat(base[:, 5], starts),
+        ])
+
+    @staticmethod
+    def base_interval(timeframe: str) -> int:
+        """Candle interval (ms) of the CoinGecko series `timeframe` is rolled up from."""
+        return CoinGeckoService.granularity_for(TIMEFRAME_HISTORY_DAYS[timeframe], TIMEFRAME_GRANULARITY[timeframe])[1]
+
+    @staticmethod
+    def resample(df: pd.DataFrame, timeframe: str, base_interval_ms: Optional[int] = None) -> pd.DataFrame:
+        """Candles of `timeframe` from a finer series, computed from scratch."""
+        base_interval_ms = base_interval_ms or CandleResampler.base_interval(timeframe)
+        return RollupEngine(TIMEFRAMES[timeframe], base_interval_ms).update(df)
+
+    @staticmethod
+    def get_engine(key: Hashable, timeframe: str) -> RollupEngine:
+        with _rollups_lock:
+            engine = rollup_engines.get((key, timeframe))
+            if engine is None:
+                engine = RollupEngine(TIMEFRAMES[timeframe], CandleResampler.base_interval(timeframe))
+                rollup_engines[(key, timeframe)] = engine
+            return engine
+
+    @staticmethod
+    def rollup(key: Hashable, df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+        """resample, kept up to date incrementally for the base series `key`."""
+        return CandleResampler.get_engine(key, timeframe).update(df)
+
+    @staticmethod
+    async def get_candles(coin_id: str, timeframe: str, vs_currency: str = "usd") -> pd.DataFrame:
+        """Candles of `timeframe` for a coin, rolled up from the base series that serves it."""
+        days = TIMEFRAME_HISTORY_DAYS[timeframe]
+        base = await CoinGeckoService.get_ohlcv(coin_id, days, vs_currency, granularity=TIMEFRAME_GRANULARITY[timeframe])
+        return CandleResampler.rollup((coin_id, vs_currency, days), base, timeframe)
@@ -0,0 +1,197 @@
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CANDLE_STORE_DIR = os.getenv("CANDLE_STORE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "candles"
+)
+
+# One raw little-endian file per column
+CANDLE_COLUMNS = {
+    'time': np.dtype('<i8'),
+    'open': np.dtype('<f8'),
+    'high': np.dtype('<f8'),
+    'low': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'volume': np.dtype('<f8'),
+}
+
+# Symlink in a series directory naming its live version
+CURRENT = "current"
+
+StoreKey = Tuple[str, str, str]  # (coin_id, vs_currency, granularity)
+
+
+class CandleStore:
+    """
+    Append-only columnar candle store on local disk.
+
+    Each (coin_id, vs_currency, granularity) series is a directory of versions,
+    each with one raw binary file per column, and a `current` symlink to the
+    live one. Reads are memory-mapped, so slices come back as NumPy views of
+    the page cache without copying or parsing.
+
+    New candles are appended in place. When already stored candles change
+    (e.g. the newest, still-forming candle was revised) the series is written
+    to a new version and `current` is swapped to it with one rename, so readers
+    see every column of either the old or the new version, never a mix; memory
+    maps of the previous version stay valid. Writers of a series must not
+    overlap (CoinGeckoService holds a shared lock per series while writing).
+    """
+
+    def __init__(self, root: str = CANDLE_STORE_DIR):
+        self.root = root
+
+    def _series_dir(self, key: StoreKey) -> str:
+        safe = "_".join(re.sub(r"[^A-Za-z0-9.-]", "-", part) for part in key)
+        return os.path.join(self.root, safe)
+
+    @staticmethod
+    def version_dir(series_dir: str) -> str:
+        """Directory of the live version of a series (the series directory itself in the flat, unversioned layout)."""
+        try:
+            return os.path.join(series_dir, os.readlink(os.path.join(series_dir, CURRENT)))
+        except OSError:
+            return series_dir
+
+    def _column_path(self, key: StoreKey, column: str) -> str:
+        return os.path.join(self.version_dir(self._series_dir(key)), f"{column}.bin")
+
+    @staticmethod
+    def _length(directory: str) -> int:
+        """Number of complete rows (a torn append is ignored until repaired)."""
+        lengths = []
+        for column, dtype in CANDLE_COLUMNS.items():
+            path = os.path.join(directory, f"{column}.bin")
+            if not os.path.exists(path):
+                return 0
+            lengths.append(os.path.getsize(path) // dtype.itemsize)
+        return min(lengths)
+
+    def length(self, key: StoreKey) -> int:
+        return self._length(self.version_dir(self._series_dir(key)))
+
+    @staticmethod
+    def read_series_dir(series_dir: str) -> Dict[str, np.ndarray]:
+        """Zero-copy, read-only memory maps of every column of the live version in `series_dir`."""
+        for attempt in range(3):
+            directory = CandleStore.version_dir(series_dir)
+            try:
+                n = CandleStore._length(directory)
+                arrays = {}
+                for column, dtype in CANDLE_COLUMNS.items():
+                    if n == 0:
+                        arrays[column] = np.empty(0, dtype=dtype)
+                    else:
+                        arrays[column] = np.memmap(os.path.join(directory, f"{column}.bin"), dtype=dtype, mode='r', shape=(n,))
+                return arrays
+            except FileNotFoundError:
+                # The version was pruned between resolving `current` and opening it: resolve again
+                if attempt == 2:
+                    raise
+
+    def read_arrays(self, key: StoreKey) -> Dict[str, np.ndarray]:
+        """Zero-copy, read-only memory maps of every column."""
+        return self.read_series_dir(self._series_dir(key))
+
+    def read(self, key: StoreKey, start: Optional[int] = None, end: Optional[int] = None) -> pd.DataFrame:
+        """Candles with start <= time <= end (ms), sliced by binary search on the time column."""
+        arrays = self.read_arrays(key)
+        times = arrays['time']
+        lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side='right'))
+        return pd.DataFrame({column: values[lo:hi] for column, values in arrays.items()}, copy=False)
+
+    def last_time(self, key: StoreKey) -> Optional[int]:
+        times = self.read_arrays(key)['time']
+        return int(times[-1]) if len(times) else None
+
+    def first_time(self, key: StoreKey) -> Optional[int]:
+        times = self.read_arrays(key)['time']
+        return int(times[0]) if len(times) else None
+
+    def upsert(self, key: StoreKey, df: pd.DataFrame) -> int:
+        """
+        Merges candles into the stored series. Returns the number of rows appended,
+        or -1 when the series had to be rewritten.
+        """
+        if df.empty:
+            return 0
+        new = df.sort_values('time').drop_duplicates('time', keep='last')
+        new_arrays = {c: new[c].to_numpy(dtype=dtype) for c, dtype in CANDLE_COLUMNS.items()}
+        stored = self.read_arrays(key)
+        stored_times = stored['time']
+
+        if not len(stored_times):
+            # A new series is published as its first version
+            self._publish(key, new_arrays)
+            return len(new_arrays['time'])
+
+        overlap_at = int(np.searchsorted(new_arrays['time'], stored_times[-1], side='right'))
+        first_new = new_arrays['time'][0]
+        overlap_start = int(np.searchsorted(stored_times, first_new, side='left'))
+        overlapping = {c: stored[c][overlap_start:] for c in CANDLE_COLUMNS}
+        incoming = {c: new_arrays[c][:overlap_at] for c in CANDLE_COLUMNS}
+        unchanged = first_new >= stored_times[0] and all(
+            np.array_equal(overlapping[c], incoming[c]) for c in CANDLE_COLUMNS
+        )
+        if not unchanged:
+            self._rewrite(key, stored, new_arrays)
+            return -1
+        new_arrays = {c: values[overlap_at:] for c, values in new_arrays.items()}
+
+        appended = len(new_arrays['time'])
+        if appended:
+            n = len(stored_times)
+            for column, dtype in CANDLE_COLUMNS.items():
+                with open(self._column_path(key, column), 'r+b') as f:
+                    # Overwrite any torn bytes past the last complete row
+                    f.seek(n * dtype.itemsize)
+                    f.write(new_arrays[column].tobytes())
+                    f.truncate()
+        return appended
+
+    def _rewrite(self, key: StoreKey, stored: Dict[str, np.ndarray], new: Dict[str, np.ndarray]):
+        """Publishes the union of stored and new candles (new wins on equal time) as a new version."""
+        merged = pd.concat([
+            pd.DataFrame({c: np.asarray(v) for c, v in stored.items()}),
+            pd.DataFrame(new),
+        ]).drop_duplicates('time', keep='last').sort_values('time')
+        self._publish(key, {c: merged[c].to_numpy(dtype=dtype) for c, dtype in CANDLE_COLUMNS.items()})
+
+    def _publish(self, key: StoreKey, arrays: Dict[str, np.ndarray]):
+        """Writes `arrays` to a new version directory and swaps `current` to it with one rename."""
+        directory = self._series_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        previous = os.path.basename(self.version_dir(directory))
+        version = tempfile.mkdtemp(dir=directory, prefix="v-")
+        for column, dtype in CANDLE_COLUMNS.items():
+            with open(os.path.join(version, f"{column}.bin"), 'wb') as f:
+                f.write(np.asarray(arrays[column], dtype=dtype).tobytes())
+        link = os.path.join(directory, f".{CURRENT}-{uuid.uuid4().hex}")
+        os.symlink(os.path.basename(version), link)
+        os.replace(link, os.path.join(directory, CURRENT))
+        self._prune(directory, keep={os.path.basename(version), previous})
+
+    @staticmethod
+    def _prune(directory: str, keep: set):
+        """
+        Deletes versions other than `keep` (the new one and the one readers may
+        still be opening) and the column files of the flat layout.
+        """
+        for entry in os.scandir(directory):
+            if entry.name in keep or entry.name == CURRENT:
+                continue
+            if entry.is_dir(follow_symlinks=False) and entry.name.startswith("v-"):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.name.endswith(".bin"):
+                os.unlink(entry.path)
+
+
+candle_store = CandleStore()
@@ -1,17 +1,262 @@
+import asyncio
+import hashlib
+import importlib.util
+import math
+import os
+import time
 import httpx
 import pandas as pd
-from cachetools import TTLCache, cached
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+try:
+    from .candle_store import candle_store
+    from .market_table import MARKETS_PAGE_SIZE, MarketTable, market_table
+    from .request_coalescing import StaleWhileRevalidateCache
+    from .shared_cache import SharedLock, shared_cache
+    from .upstream_scheduler import Priority, UpstreamScheduler, upstream_priority
+except ImportError:
+    from services.candle_store import candle_store
+    from services.market_table import MARKETS_PAGE_SIZE, MarketTable, market_table
+    from services.request_coalescing import StaleWhileRevalidateCache
+    from services.shared_cache import SharedLock, shared_cache
+    from services.upstream_scheduler import Priority, UpstreamScheduler, upstream_priority
 
-BASE_URL = "https://api.coingecko.com/api/v3"
+BASE_URL = os.getenv("COINGECKO_BASE_URL", "https://api.coingecko.com/api/v3")
+
+# Shared connection pool settings
+HTTP_MAX_CONNECTIONS = int(os.getenv("COINGECKO_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("COINGECKO_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("COINGECKO_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("COINGECKO_TIMEOUT", "15"))
+# HTTP/2 needs the optional 'h2' package (httpx[http2])
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+# Uvicorn/gunicorn worker processes sharing the upstream limit
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+# Upstream rate limit (the public API allows roughly 30 calls per minute) and retry policy.
+# The limit is per client IP, so each worker gets an equal share of it.
+upstream_scheduler = UpstreamScheduler(
+    calls_per_minute=float(os.getenv("COINGECKO_CALLS_PER_MINUTE", "30")) / WEB_CONCURRENCY,
+    burst=max(1.0, float(os.getenv("COINGECKO_BURST", "10")) / WEB_CONCURRENCY),
+    max_retries=int(os.getenv("COINGECKO_MAX_RETRIES", "3")),
+    backoff_base=float(os.getenv("COINGECKO_BACKOFF_BASE", "1")),
+    backoff_max=float(os.getenv("COINGECKO_BACKOFF_MAX", "60")),
+    max_queue=int(os.getenv("COINGECKO_MAX_QUEUE", "500")),
+)
+
+# Application-lifetime client, opened in startup() and closed in shutdown()
+_client: Optional[httpx.AsyncClient] = None
+
+# Cache for 5 minutes; expired entries are served for another 5 minutes while one
+# background task refreshes them, and concurrent misses share one upstream fetch
+ohlcv_cache = StaleWhileRevalidateCache(maxsize=100, ttl=300, max_stale=int(os.getenv("OHLCV_MAX_STALE", "300")))
+overview_cache = StaleWhileRevalidateCache(maxsize=100, ttl=60, max_stale=int(os.getenv("OVERVIEW_MAX_STALE", "60")))
+# Behind the per-process caches, loads go through the cache shared by all workers,
+# so each window is fetched once per TTL rather than once per worker
+OHLCV_SHARED_TTL = 300
+# A prefetch refresh reuses a series another worker fetched at most this many seconds ago
+OHLCV_REFRESH_MAX_AGE = float(os.getenv("OHLCV_REFRESH_MAX_AGE", "30"))
+OVERVIEW_SHARED_TTL = 60
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# CoinGecko picks the OHLC candle size from 'days': 1-2 days -> 30m, 3-30 days -> 4h, 31+ days -> 4d
+# (name, candle interval ms, min days, max days)
+GRANULARITIES = [
+    ("30m", 30 * 60 * 1000, 1, 2),
+    ("4h", 4 * 60 * 60 * 1000, 3, 30),
+    ("4d", 4 * DAY_MS, 31, None),
+]
+
+class CoinNotFound(LookupError):
+    """No market data for the coin id or symbol."""
 
-# Cache for 5 minutes
-ohlcv_cache = TTLCache(maxsize=100, ttl=300)
-overview_cache = TTLCache(maxsize=100, ttl=60)
 
 class CoinGeckoService:
     @staticmethod
-    async def get_ohlcv(coin_id: str, days: int = 30, vs_currency: str = "usd") -> pd.DataFrame:
+    async def startup(transport: Optional[httpx.AsyncBaseTransport] = None):
+        """Opens the pooled upstream client. Called from the FastAPI lifespan."""
+        global _client
+        if _client is not None:
+            await _client.aclose()
+        _client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            http2=HTTP2_ENABLED and transport is None,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=HTTP_TIMEOUT,
+            transport=transport,
+        )
+
+    @staticmethod
+    async def shutdown():
+        global _client
+        if _client is not None:
+            await _client.aclose()
+            _client = None
+
+    @staticmethod
+    async def client() -> httpx.AsyncClient:
+        """The shared client, opened lazily when used outside the app lifespan (scripts, tests)."""
+        if _client is None:
+            await CoinGeckoService.startup()
+        return _client
+
+    @staticmethod
+    def _background(load):
+        """Wraps a loader so stale-entry refreshes queue behind interactive calls."""
+        async def run():
+            with upstream_priority(Priority.PREFETCH):
+                return await load()
+        return run
+
+    @staticmethod
+    async def _get(path: str, params: Dict[str, Any]) -> httpx.Response:
+        """GET through the shared client and the upstream rate limiter."""
+        client = await CoinGeckoService.client()
+        resp = await upstream_scheduler.request(client, "GET", path, params=params)
+        resp.raise_for_status()
+        return resp
+
+    @staticmethod
+    def granularity_for(days: int, granularity: Optional[str] = None) -> Tuple[str, int, int, Optional[int]]:
+        """
+        (name, candle interval ms, min days, max days) of the OHLC series CoinGecko
+        returns for `days`, or of the series named `granularity`.
+        """
+        for name, interval, min_days, max_days in GRANULARITIES:
+            if name == granularity or granularity is None and (max_days is None or days <= max_days):
+                return name, interval, min_days, max_days
+        raise ValueError(f"Unsupported days: {days}" if granularity is None else f"Unknown granularity: {granularity}")
+
+    @staticmethod
+    async def get_ohlcv(coin_id: str, days: int = 30, vs_currency: str = "usd",
+                        granularity: Optional[str] = None) -> pd.DataFrame:
+        """
+        Returns the last `days` of OHLCV candles for a coin, of the granularity
+        CoinGecko serves for `days` unless `granularity` names another.
+        Candles are kept in the on-disk candle store, one series per granularity,
+        so only the time range missing from the store is fetched from CoinGecko
+        and 7/14/30 day requests are all slices of the same stored series. The
+        store keeps what it was sent, so a series can reach back further than
+        CoinGecko serves its granularity (e.g. 30m candles for over 2 days).
+        """
+        cache_key = CoinGeckoService._ohlcv_key(coin_id, days, vs_currency, granularity)
+        load = lambda: CoinGeckoService._load_ohlcv_shared(coin_id, days, vs_currency, granularity=granularity)
+        return await ohlcv_cache.get_or_fetch(cache_key, load, CoinGeckoService._background(load))
+
+    @staticmethod
+    def _ohlcv_key(coin_id: str, days: int, vs_currency: str, granularity: Optional[str] = None) -> str:
+        key = f"ohlcv_{coin_id}_{days}_{vs_currency}"
+        if granularity is not None and granularity != CoinGeckoService.granularity_for(days)[0]:
+            key += f"_{granularity}"
+        return key
+
+    @staticmethod
+    def ohlcv_expires_in(coin_id: str, days: int = 30, vs_currency: str = "usd",
+                         granularity: Optional[str] = None) -> Optional[float]:
+        """Seconds until the cached window goes stale (negative once stale), None when not cached."""
+        return ohlcv_cache.expires_in(CoinGeckoService._ohlcv_key(coin_id, days, vs_currency, granularity))
+
+    @staticmethod
+    async def refresh_ohlcv(coin_id: str, days: int = 30, vs_currency: str = "usd",
+                            granularity: Optional[str] = None) -> pd.DataFrame:
+        """
+        Reloads a window into the cache ahead of expiry (used by the prefetch
+        scheduler). The shared window is skipped, since it may be as old as the
+        local one, and the series is refetched unless another worker did so
+        within OHLCV_REFRESH_MAX_AGE.
+        """
+        return await ohlcv_cache.refresh(
+            CoinGeckoService._ohlcv_key(coin_id, days, vs_currency, granularity),
+            lambda: CoinGeckoService._load_ohlcv_shared(
+                coin_id, days, vs_currency, max_age=OHLCV_REFRESH_MAX_AGE, granularity=granularity
+            ),
+        )
+
+    @staticmethod
+    async def _load_ohlcv_shared(coin_id: str, days: int, vs_currency: str, max_age: Optional[float] = None,
+                                 granularity: Optional[str] = None) -> pd.DataFrame:
+        """
+        The window from the shared cache, else loaded by one worker. The lock is
+        per stored series, so workers never write the same series concurrently.
+        With `max_age`, the window is reloaded from a series at most that old.
+        """
+        key = CoinGeckoService._ohlcv_key(coin_id, days, vs_currency, granularity)
+        granularity = CoinGeckoService.granularity_for(days, granularity)[0]
+        return await shared_cache.get_or_load(
+            key,
+            OHLCV_SHARED_TTL,
+            lambda lock: CoinGeckoService._load_ohlcv(coin_id, days, vs_currency, max_age, lock, granularity),
+            lock=f"candles_{coin_id}_{vs_currency}_{granularity}",
+            refresh=max_age is not None,
+        )
+
+    @staticmethod
+    def _fresh(refreshed_at: Optional[int], now: int, max_age: Optional[float]) -> bool:
+        """Whether a series marked refreshed at `refreshed_at` (ms) is recent enough to slice."""
+        if refreshed_at is None:
+            return False
+        return max_age is None or now - refreshed_at <= max_age * 1000
+
+    @staticmethod
+    def _series_key(store_key: Tuple[str, str, str]) -> str:
+        """Shared cache key marking a stored series as refreshed."""
+        return "candles_refreshed_" + "_".join(store_key)
+
+    @staticmethod
+    async def _load_ohlcv(coin_id: str, days: int, vs_currency: str, max_age: Optional[float] = None,
+                          lock: Optional[SharedLock] = None, granularity: Optional[str] = None) -> pd.DataFrame:
+        """
+        Brings the stored series up to date and returns the requested window.
+        The series is refetched when no worker refreshed it within the TTL, or
+        within `max_age` seconds when given. Fetched candles are only written
+        while `lock` (the series lock) is still held.
+        """
+        granularity, interval, min_days, max_days = CoinGeckoService.granularity_for(days, granularity)
+        store_key = (coin_id, vs_currency, granularity)
+        now = int(time.time() * 1000)
+        window_start = now - days * DAY_MS
+        # CoinGecko serves max_days of this granularity; anything older only the store can have
+        reachable_start = window_start if max_days is None else max(window_start, now - max_days * DAY_MS)
+
+        first = candle_store.first_time(store_key)
+        last = candle_store.last_time(store_key)
+        fetch_days = None
+        if first is None or first > reachable_start + 2 * interval or last < window_start:
+            # Window not covered yet: fetch the widest range with this granularity
+            fetch_days = max(days, max_days or days)
+            if max_days is not None:
+                fetch_days = min(fetch_days, max_days)
+        elif not CoinGeckoService._fresh(await shared_cache.get(CoinGeckoService._series_key(store_key)), now, max_age):
+            # Not refreshed recently enough: the smallest range that reaches back to the newest stored
+            # candle, so new candles are appended and the still-forming one is revised
+            gap_days = math.ceil((now - last) / DAY_MS)
+            fetch_days = max(gap_days, min_days)
+            if max_days is not None:
+                fetch_days = min(fetch_days, max_days)
+
+        if fetch_days is not None:
+            fetched = await CoinGeckoService._fetch_ohlcv(coin_id, fetch_days, vs_currency)
+            if lock is None or not await lock.renew():
+                # Gave up waiting for the series lock, or held it past its ttl: another worker
+                # may be writing the series, so serve the fetch without storing it
+                return fetched[fetched['time'] >= window_start].reset_index(drop=True)
+            try:
+                candle_store.upsert(store_key, fetched)
+            except OSError:
+                # Store unavailable (e.g. read-only volume): serve the fetch directly
+                return fetched[fetched['time'] >= window_start].reset_index(drop=True)
+            # Other windows of the same series expiring within the TTL are sliced from it
+            await shared_cache.set(CoinGeckoService._series_key(store_key), now, OHLCV_SHARED_TTL)
+
+        return candle_store.read(store_key, start=window_start)
+
+    @staticmethod
+    async def _fetch_ohlcv(coin_id: str, days: int, vs_currency: str) -> pd.DataFrame:
         """
         Fetches OHLCV data from CoinGecko and returns a pandas DataFrame.
         CoinGecko 'ohlc' endpoint provides: [time, open, high, low, close]
@@ -19,83 +264,103 @@ class CoinGeckoService:
         Actually, CoinGecko OHLC endpoint doesn't include volume.
         'market_chart' includes prices and total_volumes.
         """
-        cache_key = f"ohlcv_{coin_id}_{days}_{vs_currency}"
-        if cache_key in ohlcv_cache:
-            return ohlcv_cache[cache_key]
-
-        async with httpx.AsyncClient() as client:
-            # CoinGecko OHLC endpoint
-            ohlc_url = f"{BASE_URL}/coins/{coin_id}/ohlc"
-            params = {"vs_currency": vs_currency, "days": days}
-            ohlc_resp = await client.get(ohlc_url, params=params)
-            ohlc_resp.raise_for_status()
-            ohlc_data = ohlc_resp.json()
-
-            # CoinGecko market_chart for volume
-            mc_url = f"{BASE_URL}/coins/{coin_id}/market_chart"
-            mc_params = {"vs_currency": vs_currency, "days": days}
-            mc_resp = await client.get(mc_url, params=mc_params)
-            mc_resp.raise_for_status()
-            mc_data = mc_resp.json()
-
-            # mc_data['total_volumes'] is [[time, volume], ...]
-            volumes_dict = {item[0]: item[1] for item in mc_data['total_volumes']}
-
-            # Create DataFrame
-            df = pd.DataFrame(ohlc_data, columns=['time', 'open', 'high', 'low', 'close'])
-
-            # Map volumes. Since OHLC and market_chart might have different frequencies,
-            # we try to match them or take the closest.
-            # Usually OHLC for 1-2 days is 30m, 3-30 days is 4h, >30 days is 4d.
-            # We'll just try to match timestamps or use a simple merge.
-            df['volume'] = df['time'].map(volumes_dict).fillna(0)
-
-            # If volume is 0, try to find the nearest volume
-            if (df['volume'] == 0).any():
-                v_df = pd.DataFrame(mc_data['total_volumes'], columns=['time', 'volume'])
-                df = pd.merge_asof(df.sort_values('time'), v_df.sort_values('time'), on='time', direction='nearest', suffixes=('', '_new'))
-                df['volume'] = df['volume_new']
-                df.drop(columns=['volume_new'], inplace=True)
-
-            ohlcv_cache[cache_key] = df
-            return df
+        params = {"vs_currency": vs_currency, "days": days}
+        # The OHLC and market_chart (for volume) requests are independent
+        ohlc_resp, mc_resp = await asyncio.gather(
+            CoinGeckoService._get(f"/coins/{coin_id}/ohlc", params),
+            CoinGeckoService._get(f"/coins/{coin_id}/market_chart", params),
+        )
+        ohlc_data = ohlc_resp.json()
+        mc_data = mc_resp.json()
+
+        # mc_data['total_volumes'] is [[time, volume], ...]
+        volumes_dict = {item[0]: item[1] for item in mc_data['total_volumes']}
+
+        # Create DataFrame
+        df = pd.DataFrame(ohlc_data, columns=['time', 'open', 'high', 'low', 'close'])
+
+        # Map volumes. Since OHLC and market_chart might have different frequencies,
+        # we try to match them or take the closest.
+        # Usually OHLC for 1-2 days is 30m, 3-30 days is 4h, >30 days is 4d.
+        # We'll just try to match timestamps or use a simple merge.
+        df['volume'] = df['time'].map(volumes_dict).fillna(0)
+
+        # If volume is 0, try to find the nearest volume
+        if (df['volume'] == 0).any():
+            v_df = pd.DataFrame(mc_data['total_volumes'], columns=['time', 'volume'])
+            df = pd.merge_asof(df.sort_values('time'), v_df.sort_values('time'), on='time', direction='nearest', suffixes=('', '_new'))
+            df['volume'] = df['volume_new']
+            df.drop(columns=['volume_new'], inplace=True)
+
+        return df
 
     @staticmethod
     async def get_market_overview(coin_id: str) -> Dict[str, Any]:
+        """Market overview of one coin (by id or symbol), answered from the market table."""
+        overviews = await CoinGeckoService.get_market_overviews([coin_id])
+        if coin_id not in overviews:
+            raise CoinNotFound(coin_id)
+        return overviews[coin_id]
+
+    @staticmethod
+    async def get_market_overviews(coin_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
         """
-        Fetches market overview for a specific coin.
+        Market overviews of many coins (default: every tracked coin), leaving out
+        unknown ones. The market table is refreshed for all tracked coins at
+        once, a few paged /coins/markets calls per TTL; coins it doesn't have yet
+        are listed once and tracked from then on.
         """
-        if coin_id in overview_cache:
-            return overview_cache[coin_id]
-
-        async with httpx.AsyncClient() as client:
-            url = f"{BASE_URL}/coins/{coin_id}"
-            params = {
-                "localization": "false",
-                "tickers": "false",
-                "market_data": "true",
-                "community_data": "false",
-                "developer_data": "false",
-                "sparkline": "false"
-            }
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-
-            market_data = data.get("market_data", {})
-
-            result = {
-                "name": data.get("name"),
-                "symbol": data.get("symbol", "").upper(),
-                "current_price": market_data.get("current_price", {}).get("usd", 0),
-                "market_cap": market_data.get("market_cap", {}).get("usd", 0),
-                "volume_24h": market_data.get("total_volume", {}).get("usd", 0),
-                "price_change_24h": market_data.get("price_change_percentage_24h", 0),
-                "price_change_7d": market_data.get("price_change_percentage_7d", 0),
-                "ath": market_data.get("ath", {}).get("usd", 0),
-                "atl": market_data.get("atl", {}).get("usd", 0),
-                "circulating_supply": market_data.get("circulating_supply", 0)
-            }
-
-            overview_cache[coin_id] = result
-            return result
+        load = lambda: CoinGeckoService._load_markets()
+        await overview_cache.get_or_fetch("markets", load, CoinGeckoService._background(load))
+        ids = list(market_table.tracked) if coin_ids is None else coin_ids
+        missing = market_table.missing(ids)
+        if missing:
+            # Coalesced per set of ids; ids the listing doesn't know are remembered by the table
+            await overview_cache.get_or_fetch(
+                ("markets", tuple(missing)), lambda: CoinGeckoService._load_markets(missing)
+            )
+        rows = {c: market_table.lookup(c) for c in ids}
+        return {c: MarketTable.overview(row) for c, row in rows.items() if row is not None}
+
+    @staticmethod
+    async def _load_markets(coin_ids: Optional[List[str]] = None) -> int:
+        """Lists coins (default: every tracked coin) through the shared cache into the market table."""
+        ids = list(market_table.tracked) if coin_ids is None else coin_ids
+        digest = hashlib.sha1(",".join(sorted(ids)).encode()).hexdigest()[:16]
+        rows = await shared_cache.get_or_load(
+            f"markets_{digest}", OVERVIEW_SHARED_TTL, lambda lock: CoinGeckoService._fetch_markets(ids)
+        )
+        market_table.update(rows, ids)
+        return len(rows)
+
+    @staticmethod
+    async def _fetch_markets(coin_ids: List[str]) -> List[Dict[str, Any]]:
+        """One /coins/markets call per page of coins, concurrently."""
+        async def page(ids: List[str]) -> List[Dict[str, Any]]:
+            resp = await CoinGeckoService._get("/coins/markets", {
+                "vs_currency": "usd",
+                "ids": ",".join(ids),
+                "per_page": MARKETS_PAGE_SIZE,
+                "page": 1,
+                "price_change_percentage": "7d",
+                "sparkline": "false",
+            })
+            return [MarketTable.parse(item) for item in resp.json()]
+
+        pages = await asyncio.gather(*(page(ids) for ids in market_table.pages(coin_ids)))
+        return [row for rows in pages for row in rows]
+
+    @staticmethod
+    def upstream_stats() -> Dict[str, Any]:
+        """Rate limiter queue depth, wait times and throttling counters."""
+        return upstream_scheduler.stats()
+
+    @staticmethod
+    def cache_stats() -> Dict[str, Dict[str, Any]]:
+        """Hit, stale-hit and coalescing counters of the upstream caches."""
+        return {
+            "ohlcv": ohlcv_cache.stats(),
+            "overview": overview_cache.stats(),
+            "markets": market_table.stats(),
+            "shared": shared_cache.stats(),
+        }
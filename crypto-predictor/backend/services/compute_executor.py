@@ -0,0 +1,241 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# thread: pool threads in this process (NumPy kernels release the GIL, per-series state is shared)
+# process: worker processes, frames passed through shared memory (scales with cores)
+# inline: on the event loop, as before (debugging)
+COMPUTE_EXECUTOR = os.getenv("COMPUTE_EXECUTOR", "thread")
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", "0")) or os.cpu_count() or 1
+# Jobs running or queued before new ones are rejected with 503
+COMPUTE_MAX_PENDING = int(os.getenv("COMPUTE_MAX_PENDING", "0")) or 4 * COMPUTE_WORKERS
+
+
+class ComputeSaturated(Exception):
+    """Every compute worker is busy and the queue is full."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SharedFrame:
+    """
+    Picklable handle to a DataFrame whose columns were copied into one shared
+    memory block. Only the block name and column layout are pickled; the worker
+    maps the block and reads the columns as zero-copy arrays.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        arrays = [(str(name), np.ascontiguousarray(df[name].to_numpy())) for name in df.columns]
+        for name, values in arrays:
+            if values.dtype == object:
+                raise TypeError(f"Column {name!r} has no fixed-width dtype")
+        self._shm = SharedMemory(create=True, size=max(1, sum(v.nbytes for _, v in arrays)))
+        self.name = self._shm.name
+        self.columns: List[Tuple[str, str, int, int]] = []
+        offset = 0
+        for name, values in arrays:
+            self._shm.buf[offset:offset + values.nbytes] = values.view(np.uint8).reshape(-1)
+            self.columns.append((name, values.dtype.str, len(values), offset))
+            offset += values.nbytes
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"name": self.name, "columns": self.columns}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._shm = None
+
+    def attach(self) -> Tuple[pd.DataFrame, SharedMemory]:
+        try:
+            shm = SharedMemory(name=self.name, track=False)
+        except TypeError:
+            # Python < 3.13: keep the worker's tracker from unlinking the parent's block
+            shm = SharedMemory(name=self.name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+        columns = {
+            name: np.frombuffer(shm.buf, dtype=np.dtype(dtype), count=length, offset=offset)
+            for name, dtype, length, offset in self.columns
+        }
+        return pd.DataFrame(columns, copy=False), shm
+
+    def release(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def _share(value: Any, frames: List[SharedFrame]) -> Any:
+    """Replaces DataFrames (also inside dicts, lists and tuples) with SharedFrames."""
+    if isinstance(value, pd.DataFrame):
+        frame = SharedFrame(value)
+        frames.append(frame)
+        return frame
+    if isinstance(value, dict):
+        return {k: _share(v, frames) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_share(v, frames) for v in value)
+    return value
+
+
+def _attach(value: Any, blocks: List[SharedMemory]) -> Any:
+    if isinstance(value, SharedFrame):
+        df, shm = value.attach()
+        blocks.append(shm)
+        return df
+    if isinstance(value, dict):
+        return {k: _attach(v, blocks) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_attach(v, blocks) for v in value)
+    return value
+
+
+def _invoke(fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """Runs in a worker process: maps the shared frames, then calls `fn`."""
+    blocks: List[SharedMemory] = []
+    try:
+        result = fn(*_attach(args, blocks), **_attach(kwargs, blocks))
+        if isinstance(result, pd.DataFrame):
+            # The result is pickled after the blocks are unmapped, so it must not view them
+            result = result.copy(deep=True)
+        return result
+    finally:
+        del args, kwargs
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                # Still referenced; unmapped when collected
+                pass
+
+
+class ComputeExecutor:
+    """
+    Runs CPU-bound indicator, prediction and serialization work off the event
+    loop. Jobs beyond `max_pending` are rejected with ComputeSaturated (a 503)
+    instead of queueing without bound.
+    """
+
+    def __init__(self, kind: str = COMPUTE_EXECUTOR, workers: int = COMPUTE_WORKERS,
+                 max_pending: int = COMPUTE_MAX_PENDING):
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown COMPUTE_EXECUTOR: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool: Optional[Executor] = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def shares_state(self) -> bool:
+        """Whether jobs see this process's memory (per-series indicator engines)."""
+        return self.kind != "process"
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # spawn: forking a process with running threads and an event loop is unsafe
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="compute")
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        if self.kind == "inline":
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.completed += 1
+                self.busy_seconds += time.perf_counter() - started
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ComputeSaturated("Compute workers are saturated", retry_after=1.0)
+
+        frames: List[SharedFrame] = []
+        try:
+            if self.kind == "process":
+                call = functools.partial(_invoke, fn, _share(args, frames), _share(kwargs, frames))
+            else:
+                call = functools.partial(fn, *args, **kwargs)
+            future = self._submit(call)
+        except BaseException:
+            # Never queued: no callback frees the blocks
+            for frame in frames:
+                frame.release()
+            raise
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+
+        def _finished(_: Future):
+            # A cancelled caller doesn't stop a running job, so the slot is freed when the job is
+            self.pending -= 1
+            self.completed += 1
+            self.busy_seconds += time.perf_counter() - started
+            for frame in frames:
+                frame.release()
+
+        def _done(f: Future):
+            try:
+                loop.call_soon_threadsafe(_finished, f)
+            except RuntimeError:
+                # Loop already closed: nothing else touches the counters
+                _finished(f)
+
+        future.add_done_callback(_done)
+        pool = self._pool
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): the next job starts a fresh pool
+            self._discard(pool)
+            raise
+
+    def _submit(self, call: Callable[[], Any]) -> Future:
+        pool = self._executor()
+        try:
+            return pool.submit(call)
+        except BrokenProcessPool:
+            # Broken by a crash noticed after the last job finished: retry once on a new pool
+            self._discard(pool)
+            return self._executor().submit(call)
+
+    def _discard(self, pool: Optional[Executor]):
+        if pool is not None and pool is self._pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+compute_executor = ComputeExecutor()
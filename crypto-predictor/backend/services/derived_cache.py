@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sys
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+try:
+    from .indicator_kernel import OHLCV_COLUMNS
+except ImportError:
+    from services.indicator_kernel import OHLCV_COLUMNS
+
+DERIVED_CACHE_MAX_BYTES = int(float(os.getenv("DERIVED_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+
+def frame_fingerprint(df: pd.DataFrame, columns: Iterable[str] = ('time',) + tuple(OHLCV_COLUMNS)) -> str:
+    """Content hash of the candle columns; identical candles give identical fingerprints."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(df)).encode())
+    for column in columns:
+        if column in df:
+            digest.update(np.ascontiguousarray(df[column].to_numpy()).tobytes())
+    return digest.hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint in bytes of a cached result."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if hasattr(value, "__dict__"):
+        # e.g. pydantic models
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class _SizedLRU(LRUCache):
+    """LRUCache bounded by the total estimated size of its entries; counts evictions."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(maxsize=max_bytes, getsizeof=lambda entry: entry[2])
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class DerivedResultCache:
+    """
+    Cache for results computed from a candle window (indicator frames,
+    predictions, serialized responses, backtests).
+
+    Entries are keyed by (kind, source, params) and remember the fingerprint of
+    the candles they were computed from, so a changed source series is a miss
+    that replaces the old entry. Eviction is LRU by estimated memory size.
+    """
+
+    def __init__(self, max_bytes: int = DERIVED_CACHE_MAX_BYTES):
+        self._entries = _SizedLRU(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+
+    def get(self, kind: str, source: Hashable, fingerprint: str, params: Hashable = None) -> Optional[Any]:
+        entry = self._entries.get((kind, source, params))
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != fingerprint:
+            # Source candles changed since this was computed
+            self.misses += 1
+            self.invalidations += 1
+            del self._entries[(kind, source, params)]
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, kind: str, source: Hashable, fingerprint: str, value: Any, params: Hashable = None):
+        try:
+            self._entries[(kind, source, params)] = (fingerprint, value, estimate_size(value))
+        except ValueError:
+            # Larger than the whole cache
+            self.uncacheable += 1
+
+    def get_or_compute(self, kind: str, source: Hashable, fingerprint: str,
+                       compute: Callable[[], Any], params: Hashable = None) -> Any:
+        value = self.get(kind, source, fingerprint, params)
+        if value is None:
+            value = compute()
+            self.put(kind, source, fingerprint, value, params)
+        return value
+
+    async def get_or_compute_async(self, kind: str, source: Hashable, fingerprint: str,
+                                   compute: Callable[[], Awaitable[Any]], params: Hashable = None) -> Any:
+        """get_or_compute for computations run off the event loop."""
+        value = self.get(kind, source, fingerprint, params)
+        if value is None:
+            value = await compute()
+            self.put(kind, source, fingerprint, value, params)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": int(self._entries.currsize),
+            "max_bytes": int(self._entries.maxsize),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self._entries.evictions,
+            "uncacheable": self.uncacheable,
+        }
+
+
+derived_cache = DerivedResultCache()
@@ -0,0 +1,115 @@
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Most points a chart request may ask for
+MAX_POINTS_LIMIT = 5000
+# Windows a `start` is served from: the chart's own windows, within one CoinGecko granularity
+# each (<=2 days 30m, <=30 days 4h, longer 4d), up to a year back
+RANGE_DAYS = (1, 2, 7, 14, 30, 90, 180, 365)
+
+
+class Downsampler:
+    """
+    Cuts a candle frame (with its indicator columns) down to what a chart
+    displays. Indicators are computed on the full-resolution series first and
+    only the shipped rows are reduced.
+    """
+
+    @staticmethod
+    def days_for(start: int, days: int, now_ms: int) -> int:
+        """
+        The window (days) to fetch so it reaches back to `start`: the smallest of
+        RANGE_DAYS covering it, at most a year, and never shorter than `days`.
+        """
+        needed = math.ceil((now_ms - start) / DAY_MS)
+        snapped = next((d for d in RANGE_DAYS if d >= needed), RANGE_DAYS[-1])
+        return max(days, snapped)
+
+    @staticmethod
+    def window(df: pd.DataFrame, start: Optional[int] = None, end: Optional[int] = None) -> pd.DataFrame:
+        """Rows with start <= time <= end (ms), found by binary search on the sorted time column."""
+        times = df['time'].to_numpy()
+        lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side='right'))
+        return df.iloc[lo:hi].reset_index(drop=True)
+
+    @staticmethod
+    def ohlc(df: pd.DataFrame, max_points: int) -> pd.DataFrame:
+        """
+        Merges runs of consecutive candles into at most `max_points` candles:
+        first open, highest high, lowest low, last close, summed volume. Every
+        other column (the indicators) keeps its value at the run's last candle,
+        i.e. as of the merged candle's close.
+        """
+        n = len(df)
+        if n <= max_points:
+            return df.reset_index(drop=True)
+        size = math.ceil(n / max_points)
+        starts = np.arange(0, n, size)
+        ends = np.r_[starts[1:], n] - 1
+        out = {}
+        for column in df.columns:
+            values = df[column].to_numpy()
+            if column in ('time', 'open'):
+                out[column] = values[starts]
+            elif column == 'high':
+                out[column] = np.maximum.reduceat(values, starts)
+            elif column == 'low':
+                out[column] = np.minimum.reduceat(values, starts)
+            elif column == 'volume':
+                out[column] = np.add.reduceat(values, starts)
+            else:
+                out[column] = values[ends]
+        return pd.DataFrame(out)
+
+    @staticmethod
+    def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+        """
+        Largest-Triangle-Three-Buckets: indices of at most `max_points` points
+        that keep the visual shape of the line (x, y), first and last included.
+        """
+        n = len(x)
+        if n <= max_points:
+            return np.arange(n)
+        if max_points < 3:
+            return np.array([0, n - 1][:max_points])
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        # Inner points split into max_points - 2 buckets
+        edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+        selected = np.empty(max_points, dtype=np.intp)
+        selected[0] = 0
+        a = 0
+        for i in range(max_points - 2):
+            lo, hi = edges[i], edges[i + 1]
+            # The third corner is the average of the next bucket (the last point for the final bucket)
+            next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+            avg_x = x[next_lo:next_hi].mean()
+            avg_y = y[next_lo:next_hi].mean()
+            area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+            a = lo + int(np.argmax(area))
+            selected[i + 1] = a
+        selected[-1] = n - 1
+        return selected
+
+    @staticmethod
+    def lttb(df: pd.DataFrame, max_points: int, column: str = 'close') -> pd.DataFrame:
+        """The rows LTTB picks for the `column` line, whole (for line charts)."""
+        indices = Downsampler.lttb_indices(df['time'].to_numpy(), df[column].to_numpy(), max_points)
+        return df.iloc[indices].reset_index(drop=True)
+
+    @staticmethod
+    def view(df: pd.DataFrame, start: Optional[int] = None, end: Optional[int] = None,
+             max_points: Optional[int] = None, method: str = "ohlc") -> pd.DataFrame:
+        """`df` cut to [start, end], then downsampled to `max_points` with `method` (ohlc|lttb)."""
+        df = Downsampler.window(df, start, end)
+        if max_points is None:
+            return df
+        if method == "lttb":
+            return Downsampler.lttb(df, max_points)
+        return Downsampler.ohlc(df, max_points)
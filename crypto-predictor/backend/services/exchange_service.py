@@ -1,9 +1,27 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, Callable
 import ccxt.async_support as ccxt
-from typing import Optional, Dict, Any
+try:
+    import ccxt.pro as ccxtpro
+except ImportError:
+    ccxtpro = None
+
+logger = logging.getLogger(__name__)
+
+# Pooled clients nobody uses are closed after this many seconds
+EXCHANGE_IDLE_TTL = float(os.getenv("EXCHANGE_IDLE_TTL", "600"))
+EXCHANGE_SWEEP_INTERVAL = 60.0
 
 class ExchangeService:
     def __init__(self, exchange_id: str, api_key: str, secret: str, passphrase: Optional[str] = None, testnet: bool = True):
         exchange_class = getattr(ccxt, exchange_id)
+        self.exchange_id = exchange_id
+        self.testnet = testnet
         self.exchange = exchange_class({
             'apiKey': api_key,
             'secret': secret,
@@ -18,13 +36,14 @@ class ExchangeService:
                 if 'test' in self.exchange.urls:
                     self.exchange.urls['api'] = self.exchange.urls['test']
 
+    async def load_markets(self):
+        # ccxt keeps them on the instance; later calls return the loaded markets
+        return await self.exchange.load_markets()
+
     async def get_balance(self, currency: str = 'USDT') -> float:
-        try:
-            balance = await self.exchange.fetch_balance()
-            return balance.get('total', {}).get(currency, 0.0)
-        except Exception as e:
-            print(f"Error fetching balance: {e}")
-            return 0.0
+        # Errors propagate: rejected credentials must not read as an empty account
+        balance = await self.exchange.fetch_balance()
+        return balance.get('total', {}).get(currency, 0.0)
 
     async def create_market_order(self, symbol: str, side: str, amount: float):
         try:
@@ -39,5 +58,155 @@ class ExchangeService:
     async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
         return await self.exchange.fetch_ticker(symbol)
 
+    def stream_client(self):
+        """
+        ccxt.pro client on the same exchange and environment for WebSocket market
+        data, or None if ccxt.pro doesn't support the exchange.
+        """
+        exchange_class = getattr(ccxtpro, self.exchange_id, None) if ccxtpro else None
+        if exchange_class is None:
+            return None
+        client = exchange_class({'enableRateLimit': True})
+        if self.testnet and hasattr(client, 'set_sandbox_mode'):
+            client.set_sandbox_mode(True)
+        if self.exchange.markets:
+            # Reuse the markets the REST client already loaded
+            client.set_markets(self.exchange.markets, self.exchange.currencies)
+        return client
+
     async def close(self):
         await self.exchange.close()
+
+
+class ExchangePool:
+    """
+    Authenticated exchange clients shared across requests.
+
+    Clients are keyed by exchange, environment and a fingerprint of the
+    credentials, and keep their loaded markets and HTTP session between uses:
+    only the first acquire pays for creating the client, loading markets and
+    checking the connection. Holders release their lease when done; a client
+    without leases is closed once idle for `idle_ttl` seconds, and all of them
+    on shutdown.
+    """
+
+    def __init__(self, idle_ttl: float = EXCHANGE_IDLE_TTL, factory: Callable[..., ExchangeService] = ExchangeService):
+        self.idle_ttl = idle_ttl
+        self.factory = factory
+        self._clients: Dict[str, ExchangeService] = {}
+        self._leases: Dict[str, int] = {}
+        self._last_used: Dict[str, float] = {}
+        self._creating: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key(exchange_id: str, api_key: str, secret: str, passphrase: Optional[str] = None, testnet: bool = True) -> str:
+        # The credentials themselves never end up in keys, logs or stats
+        fingerprint = hashlib.sha256(f"{api_key}\0{secret}\0{passphrase or ''}".encode()).hexdigest()[:16]
+        return f"{exchange_id}:{'testnet' if testnet else 'live'}:{fingerprint}"
+
+    def _key_of(self, exchange_service: ExchangeService) -> Optional[str]:
+        for key, client in self._clients.items():
+            if client is exchange_service:
+                return key
+        return None
+
+    async def acquire(self, exchange_id: str, api_key: str, secret: str, passphrase: Optional[str] = None,
+                      testnet: bool = True) -> ExchangeService:
+        """Leases the pooled client for these credentials, creating and warming it up on first use."""
+        key = self.key(exchange_id, api_key, secret, passphrase, testnet)
+        lock = self._creating.setdefault(key, asyncio.Lock())
+        async with lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self.factory(exchange_id=exchange_id, api_key=api_key, secret=secret,
+                                      passphrase=passphrase, testnet=testnet)
+                try:
+                    await client.load_markets()
+                    # Check connection and credentials (an authenticated call)
+                    await client.get_balance()
+                except Exception:
+                    await client.close()
+                    raise
+                self._clients[key] = client
+                self.created += 1
+            else:
+                self.reused += 1
+            self._leases[key] = self._leases.get(key, 0) + 1
+            self._last_used[key] = time.monotonic()
+        return client
+
+    async def release(self, exchange_service: ExchangeService):
+        """Returns a lease. Clients that aren't pooled are closed right away."""
+        key = self._key_of(exchange_service)
+        if key is None:
+            await exchange_service.close()
+            return
+        self._leases[key] = max(0, self._leases.get(key, 0) - 1)
+        self._last_used[key] = time.monotonic()
+
+    @asynccontextmanager
+    async def client(self, exchange_id: str, api_key: str, secret: str, passphrase: Optional[str] = None,
+                     testnet: bool = True):
+        exchange_service = await self.acquire(exchange_id, api_key, secret, passphrase, testnet)
+        try:
+            yield exchange_service
+        finally:
+            await self.release(exchange_service)
+
+    async def _evict(self, key: str):
+        client = self._clients.pop(key)
+        self._leases.pop(key, None)
+        self._last_used.pop(key, None)
+        self._creating.pop(key, None)
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning("Closing exchange client %s failed: %s", key.rsplit(":", 1)[0], e)
+
+    async def sweep(self) -> int:
+        """Closes the clients idle for longer than idle_ttl. Returns how many."""
+        now = time.monotonic()
+        idle = [
+            key for key in self._clients
+            if not self._leases.get(key) and now - self._last_used.get(key, now) >= self.idle_ttl
+        ]
+        for key in idle:
+            await self._evict(key)
+        self.evicted += len(idle)
+        return len(idle)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(EXCHANGE_SWEEP_INTERVAL)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning("Exchange pool sweep failed: %s", e)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for key in list(self._clients):
+            await self._evict(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._clients),
+            "leased": sum(1 for count in self._leases.values() if count),
+            "created": self.created,
+            "reused": self.reused,
+            "evicted": self.evicted,
+        }
+
+
+exchange_pool = ExchangePool()
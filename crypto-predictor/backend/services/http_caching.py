@@ -0,0 +1,149 @@
+import gzip
+import hashlib
+import importlib.util
+import os
+from typing import Any, Optional
+
+from fastapi import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Brotli needs the optional 'brotli' package; gzip is used without it
+BROTLI_ENABLED = importlib.util.find_spec("brotli") is not None
+if BROTLI_ENABLED:
+    import brotli
+
+# Bodies smaller than this are sent as they are
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Polling clients always revalidate, and get a 304 while the data is unchanged
+REVALIDATE = "no-cache"
+
+_ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag for a response identified by its source data version and parameters."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header names `etag`. Tags the compression
+    middleware suffixed with the encoding match their uncompressed original.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        for suffix in _ENCODING_SUFFIXES:
+            if tag.endswith(suffix + '"'):
+                tag = tag[:-len(suffix) - 1] + '"'
+                break
+        if tag == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str, vary: Optional[str] = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=304, headers=headers)
+
+
+def versioned(response: Response, etag: str) -> Response:
+    """Sets the validators on a 200 response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE
+    return response
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br when available and accepted, else gzip when accepted, else None."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in (("br",) if BROTLI_ENABLED else ()) + ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies of at least `minimum_size` bytes with brotli or
+    gzip, whichever the client accepts (brotli preferred). Streamed responses
+    and bodies that are already encoded pass through unchanged.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                passthrough = "content-encoding" in Headers(raw=start["headers"])
+                if passthrough:
+                    await send(start)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streaming or small: send as is from here on
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            etag = headers.get("etag")
+            if etag and etag.endswith('"') and not etag.startswith("W/"):
+                # A strong tag names exact bytes, so each encoding gets its own
+                headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
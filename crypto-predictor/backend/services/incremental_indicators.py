@@ -0,0 +1,393 @@
+import copy
+import math
+import threading
+from collections import deque
+from typing import Hashable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+try:
+    from .indicator_kernel import INDICATOR_COLUMNS, INDICATOR_PARAMS, OHLCV_COLUMNS
+    from .derived_cache import derived_cache, frame_fingerprint
+    from .compute_executor import compute_executor
+    from .indicators import IndicatorService
+    from .request_coalescing import SingleFlight
+except ImportError:
+    from services.indicator_kernel import INDICATOR_COLUMNS, INDICATOR_PARAMS, OHLCV_COLUMNS
+    from services.derived_cache import derived_cache, frame_fingerprint
+    from services.compute_executor import compute_executor
+    from services.indicators import IndicatorService
+    from services.request_coalescing import SingleFlight
+
+NAN = float('nan')
+EPSILON = float(np.finfo(float).eps)
+
+# One engine per (coin, timeframe) series
+indicator_engines = LRUCache(maxsize=256)
+_engines_lock = threading.Lock()
+# Concurrent misses for the same candles share one off-loop computation
+_indicator_flights = SingleFlight()
+
+
+def _non_zero(value: float) -> float:
+    # Same guard as pandas_ta's non_zero_range
+    return value if value != 0 else EPSILON
+
+
+def _pct_change(value: float, prev: float) -> float:
+    if math.isnan(prev):
+        return NAN
+    if prev == 0:
+        return NAN if value == 0 else math.copysign(math.inf, value)
+    return value / prev - 1
+
+
+class _SMA:
+    """Simple moving average over a fixed window, kept as a running sum."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.total = 0.0
+
+    def update(self, value: float) -> float:
+        if len(self.window) == self.length:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+        if len(self.window) < self.length:
+            return NAN
+        return self.total / self.length
+
+
+class _EMA:
+    """pandas_ta ema: seeded with the SMA of the first `length` values, then adjust=False."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self.seed = 0.0
+        self.value = NAN
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        if self.count < self.length:
+            self.seed += value
+            return NAN
+        if self.count == self.length:
+            self.value = (self.seed + value) / self.length
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class _RMA:
+    """pandas_ta rma (Wilder smoothing): ewm(alpha=1/length, min_periods=length), adjust=True."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.count = 0
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        self.weighted_sum = self.weighted_sum * self.decay + value
+        self.weight = self.weight * self.decay + 1.0
+        if self.count < self.length:
+            return NAN
+        return self.weighted_sum / self.weight
+
+
+class _RollingExtreme:
+    """Rolling min or max using a monotonic deque (amortised O(1) per update)."""
+
+    def __init__(self, length: int, use_max: bool):
+        self.length = length
+        self.use_max = use_max
+        self.index = 0
+        self.candidates = deque()
+
+    def update(self, value: float) -> float:
+        candidates = self.candidates
+        if self.use_max:
+            while candidates and candidates[-1][1] <= value:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] >= value:
+                candidates.pop()
+        candidates.append((self.index, value))
+        if candidates[0][0] <= self.index - self.length:
+            candidates.popleft()
+        self.index += 1
+        if self.index < self.length:
+            return NAN
+        return candidates[0][1]
+
+
+class _IndicatorState:
+    """Running state of every indicator produced by IndicatorService.compute_all."""
+
+    def __init__(self):
+        self.prev_close = NAN
+        self.prev_volume = NAN
+        # RSI (14)
+        self.rsi_gain = _RMA(14)
+        self.rsi_loss = _RMA(14)
+        # MACD (12, 26, 9)
+        self.ema_12 = _EMA(12)
+        self.ema_26 = _EMA(26)
+        self.macd_signal = _EMA(9)
+        # Bollinger Bands (20, 2) and SMA 20/50
+        self.bb_window = deque(maxlen=20)
+        self.sma_20 = _SMA(20)
+        self.sma_50 = _SMA(50)
+        # EMA 9/21
+        self.ema_9 = _EMA(9)
+        self.ema_21 = _EMA(21)
+        # Stochastic (14, 3, 3) and Williams %R (14) share the 14-bar high/low
+        self.highest_14 = _RollingExtreme(14, use_max=True)
+        self.lowest_14 = _RollingExtreme(14, use_max=False)
+        self.stoch_k = _SMA(3)
+        self.stoch_d = _SMA(3)
+        # ATR (14)
+        self.atr = _RMA(14)
+        # CCI (20)
+        self.typical_window = deque(maxlen=20)
+
+    def clone(self) -> '_IndicatorState':
+        return copy.deepcopy(self)
+
+    def update(self, open_: float, high: float, low: float, close: float, volume: float) -> List[float]:
+        """Folds one candle into the state and returns its row of INDICATOR_COLUMNS."""
+        prev_close = self.prev_close
+
+        # RSI: the first candle has no diff, which pandas_ta treats as a leading NaN
+        rsi = NAN
+        if not math.isnan(prev_close):
+            diff = close - prev_close
+            gain = self.rsi_gain.update(diff if diff > 0 else 0.0)
+            loss = self.rsi_loss.update(-diff if diff < 0 else 0.0)
+            if gain + loss != 0:
+                rsi = 100 * gain / (gain + loss)
+
+        # MACD: the signal line only starts once the MACD line is valid
+        macd = self.ema_12.update(close) - self.ema_26.update(close)
+        macd_signal = NAN
+        if not math.isnan(macd):
+            macd_signal = self.macd_signal.update(macd)
+        macd_hist = macd - macd_signal
+
+        # Bollinger Bands (population std, like pandas_ta)
+        sma_20 = self.sma_20.update(close)
+        self.bb_window.append(close)
+        bbl = bbm = bbu = bbb = bbp = NAN
+        if len(self.bb_window) == 20:
+            bbm = sma_20
+            variance = sum((x - bbm) ** 2 for x in self.bb_window) / 20
+            deviation = 2 * math.sqrt(variance)
+            bbl = bbm - deviation
+            bbu = bbm + deviation
+            band_range = _non_zero(bbu - bbl)
+            bbb = 100 * band_range / bbm if bbm != 0 else NAN
+            bbp = _non_zero(close - bbl) / band_range
+
+        sma_50 = self.sma_50.update(close)
+        ema_9 = self.ema_9.update(close)
+        ema_21 = self.ema_21.update(close)
+
+        # Stochastic and Williams %R
+        highest = self.highest_14.update(high)
+        lowest = self.lowest_14.update(low)
+        stoch_k = stoch_d = willr = NAN
+        if not math.isnan(highest):
+            stoch_raw = 100 * (close - lowest) / _non_zero(highest - lowest)
+            stoch_k = self.stoch_k.update(stoch_raw)
+            if not math.isnan(stoch_k):
+                stoch_d = self.stoch_d.update(stoch_k)
+            if highest != lowest:
+                willr = 100 * ((close - lowest) / (highest - lowest) - 1)
+
+        # ATR: true range is undefined for the first candle
+        atr = NAN
+        if not math.isnan(prev_close):
+            true_range = max(abs(_non_zero(high - low)), abs(high - prev_close), abs(prev_close - low))
+            atr = self.atr.update(true_range)
+
+        # CCI
+        typical = (high + low + close) / 3
+        self.typical_window.append(typical)
+        cci = NAN
+        if len(self.typical_window) == 20:
+            mean_typical = sum(self.typical_window) / 20
+            mad = sum(abs(x - mean_typical) for x in self.typical_window) / 20
+            if mad != 0:
+                cci = (typical - mean_typical) / (0.015 * mad)
+
+        vol_change = _pct_change(volume, self.prev_volume)
+        price_change = _pct_change(close, prev_close)
+
+        self.prev_close = close
+        self.prev_volume = volume
+
+        return [
+            rsi,
+            macd, macd_hist, macd_signal,
+            bbl, bbm, bbu, bbb, bbp,
+            sma_20, sma_50,
+            ema_9, ema_21,
+            stoch_k, stoch_d,
+            atr,
+            willr,
+            cci,
+            vol_change, price_change,
+        ]
+
+
+class IncrementalIndicatorEngine:
+    """
+    Keeps the indicator state of one candle series and folds in new or updated
+    candles instead of recomputing the full history.
+
+    The state is held up to (but excluding) the newest candle, because the newest
+    candle is usually still forming and may be revised by the next fetch. Output
+    always equals IndicatorService.compute_all over the candles passed in.
+    """
+
+    def __init__(self):
+        self.rebuilds = 0
+        self.candles_folded = 0
+        # update() may run on compute executor threads
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._committed = _IndicatorState()
+        self._times = np.empty(0, dtype=np.int64)
+        self._ohlcv = np.empty((0, len(OHLCV_COLUMNS)))
+        self._values = np.empty((0, len(INDICATOR_COLUMNS)))
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns `df` sorted by time with all indicator columns, folding in only
+        the candles that were appended or changed since the previous call.
+        """
+        with self._lock:
+            return self._update(df)
+
+    def _update(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.sort_values('time').reset_index(drop=True)
+        times = df['time'].to_numpy(dtype=np.int64)
+        ohlcv = df[OHLCV_COLUMNS].to_numpy(dtype=float)
+
+        start = self._match(times, ohlcv)
+        # A window that slid forward is rebuilt as well: state carried over from the candles
+        # that left it would make its indicators differ from a computation over the window alone
+        if start is None or start > 0:
+            self.reset()
+            self.rebuilds += 1
+            self._fold(times, ohlcv, 0)
+        else:
+            self._fold(times, ohlcv, len(self._times) - 1)
+
+        values = pd.DataFrame(self._values, columns=INDICATOR_COLUMNS, index=df.index)
+        return pd.concat([df.drop(columns=INDICATOR_COLUMNS, errors='ignore'), values], axis=1)
+
+    def _match(self, times: np.ndarray, ohlcv: np.ndarray) -> Optional[int]:
+        """
+        Finds where `times` starts within the stored series. Returns None when the
+        new candles are not a continuation of the stored ones and a rebuild is needed.
+        """
+        stored = len(self._times)
+        if stored == 0 or len(times) == 0:
+            return None
+        start = int(np.searchsorted(self._times, times[0]))
+        overlap = stored - start
+        if start >= stored or self._times[start] != times[0] or len(times) < overlap:
+            return None
+        # Everything before the stored newest candle must be unchanged
+        settled = overlap - 1
+        if not (np.array_equal(self._times[start:], times[:overlap])
+                and np.array_equal(self._ohlcv[start:start + settled], ohlcv[:settled])):
+            return None
+        return start
+
+    def _fold(self, times: np.ndarray, ohlcv: np.ndarray, first: int):
+        """Recomputes rows `first`.. from the committed state; `first` is the stored newest candle."""
+        first = max(first, 0)
+        if len(self._times) and first == len(self._times) - 1 and len(times) == len(self._times) \
+                and np.array_equal(self._ohlcv[first], ohlcv[first]):
+            return
+
+        rows = [None] * (len(times) - first)
+        last = len(times) - 1
+        for i in range(first, last):
+            rows[i - first] = self._committed.update(*ohlcv[i])
+        if last >= first:
+            rows[-1] = self._committed.clone().update(*ohlcv[last])
+        self.candles_folded += len(rows)
+
+        values = np.asarray(rows, dtype=float).reshape(len(rows), len(INDICATOR_COLUMNS))
+        self._values = np.concatenate([self._values[:first], values])
+        self._times = times.copy()
+        self._ohlcv = ohlcv.copy()
+
+
+class IncrementalIndicatorService:
+    @staticmethod
+    def get_engine(key: Hashable) -> IncrementalIndicatorEngine:
+        with _engines_lock:
+            engine = indicator_engines.get(key)
+            if engine is None:
+                engine = IncrementalIndicatorEngine()
+                indicator_engines[key] = engine
+            return engine
+
+    @staticmethod
+    def compute_all(key: Hashable, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Same output as IndicatorService.compute_all, but reuses the running state
+        kept for `key` (e.g. (coin_id, vs_currency, days)) so only appended or
+        updated candles are computed.
+        """
+        return IncrementalIndicatorService.get_engine(key).update(df)
+
+    @staticmethod
+    async def compute_async(key: Hashable, df: pd.DataFrame, fingerprint: Optional[str] = None,
+                            columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Indicators of `df` computed on the compute executor, so they don't block
+        the event loop, and reused from the derived-result cache while the candles
+        are unchanged. Only the indicator `columns` the caller reads are computed,
+        by the vectorized kernel. Without `columns` every indicator is: folded into
+        the running state kept for `key` where the executor shares it, else
+        recomputed with the kernel.
+        """
+        fingerprint = fingerprint or frame_fingerprint(df)
+        cached = derived_cache.get("indicators", key, fingerprint, INDICATOR_PARAMS)
+        if cached is not None:
+            return cached
+        subset = None if columns is None else tuple(columns)
+        params = INDICATOR_PARAMS if subset is None else (INDICATOR_PARAMS, subset)
+        if subset is not None:
+            cached = derived_cache.get("indicators", key, fingerprint, params)
+            if cached is not None:
+                return cached
+
+        async def compute() -> pd.DataFrame:
+            if subset is not None:
+                result = await compute_executor.run(IndicatorService.compute, df, subset)
+            elif compute_executor.shares_state:
+                result = await compute_executor.run(IncrementalIndicatorService.compute_all, key, df)
+            else:
+                result = await compute_executor.run(IndicatorService.compute_all, df)
+            derived_cache.put("indicators", key, fingerprint, result, params)
+            return result
+
+        return await _indicator_flights.do((key, fingerprint, subset), compute)
@@ -0,0 +1,349 @@
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# Output columns, in the same order IndicatorService.compute_all appends them
+INDICATOR_COLUMNS = [
+    'RSI',
+    'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9',
+    'BBL_20_2.0', 'BBM_20_2.0', 'BBU_20_2.0', 'BBB_20_2.0', 'BBP_20_2.0',
+    'SMA_20', 'SMA_50',
+    'EMA_9', 'EMA_21',
+    'STOCHk_14_3_3', 'STOCHd_14_3_3',
+    'ATR',
+    'WILLR',
+    'CCI',
+    'vol_change', 'price_change',
+]
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+COLUMN_INDEX = {name: i for i, name in enumerate(INDICATOR_COLUMNS)}
+
+# Parameters baked into compute_indicator_matrix. Cached indicator results are keyed
+# on this, so update it together with the kernel.
+INDICATOR_PARAMS = "RSI14|MACD12,26,9|BB20,2|SMA20,50|EMA9,21|STOCH14,3,3|ATR14|WILLR14|CCI20"
+
+EPSILON = np.finfo(float).eps
+
+# All helpers below work along the last axis, so a (coins, time) matrix is
+# computed in the same call as a single series. Leading NaNs are described by
+# `start`, the index of the first valid input value, which is shared by every row.
+
+
+def _non_zero(x: np.ndarray) -> np.ndarray:
+    # Same guard as pandas_ta's non_zero_range
+    return np.where(x == 0, EPSILON, x)
+
+
+def _nan_like(x: np.ndarray) -> np.ndarray:
+    return np.full(x.shape, np.nan)
+
+
+def rolling_mean(x: np.ndarray, length: int, start: int = 0) -> np.ndarray:
+    """Simple moving average; the first `length - 1` valid positions are NaN."""
+    out = _nan_like(x)
+    valid = x[..., start:]
+    if valid.shape[-1] < length:
+        return out
+    csum = np.cumsum(valid, axis=-1)
+    sums = csum[..., length - 1:].copy()
+    sums[..., 1:] -= csum[..., :-length]
+    out[..., start + length - 1:] = sums / length
+    return out
+
+
+def rolling_window(x: np.ndarray, length: int) -> np.ndarray:
+    """Read-only (..., n - length + 1, length) view of the trailing windows."""
+    return sliding_window_view(x, length, axis=-1)
+
+
+def ema(x: np.ndarray, length: int, start: int = 0) -> np.ndarray:
+    """pandas_ta ema: seeded with the SMA of the first `length` values, then adjust=False."""
+    out = _nan_like(x)
+    seed_at = start + length - 1
+    if x.shape[-1] <= seed_at:
+        return out
+    alpha = 2.0 / (length + 1)
+    seed = x[..., start:seed_at + 1].mean(axis=-1)
+    out[..., seed_at] = seed
+    if x.shape[-1] > seed_at + 1:
+        zi = ((1 - alpha) * seed)[..., np.newaxis]
+        out[..., seed_at + 1:], _ = lfilter([alpha], [1.0, alpha - 1.0], x[..., seed_at + 1:], axis=-1, zi=zi)
+    return out
+
+
+def rma(x: np.ndarray, length: int, start: int = 0) -> np.ndarray:
+    """pandas_ta rma (Wilder smoothing): ewm(alpha=1/length, min_periods=length), adjust=True."""
+    out = _nan_like(x)
+    n = x.shape[-1] - start
+    if n < length:
+        return out
+    decay = 1.0 - 1.0 / length
+    weighted = lfilter([1.0], [1.0, -decay], x[..., start:], axis=-1)
+    # Sum of the weights decay**0 + ... + decay**t, in closed form
+    weights = (1.0 - decay ** np.arange(1, n + 1)) / (1.0 - decay)
+    out[..., start:] = weighted / weights
+    out[..., start:start + length - 1] = np.nan
+    return out
+
+
+def pct_change(x: np.ndarray) -> np.ndarray:
+    out = _nan_like(x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[..., 1:] = x[..., 1:] / x[..., :-1] - 1
+    return out
+
+
+# Indicator graph: node name -> (input node names, function of those inputs).
+# Inputs are other nodes or the raw OHLCV columns; the INDICATOR_COLUMNS are
+# nodes like any other, and intermediates (close diff, typical price, the 14-bar
+# high/low...) are computed once for every indicator that reads them.
+_NODES: Dict[str, Tuple[Tuple[str, ...], Callable[..., np.ndarray]]] = {}
+
+
+def indicator_node(name: str, *inputs: str):
+    """Registers the decorated function as the node `name`, computed from `inputs`."""
+    def register(fn: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        _NODES[name] = (inputs, fn)
+        return fn
+    return register
+
+
+# Close-to-close diff, shared by RSI, ATR and price_change
+@indicator_node('prev_close', 'close')
+def _prev_close(close):
+    prev_close = _nan_like(close)
+    prev_close[..., 1:] = close[..., :-1]
+    return prev_close
+
+
+@indicator_node('diff', 'close', 'prev_close')
+def _diff(close, prev_close):
+    return close - prev_close
+
+
+# RSI (14)
+@indicator_node('RSI', 'diff')
+def _rsi(diff):
+    gain = rma(np.where(diff > 0, diff, 0.0), 14, start=1)
+    loss = rma(np.where(diff < 0, -diff, 0.0), 14, start=1)
+    return 100 * gain / (gain + loss)
+
+
+# MACD (12, 26, 9): the signal EMA starts at the first valid MACD value
+@indicator_node('MACD_12_26_9', 'close')
+def _macd(close):
+    return ema(close, 12) - ema(close, 26)
+
+
+@indicator_node('MACDs_12_26_9', 'MACD_12_26_9')
+def _macd_signal(macd):
+    return ema(macd, 9, start=min(25, macd.shape[-1]))
+
+
+@indicator_node('MACDh_12_26_9', 'MACD_12_26_9', 'MACDs_12_26_9')
+def _macd_hist(macd, signal):
+    return macd - signal
+
+
+# SMA 20 doubles as the Bollinger middle band
+@indicator_node('SMA_20', 'close')
+def _sma_20(close):
+    return rolling_mean(close, 20)
+
+
+@indicator_node('SMA_50', 'close')
+def _sma_50(close):
+    return rolling_mean(close, 50)
+
+
+# Bollinger Bands (20, 2), population std like pandas_ta
+@indicator_node('bb_deviation', 'close', 'SMA_20')
+def _bb_deviation(close, sma_20):
+    deviation = _nan_like(close)
+    if close.shape[-1] >= 20:
+        centred = rolling_window(close, 20) - sma_20[..., 19:, np.newaxis]
+        deviation[..., 19:] = 2 * np.sqrt((centred * centred).mean(axis=-1))
+    return deviation
+
+
+@indicator_node('BBL_20_2.0', 'SMA_20', 'bb_deviation')
+def _bbl(sma_20, deviation):
+    return sma_20 - deviation
+
+
+@indicator_node('BBM_20_2.0', 'SMA_20')
+def _bbm(sma_20):
+    return sma_20
+
+
+@indicator_node('BBU_20_2.0', 'SMA_20', 'bb_deviation')
+def _bbu(sma_20, deviation):
+    return sma_20 + deviation
+
+
+@indicator_node('bb_range', 'BBL_20_2.0', 'BBU_20_2.0')
+def _bb_range(bbl, bbu):
+    return _non_zero(bbu - bbl)
+
+
+@indicator_node('BBB_20_2.0', 'bb_range', 'SMA_20')
+def _bbb(band_range, sma_20):
+    return 100 * band_range / sma_20
+
+
+@indicator_node('BBP_20_2.0', 'close', 'BBL_20_2.0', 'bb_range')
+def _bbp(close, bbl, band_range):
+    return _non_zero(close - bbl) / band_range
+
+
+# EMA 9/21
+@indicator_node('EMA_9', 'close')
+def _ema_9(close):
+    return ema(close, 9)
+
+
+@indicator_node('EMA_21', 'close')
+def _ema_21(close):
+    return ema(close, 21)
+
+
+# 14-bar highest high / lowest low, shared by Stochastic and Williams %R
+@indicator_node('highest_14', 'high')
+def _highest_14(high):
+    highest = _nan_like(high)
+    if high.shape[-1] >= 14:
+        highest[..., 13:] = rolling_window(high, 14).max(axis=-1)
+    return highest
+
+
+@indicator_node('lowest_14', 'low')
+def _lowest_14(low):
+    lowest = _nan_like(low)
+    if low.shape[-1] >= 14:
+        lowest[..., 13:] = rolling_window(low, 14).min(axis=-1)
+    return lowest
+
+
+@indicator_node('from_low', 'close', 'lowest_14')
+def _from_low(close, lowest):
+    return close - lowest
+
+
+@indicator_node('hl_range', 'highest_14', 'lowest_14')
+def _hl_range(highest, lowest):
+    return highest - lowest
+
+
+# Stochastic (14, 3, 3)
+@indicator_node('STOCHk_14_3_3', 'from_low', 'hl_range')
+def _stoch_k(from_low, hl_range):
+    return rolling_mean(100 * from_low / _non_zero(hl_range), 3, start=13)
+
+
+@indicator_node('STOCHd_14_3_3', 'STOCHk_14_3_3')
+def _stoch_d(stoch_k):
+    return rolling_mean(stoch_k, 3, start=15)
+
+
+# Williams %R (14)
+@indicator_node('WILLR', 'from_low', 'hl_range')
+def _willr(from_low, hl_range):
+    return 100 * (from_low / hl_range - 1)
+
+
+# ATR (14): true range is undefined for the first candle
+@indicator_node('ATR', 'high', 'low', 'prev_close')
+def _atr(high, low, prev_close):
+    true_range = np.maximum(np.abs(_non_zero(high - low)),
+                            np.maximum(np.abs(high - prev_close), np.abs(prev_close - low)))
+    return rma(true_range, 14, start=1)
+
+
+# CCI (20) on the typical price
+@indicator_node('typical', 'high', 'low', 'close')
+def _typical(high, low, close):
+    return (high + low + close) / 3
+
+
+@indicator_node('CCI', 'typical')
+def _cci(typical):
+    typical_mean = rolling_mean(typical, 20)
+    mad = _nan_like(typical)
+    if typical.shape[-1] >= 20:
+        windows = rolling_window(typical, 20)
+        mad[..., 19:] = np.abs(windows - typical_mean[..., 19:, np.newaxis]).mean(axis=-1)
+    return (typical - typical_mean) / (0.015 * mad)
+
+
+# Volume trend inputs
+@indicator_node('vol_change', 'volume')
+def _vol_change(volume):
+    return pct_change(volume)
+
+
+@indicator_node('price_change', 'diff', 'prev_close')
+def _price_change(diff, prev_close):
+    return diff / prev_close
+
+
+@lru_cache(maxsize=64)
+def plan(columns: Tuple[str, ...]) -> Tuple[str, ...]:
+    """The nodes `columns` need, each after its inputs."""
+    order: List[str] = []
+    seen = set(OHLCV_COLUMNS)
+
+    def visit(name: str):
+        if name in seen:
+            return
+        if name not in _NODES:
+            raise ValueError(f"Unknown indicator: {name}")
+        seen.add(name)
+        for dependency in _NODES[name][0]:
+            visit(dependency)
+        order.append(name)
+
+    for column in columns:
+        visit(column)
+    return tuple(order)
+
+
+def compute_indicators(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                       volume: np.ndarray, columns: Sequence[str] = INDICATOR_COLUMNS,
+                       values: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+    """
+    Computes `columns` and only the nodes they depend on. Returns every node
+    computed, intermediates included; pass the result back as `values` to
+    compute more columns from the same candles without repeating shared work.
+    """
+    values = {} if values is None else values
+    for name, series in zip(OHLCV_COLUMNS, (open_, high, low, close, volume)):
+        values.setdefault(name, np.asarray(series, dtype=np.float64))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name in plan(tuple(columns)):
+            if name not in values:
+                inputs, fn = _NODES[name]
+                values[name] = fn(*(values[i] for i in inputs))
+    return values
+
+
+def compute_indicator_matrix(open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                             close: np.ndarray, volume: np.ndarray,
+                             columns: Sequence[str] = INDICATOR_COLUMNS) -> np.ndarray:
+    """
+    Computes the IndicatorService.compute_all `columns` (default: all of them)
+    in one pass over the indicator graph.
+
+    Inputs are float64 arrays of shape (n,) or (coins, n), sorted by time.
+    Returns an array of shape input.shape + (len(columns),) whose columns are
+    each contiguous in memory.
+    """
+    values = compute_indicators(open_, high, low, close, volume, columns)
+    buffer = np.empty((len(columns),) + values['close'].shape)
+    for i, name in enumerate(columns):
+        buffer[i] = values[name]
+    return np.moveaxis(buffer, 0, -1)
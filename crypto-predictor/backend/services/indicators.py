@@ -1,12 +1,42 @@
+from typing import Sequence
+
 import pandas as pd
-import pandas_ta as ta
+try:
+    from .indicator_kernel import INDICATOR_COLUMNS, OHLCV_COLUMNS, compute_indicator_matrix
+except ImportError:
+    from services.indicator_kernel import INDICATOR_COLUMNS, OHLCV_COLUMNS, compute_indicator_matrix
 
 class IndicatorService:
     @staticmethod
     def compute_all(df: pd.DataFrame) -> pd.DataFrame:
         """
         Computes all required TA indicators on the provided OHLCV DataFrame.
+        Thin wrapper around the vectorized NumPy kernel in indicator_kernel.
+        """
+        return IndicatorService.compute(df)
+
+    @staticmethod
+    def compute(df: pd.DataFrame, columns: Sequence[str] = INDICATOR_COLUMNS) -> pd.DataFrame:
         """
+        compute_all limited to `columns`: only the indicators they depend on are
+        computed, so callers needing a few columns don't pay for the rest.
+        """
+        # Ensure data is sorted by time
+        df = df.sort_values('time').reset_index(drop=True)
+
+        columns = list(columns)
+        values = compute_indicator_matrix(*(df[col].to_numpy(dtype=float) for col in OHLCV_COLUMNS), columns=columns)
+        indicators = pd.DataFrame(values, columns=columns, index=df.index)
+        return pd.concat([df.drop(columns=columns, errors='ignore'), indicators], axis=1)
+
+    @staticmethod
+    def compute_all_pandas_ta(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Reference implementation with one pandas_ta call per indicator.
+        Kept for parity tests and benchmarks against the NumPy kernel.
+        """
+        import pandas_ta as ta
+
         # Ensure data is sorted by time
         df = df.sort_values('time').reset_index(drop=True)
 
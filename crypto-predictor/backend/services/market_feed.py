@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+CANDLE_MS = 60 * 1000
+# stream: WebSocket market data with REST polling as fallback; poll: REST polling only
+SCALPER_FEED = os.getenv("SCALPER_FEED", "stream")
+# Seconds of REST polling after streaming failed before it is tried again
+STREAM_RETRY_AFTER = float(os.getenv("SCALPER_STREAM_RETRY_AFTER", "300"))
+# A candle without updates is closed this many seconds after its interval ends
+STREAM_CLOSE_GRACE = 1.0
+
+Candle = List[float]  # [time, open, high, low, close, volume]
+
+
+class StreamingUnavailable(Exception):
+    """The exchange has no WebSocket market data we can use."""
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class CandleBuilder:
+    """
+    Builds fixed-interval candles from trades or from kline updates of the
+    forming candle. A candle closes when data for a later interval arrives (or
+    on close_until); intervals without any data become flat zero-volume candles.
+    """
+
+    def __init__(self, interval_ms: int = CANDLE_MS):
+        self.interval_ms = interval_ms
+        self.current: Optional[Candle] = None
+        self.last_closed: Optional[Candle] = None
+
+    def _close_before(self, start: int) -> List[Candle]:
+        closed = []
+        if self.current is not None and self.current[0] < start:
+            closed.append(self.current)
+            self.last_closed = self.current
+            self.current = None
+        if self.current is None and self.last_closed is not None:
+            t = self.last_closed[0] + self.interval_ms
+            while t < start:
+                price = self.last_closed[4]
+                self.last_closed = [t, price, price, price, price, 0.0]
+                closed.append(self.last_closed)
+                t += self.interval_ms
+        return closed
+
+    def add_trade(self, timestamp: int, price: float, amount: float) -> List[Candle]:
+        """Folds in a trade. Returns the candles it closed."""
+        start = timestamp // self.interval_ms * self.interval_ms
+        closed = self._close_before(start)
+        if self.last_closed is not None and start <= self.last_closed[0]:
+            # Late trade for a candle that is already closed
+            return closed
+        if self.current is None:
+            self.current = [start, price, price, price, price, amount]
+        else:
+            current = self.current
+            current[2] = max(current[2], price)
+            current[3] = min(current[3], price)
+            current[4] = price
+            current[5] += amount
+        return closed
+
+    def add_kline(self, candle: Candle) -> List[Candle]:
+        """Replaces the forming candle with an exchange kline update. Returns the candles it closed."""
+        start = int(candle[0])
+        if self.current is not None and start < self.current[0]:
+            return []
+        closed = self._close_before(start)
+        if self.last_closed is not None and start <= self.last_closed[0]:
+            return closed
+        self.current = [start, *map(float, candle[1:6])]
+        return closed
+
+    def close_until(self, now_ms: int) -> List[Candle]:
+        """Closes every candle whose interval ended by `now_ms`."""
+        return self._close_before(now_ms // self.interval_ms * self.interval_ms)
+
+    def close_deadline(self) -> Optional[float]:
+        """Unix time by which the forming candle is closed even without new data."""
+        if self.current is None:
+            return None
+        return (self.current[0] + self.interval_ms) / 1000 + STREAM_CLOSE_GRACE
+
+
+class MarketDataFeed:
+    """
+    WebSocket market data for one exchange through ccxt.pro. Every symbol's
+    subscription shares the client's connection; 1m candles are built locally
+    from klines (or trades where the exchange streams no klines).
+    """
+
+    def __init__(self, client: Any):
+        has = getattr(client, "has", {}) or {}
+        if has.get("watchOHLCV"):
+            self.method = "ohlcv"
+            # Return the cached candles rather than only those updated since the last call:
+            # the final update of a candle can arrive together with the first of the next one
+            client.newUpdates = False
+        elif has.get("watchTrades"):
+            self.method = "trades"
+        else:
+            raise StreamingUnavailable(f"{client.id} streams neither klines nor trades")
+        self.client = client
+        self.updates = 0
+
+    @staticmethod
+    def open(exchange_service: Any) -> "MarketDataFeed":
+        client = exchange_service.stream_client()
+        if client is None:
+            raise StreamingUnavailable(f"No WebSocket client for {exchange_service.exchange.id}")
+        return MarketDataFeed(client)
+
+    async def _watch(self, symbol: str) -> List[Any]:
+        if self.method == "ohlcv":
+            return await self.client.watch_ohlcv(symbol, "1m")
+        return await self.client.watch_trades(symbol)
+
+    async def candles(self, symbol: str) -> AsyncIterator[Tuple[List[Candle], Optional[Candle]]]:
+        """Yields (newly closed candles, forming candle) on every update of `symbol`."""
+        builder = CandleBuilder()
+        pending: Optional[asyncio.Future] = None
+        # Trades only cover the first interval from the moment of subscribing
+        partial_first = self.method == "trades"
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(self._watch(symbol))
+                deadline = builder.close_deadline()
+                timeout = None if deadline is None else max(0.0, deadline - time.time())
+                # Don't cancel the watch on a timeout: ccxt keeps delivering to the same subscription
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                closed: List[Candle] = []
+                if not done:
+                    closed = builder.close_until(_now_ms())
+                else:
+                    updates, pending = pending.result(), None
+                    self.updates += 1
+                    if self.method == "ohlcv":
+                        # The candle that may just have closed and the forming one
+                        for candle in updates[-2:]:
+                            closed += builder.add_kline(candle)
+                    else:
+                        for trade in updates:
+                            closed += builder.add_trade(trade["timestamp"], trade["price"], trade["amount"])
+                if partial_first and closed:
+                    closed, partial_first = closed[1:], False
+                yield closed, builder.current
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def close(self):
+        await self.client.close()
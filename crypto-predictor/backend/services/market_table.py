@@ -0,0 +1,103 @@
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from cachetools import TTLCache
+
+# Coins kept in the table from startup; others join it the first time they are asked for
+TRACKED_COINS = [c.strip() for c in os.getenv(
+    "TRACKED_COINS",
+    "bitcoin,ethereum,binancecoin,solana,ripple,cardano,dogecoin,avalanche-2,polkadot,chainlink",
+).split(",") if c.strip()]
+
+# Most coins /coins/markets returns per page
+MARKETS_PAGE_SIZE = 250
+
+
+class MarketTable:
+    """
+    Market overview rows of the tracked coins, indexed by coin id and by
+    symbol. Rows come from CoinGecko's /coins/markets listing, a page of up to
+    MARKETS_PAGE_SIZE coins per call, rather than one /coins/{id} document each.
+    """
+
+    def __init__(self, tracked: Iterable[str] = (), miss_ttl: float = 60):
+        # Insertion-ordered set of coin ids
+        self.tracked: Dict[str, None] = dict.fromkeys(tracked)
+        # Ids the listing didn't know, not asked for again until they expire
+        self._unlisted = TTLCache(maxsize=10_000, ttl=miss_ttl)
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._by_symbol: Dict[str, str] = {}
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.rows_loaded = 0
+
+    def pages(self, coin_ids: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """`coin_ids` (default: every tracked coin) split into /coins/markets pages."""
+        ids = list(self.tracked if coin_ids is None else coin_ids)
+        return [ids[i:i + MARKETS_PAGE_SIZE] for i in range(0, len(ids), MARKETS_PAGE_SIZE)]
+
+    def update(self, rows: Iterable[Dict[str, Any]], requested: Iterable[str] = ()):
+        """Stores listed rows; their coins are tracked from then on."""
+        rows = list(rows)
+        for coin_id in set(requested).difference(row["id"] for row in rows):
+            self._unlisted[coin_id] = True
+        for row in rows:
+            coin_id = row["id"]
+            self._rows[coin_id] = row
+            self.tracked[coin_id] = None
+            # A symbol can be shared; the listing comes by market cap, so the biggest coin keeps it
+            symbol = row["symbol"].lower()
+            owner = self._rows.get(self._by_symbol.get(symbol))
+            if owner is None or owner is row or (row["market_cap"] or 0) > (owner["market_cap"] or 0):
+                self._by_symbol[symbol] = coin_id
+            self.rows_loaded += 1
+        self.refreshed_at = time.time()
+        self.refreshes += 1
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """The row for a coin id, else for a symbol (e.g. "btc"), or None."""
+        row = self._rows.get(key)
+        if row is None:
+            coin_id = self._by_symbol.get(key.lower())
+            row = self._rows.get(coin_id) if coin_id is not None else None
+        return row
+
+    def missing(self, coin_ids: Iterable[str]) -> List[str]:
+        """Coins neither in the table nor recently found unlisted."""
+        return [c for c in coin_ids if self.lookup(c) is None and c not in self._unlisted]
+
+    @staticmethod
+    def overview(row: Dict[str, Any]) -> Dict[str, Any]:
+        """A row as a MarketOverviewResponse payload."""
+        return {k: v for k, v in row.items() if k != "id"}
+
+    @staticmethod
+    def parse(item: Dict[str, Any]) -> Dict[str, Any]:
+        """A /coins/markets entry as a row; the listing reports nulls for unknown values."""
+        return {
+            "id": item["id"],
+            "name": item.get("name"),
+            "symbol": (item.get("symbol") or "").upper(),
+            "current_price": item.get("current_price") or 0,
+            "market_cap": item.get("market_cap") or 0,
+            "volume_24h": item.get("total_volume") or 0,
+            "price_change_24h": item.get("price_change_percentage_24h") or 0,
+            "price_change_7d": item.get("price_change_percentage_7d_in_currency") or 0,
+            "ath": item.get("ath") or 0,
+            "atl": item.get("atl") or 0,
+            "circulating_supply": item.get("circulating_supply") or 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self.tracked),
+            "rows": len(self._rows),
+            "unlisted": len(self._unlisted),
+            "refreshes": self.refreshes,
+            "rows_loaded": self.rows_loaded,
+            "age": round(time.time() - self.refreshed_at, 1) if self.refreshed_at is not None else None,
+        }
+
+
+market_table = MarketTable(TRACKED_COINS)
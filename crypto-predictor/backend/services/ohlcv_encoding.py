@@ -0,0 +1,101 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import orjson
+import pandas as pd
+
+# Optional binary encodings, negotiated via the Accept header
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Response field -> DataFrame column, in OHLCVData order
+OHLCV_FIELDS = {
+    "time": "time",
+    "open": "open",
+    "high": "high",
+    "low": "low",
+    "close": "close",
+    "volume": "volume",
+    "rsi": "RSI",
+    "macd": "MACD_12_26_9",
+    "macd_signal": "MACDs_12_26_9",
+    "macd_hist": "MACDh_12_26_9",
+    "bb_upper": "BBU_20_2.0",
+    "bb_lower": "BBL_20_2.0",
+    "bb_middle": "BBM_20_2.0",
+}
+# Indicator columns the chart reads
+CHART_COLUMNS = [column for field, column in OHLCV_FIELDS.items()
+                 if field not in ("time", "open", "high", "low", "close", "volume")]
+
+
+class OHLCVEncoder:
+    @staticmethod
+    def columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        One C-contiguous array per response field (orjson requires contiguous
+        input); `time` is int64, the rest float64 with NaN for missing values.
+        """
+        columns = {}
+        for field, column in OHLCV_FIELDS.items():
+            if field == "time":
+                columns[field] = np.ascontiguousarray(df[column].to_numpy(dtype=np.int64))
+            elif column in df:
+                columns[field] = np.ascontiguousarray(df[column].to_numpy(dtype=np.float64))
+            else:
+                columns[field] = np.full(len(df), np.nan)
+        return columns
+
+    @staticmethod
+    def media_type_for(accept: Optional[str]) -> str:
+        """
+        Picks the response encoding from an Accept header. Binary types are only
+        offered when their package is installed; anything else gets JSON.
+        """
+        if accept:
+            for part in accept.split(","):
+                media_type = part.split(";")[0].strip().lower()
+                if media_type == ARROW_MEDIA_TYPE and pa is not None:
+                    return ARROW_MEDIA_TYPE
+                if media_type in MSGPACK_MEDIA_TYPES and msgpack is not None:
+                    return media_type
+        return JSON_MEDIA_TYPE
+
+    @staticmethod
+    def encode(symbol: str, df: pd.DataFrame, media_type: str = JSON_MEDIA_TYPE) -> Tuple[bytes, str]:
+        """Columnar body ({"symbol", "columns": {field: [...]}}) with NaN encoded as null."""
+        columns = OHLCVEncoder.columns(df)
+
+        if media_type == ARROW_MEDIA_TYPE:
+            # Arrow keeps NaN as a float; nulls are marked via the validity bitmap
+            arrays = [
+                pa.array(values, mask=np.isnan(values) if values.dtype.kind == "f" else None)
+                for values in columns.values()
+            ]
+            table = pa.Table.from_arrays(arrays, names=list(columns), metadata={"symbol": symbol})
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes(), ARROW_MEDIA_TYPE
+
+        if media_type in MSGPACK_MEDIA_TYPES:
+            packed = {
+                field: values.tolist() if values.dtype.kind != "f"
+                else np.where(np.isnan(values), None, values).tolist()
+                for field, values in columns.items()
+            }
+            return msgpack.packb({"symbol": symbol, "columns": packed}), media_type
+
+        # orjson writes NumPy arrays natively and serializes NaN as null
+        body = orjson.dumps({"symbol": symbol, "columns": columns}, option=orjson.OPT_SERIALIZE_NUMPY)
+        return body, JSON_MEDIA_TYPE
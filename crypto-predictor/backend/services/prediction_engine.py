@@ -1,298 +1,344 @@
+import hashlib
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Any
 try:
     from .indicators import IndicatorService
+    from .indicator_kernel import COLUMN_INDEX, INDICATOR_PARAMS, OHLCV_COLUMNS, compute_indicator_matrix
 except ImportError:
     from services.indicators import IndicatorService
-
-INDICATOR_WEIGHTS = {
-    "RSI": 20,
-    "MACD": 25,
-    "Bollinger Bands": 15,
-    "SMA Cross": 20,
-    "EMA Cross": 10,
-    "Stochastic": 10,
-    "Volume Trend": 15,
-    "Williams %R": 10,
-    "CCI": 10,
+    from services.indicator_kernel import COLUMN_INDEX, INDICATOR_PARAMS, OHLCV_COLUMNS, compute_indicator_matrix
+
+# Days of OHLCV history used for a prediction
+PREDICTION_HISTORY_DAYS = 90
+
+# Declarative scoring rules. Cases are tried in order and the first match wins;
+# when none matches the indicator is NEUTRAL with a score of 0.
+# A case condition is a list of (column, operator, threshold) terms that must all
+# hold, where the threshold is either a number or another column.
+# "value" is the number reported for the indicator: a column, or (a, b) for a - b.
+SIGNAL_RULES = [
+    {
+        # <30 = Oversold (Bullish), >70 = Overbought (Bearish), 30–50 = Mild Bear, 50–70 = Mild Bull
+        "name": "RSI", "indicator": "RSI (14)", "weight": 20, "value": "RSI",
+        "cases": [
+            ([("RSI", "<", 30)], "Oversold", "bull", 1),
+            ([("RSI", ">", 70)], "Overbought", "bear", -1),
+            ([("RSI", ">=", 30), ("RSI", "<", 50)], "Mild Bearish", "bear", -0.5),
+            ([("RSI", ">=", 50), ("RSI", "<=", 70)], "Mild Bullish", "bull", 0.5),
+        ],
+    },
+    {
+        # MACD > Signal + positive histogram = Bull cross; opposite = Bear cross
+        "name": "MACD", "indicator": "MACD (12,26,9)", "weight": 25, "value": "MACDh_12_26_9",
+        "cases": [
+            ([("MACD_12_26_9", ">", "MACDs_12_26_9"), ("MACDh_12_26_9", ">", 0)], "Bullish Cross", "bull", 1),
+            ([("MACD_12_26_9", "<", "MACDs_12_26_9"), ("MACDh_12_26_9", "<", 0)], "Bearish Cross", "bear", -1),
+        ],
+    },
+    {
+        # Price < lower band = Oversold/Bull; Price > upper band = Overbought/Bear
+        "name": "Bollinger Bands", "indicator": "Bollinger Bands", "weight": 15, "value": "close",
+        "cases": [
+            ([("close", "<", "BBL_20_2.0")], "Below Lower Band", "bull", 1),
+            ([("close", ">", "BBU_20_2.0")], "Above Upper Band", "bear", -1),
+        ],
+    },
+    {
+        # SMA20 > SMA50 = Golden cross (Bull); SMA20 < SMA50 = Death cross (Bear)
+        "name": "SMA Cross", "indicator": "SMA Cross (20/50)", "weight": 20, "value": ("SMA_20", "SMA_50"),
+        "cases": [
+            ([("SMA_20", ">", "SMA_50")], "Golden Cross", "bull", 1),
+            ([("SMA_20", "<", "SMA_50")], "Death Cross", "bear", -1),
+        ],
+    },
+    {
+        "name": "EMA Cross", "indicator": "EMA Cross (9/21)", "weight": 10, "value": ("EMA_9", "EMA_21"),
+        "cases": [
+            ([("EMA_9", ">", "EMA_21")], "Bullish Trend", "bull", 1),
+            ([("EMA_9", "<", "EMA_21")], "Bearish Trend", "bear", -1),
+        ],
+    },
+    {
+        "name": "Stochastic", "indicator": "Stochastic", "weight": 10, "value": "STOCHk_14_3_3",
+        "cases": [
+            ([("STOCHk_14_3_3", "<", 20)], "Oversold", "bull", 1),
+            ([("STOCHk_14_3_3", ">", 80)], "Overbought", "bear", -1),
+        ],
+    },
+    {
+        # Rising volume + rising price = confirmed Bull; Rising volume + falling price = confirmed Bear
+        "name": "Volume Trend", "indicator": "Volume Trend", "weight": 15, "value": "vol_change",
+        "cases": [
+            ([("vol_change", ">", 0), ("price_change", ">", 0)], "Bullish Volume", "bull", 1),
+            ([("vol_change", ">", 0), ("price_change", "<", 0)], "Bearish Volume", "bear", -1),
+        ],
+    },
+    {
+        "name": "Williams %R", "indicator": "Williams %R", "weight": 10, "value": "WILLR",
+        "cases": [
+            ([("WILLR", "<", -80)], "Oversold", "bull", 1),
+            ([("WILLR", ">", -20)], "Overbought", "bear", -1),
+        ],
+    },
+    {
+        "name": "CCI", "indicator": "CCI (20)", "weight": 10, "value": "CCI",
+        "cases": [
+            ([("CCI", ">", 100)], "Bullish Momentum", "bull", 1),
+            ([("CCI", "<", -100)], "Bearish Momentum", "bear", -1),
+        ],
+    },
+]
+
+INDICATOR_WEIGHTS = {rule["name"]: rule["weight"] for rule in SIGNAL_RULES}
+
+# Normalized score (-100..100) -> overall signal, first match wins
+OVERALL_SIGNALS = [
+    (">=", 60, "STRONG BUY"),
+    (">=", 20, "BUY"),
+    ("<=", -60, "STRONG SELL"),
+    ("<=", -20, "SELL"),
+]
+PREDICTED_DIRECTIONS = [
+    (">", 20, "UP"),
+    ("<", -20, "DOWN"),
+]
+
+_OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
 }
 
+NEUTRAL_OUTCOME = ("NEUTRAL", "neutral", 0)
+# A rule reading an indicator that is still warming up (NaN) is skipped rather than scored on a
+# placeholder value; its weight still counts towards the maximum score
+INSUFFICIENT_OUTCOME = ("INSUFFICIENT DATA", "neutral", 0)
+
+
+class CompiledRules:
+    """
+    SIGNAL_RULES compiled into NumPy arrays. score() evaluates every rule for any
+    number of rows at once, so the same code scores the last candle or a full history.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        # Identifies the indicator parameters and rule table behind a cached score
+        self.fingerprint = INDICATOR_PARAMS + "|" + hashlib.sha1(repr(rules).encode()).hexdigest()[:16]
+        self.columns: List[str] = []
+        self.column_index: Dict[str, int] = {}
+        for required in ("close", "ATR"):
+            self._column(required)
+
+        # One entry per term: lhs column, comparison, rhs column (-1 for constants), rhs constant
+        term_lhs, term_op, term_rhs, term_const = [], [], [], []
+        # For every case, the slice of terms it ANDs together
+        self.case_bounds: List[List[tuple]] = []
+        self.value_columns: List[tuple] = []
+        self.outcomes: List[List[tuple]] = []
+
+        max_cases = max(len(rule["cases"]) for rule in rules)
+        # Choice of a skipped rule; its score column stays 0
+        self.insufficient = max_cases + 1
+        self.scores = np.zeros((len(rules), max_cases + 2))
+        # Columns each rule reads, terms and reported value alike
+        self.rule_columns: List[np.ndarray] = []
+        self.weights = np.array([rule["weight"] for rule in rules], dtype=float)
+
+        for r, rule in enumerate(rules):
+            value = rule["value"]
+            if isinstance(value, tuple):
+                self.value_columns.append((self._column(value[0]), self._column(value[1])))
+            else:
+                self.value_columns.append((self._column(value), -1))
+
+            bounds = []
+            first_term = len(term_lhs)
+            for c, (terms, signal, direction, score) in enumerate(rule["cases"]):
+                first = len(term_lhs)
+                for column, op, threshold in terms:
+                    term_lhs.append(self._column(column))
+                    term_op.append(op)
+                    if isinstance(threshold, str):
+                        term_rhs.append(self._column(threshold))
+                        term_const.append(0.0)
+                    else:
+                        term_rhs.append(-1)
+                        term_const.append(float(threshold))
+                bounds.append((first, len(term_lhs)))
+                self.scores[r, c + 1] = score
+            self.case_bounds.append(bounds)
+            read = set(term_lhs[first_term:]) | {rhs for rhs in term_rhs[first_term:] if rhs >= 0}
+            read.update(c for c in self.value_columns[-1] if c >= 0)
+            self.rule_columns.append(np.array(sorted(read), dtype=np.intp))
+            self.outcomes.append([NEUTRAL_OUTCOME] + [case[1:] for case in rule["cases"]])
+
+        # Indicator columns the rules read, in the order features_from_matrix expects them
+        self.indicator_columns = [c for c in self.columns if c in COLUMN_INDEX]
+        self.term_lhs = np.array(term_lhs, dtype=np.intp)
+        self.term_rhs = np.array(term_rhs, dtype=np.intp)
+        self.term_const = np.array(term_const)
+        self.term_is_const = self.term_rhs < 0
+        # Terms grouped by operator so each comparison ufunc runs once
+        self.op_terms = {
+            op: np.flatnonzero(np.array(term_op) == op)
+            for op in set(term_op)
+        }
+        self.max_score = float(self.weights.sum())
+
+    def _column(self, name: str) -> int:
+        if name not in self.column_index:
+            self.column_index[name] = len(self.columns)
+            self.columns.append(name)
+        return self.column_index[name]
+
+    def features_from_frame(self, df: pd.DataFrame) -> np.ndarray:
+        """(rows, columns) feature matrix from a compute_all DataFrame; NaN marks warm-up."""
+        return df[self.columns].to_numpy(dtype=float)
+
+    def features_from_matrix(self, close: np.ndarray, indicators: np.ndarray) -> np.ndarray:
+        """Feature matrix from close prices and rows of compute_indicator_matrix output for indicator_columns."""
+        features = np.empty((len(close), len(self.columns)))
+        position = {name: i for i, name in enumerate(self.indicator_columns)}
+        for j, name in enumerate(self.columns):
+            features[:, j] = close if name == "close" else indicators[:, position[name]]
+        return features
+
+    def score(self, features: np.ndarray) -> Dict[str, Any]:
+        rows = features.shape[0]
+        missing = np.isnan(features)
+        features = np.nan_to_num(features, nan=0.0, posinf=np.inf, neginf=-np.inf)
+        lhs = features[:, self.term_lhs]
+        rhs = np.where(self.term_is_const, self.term_const, features[:, np.maximum(self.term_rhs, 0)])
+        holds = np.empty(lhs.shape, dtype=bool)
+        for op, idx in self.op_terms.items():
+            holds[:, idx] = _OPERATORS[op](lhs[:, idx], rhs[:, idx])
+
+        choices = np.zeros((rows, len(self.rules)), dtype=np.intp)
+        values = np.empty((rows, len(self.rules)))
+        for r, bounds in enumerate(self.case_bounds):
+            conditions = [holds[:, start:end].all(axis=1) for start, end in bounds]
+            choices[:, r] = np.select(conditions, np.arange(1, len(bounds) + 1), default=0)
+            choices[missing[:, self.rule_columns[r]].any(axis=1), r] = self.insufficient
+            lhs_col, rhs_col = self.value_columns[r]
+            values[:, r] = features[:, lhs_col] if rhs_col < 0 else features[:, lhs_col] - features[:, rhs_col]
+
+        rule_scores = self.scores[np.arange(len(self.rules)), choices]
+        total_score = np.zeros(rows)
+        for r in range(len(self.rules)):
+            total_score += rule_scores[:, r] * self.weights[r]
+
+        # Final Score Normalization
+        normalized_score = (total_score / self.max_score) * 100
+        # Map 0-100 to 50-99
+        confidence = 50 + (np.abs(normalized_score) * 0.49)
+
+        close = features[:, self.column_index["close"]]
+        atr = features[:, self.column_index["ATR"]]
+        # Predicted price range = current_price ± (ATR * multiplier based on confidence)
+        multiplier = 1 + (confidence / 100)
+
+        return {
+            "choices": choices,
+            "values": values,
+            "normalized_score": normalized_score,
+            "overall_signal": _label(normalized_score, OVERALL_SIGNALS, "NEUTRAL"),
+            "predicted_direction": _label(normalized_score, PREDICTED_DIRECTIONS, "SIDEWAYS"),
+            "confidence": confidence,
+            "close": close,
+            "low": close - (atr * multiplier),
+            "mid": close + (normalized_score / 100 * atr * multiplier),
+            "high": close + (atr * multiplier),
+        }
+
+
+def _label(score: np.ndarray, table: List[tuple], default: str) -> np.ndarray:
+    conditions = [_OPERATORS[op](score, threshold) for op, threshold, _ in table]
+    return np.select(conditions, [label for _, _, label in table], default=default)
+
+
+compiled_rules = CompiledRules(SIGNAL_RULES)
+
+
 class PredictionEngine:
     @staticmethod
     def calculate_signals(df: pd.DataFrame) -> Dict[str, Any]:
         if df.empty:
             raise ValueError("Empty DataFrame provided to prediction engine")
 
-        df = IndicatorService.compute_all(df)
-        # Ensure all columns exist to avoid KeyError, fill NaN with 0 for safety
-        df = df.fillna(0)
+        return PredictionEngine.evaluate(IndicatorService.compute(df, compiled_rules.indicator_columns))
 
-        last_row = df.iloc[-1]
-        prev_row = df.iloc[-2] if len(df) > 1 else last_row
-
-        signals = []
-        total_score = 0
-
-        # 1. RSI (14)
-        # <30 = Oversold (Bullish), >70 = Overbought (Bearish), 30–50 = Mild Bear, 50–70 = Mild Bull
-        rsi = last_row['RSI']
-        rsi_signal = "NEUTRAL"
-        rsi_dir = "neutral"
-        rsi_score = 0
-        if rsi < 30:
-            rsi_signal = "Oversold"
-            rsi_dir = "bull"
-            rsi_score = 1
-        elif rsi > 70:
-            rsi_signal = "Overbought"
-            rsi_dir = "bear"
-            rsi_score = -1
-        elif 30 <= rsi < 50:
-            rsi_signal = "Mild Bearish"
-            rsi_dir = "bear"
-            rsi_score = -0.5
-        elif 50 <= rsi <= 70:
-            rsi_signal = "Mild Bullish"
-            rsi_dir = "bull"
-            rsi_score = 0.5
-
-        signals.append({
-            "indicator": "RSI (14)",
-            "value": round(float(rsi), 2) if not pd.isna(rsi) else 0,
-            "signal": rsi_signal,
-            "direction": rsi_dir,
-            "weight": INDICATOR_WEIGHTS["RSI"]
-        })
-        total_score += rsi_score * INDICATOR_WEIGHTS["RSI"]
-
-        # 2. MACD (12, 26, 9)
-        # MACD > Signal + positive histogram = Bull cross; opposite = Bear cross
-        macd_val = last_row.get('MACD_12_26_9', 0)
-        macd_sig = last_row.get('MACDs_12_26_9', 0)
-        macd_hist = last_row.get('MACDh_12_26_9', 0)
-
-        m_signal = "NEUTRAL"
-        m_dir = "neutral"
-        m_score = 0
-        if macd_val > macd_sig and macd_hist > 0:
-            m_signal = "Bullish Cross"
-            m_dir = "bull"
-            m_score = 1
-        elif macd_val < macd_sig and macd_hist < 0:
-            m_signal = "Bearish Cross"
-            m_dir = "bear"
-            m_score = -1
-
-        signals.append({
-            "indicator": "MACD (12,26,9)",
-            "value": round(float(macd_hist), 2) if not pd.isna(macd_hist) else 0,
-            "signal": m_signal,
-            "direction": m_dir,
-            "weight": INDICATOR_WEIGHTS["MACD"]
-        })
-        total_score += m_score * INDICATOR_WEIGHTS["MACD"]
-
-        # 3. Bollinger Bands (20, 2)
-        # Price < lower band = Oversold/Bull; Price > upper band = Overbought/Bear
-        close = last_row['close']
-        bb_lower = last_row.get('BBL_20_2.0', 0)
-        bb_upper = last_row.get('BBU_20_2.0', 0)
-
-        bb_signal = "NEUTRAL"
-        bb_dir = "neutral"
-        bb_score = 0
-        if close < bb_lower:
-            bb_signal = "Below Lower Band"
-            bb_dir = "bull"
-            bb_score = 1
-        elif close > bb_upper:
-            bb_signal = "Above Upper Band"
-            bb_dir = "bear"
-            bb_score = -1
-
-        signals.append({
-            "indicator": "Bollinger Bands",
-            "value": round(float(close), 2),
-            "signal": bb_signal,
-            "direction": bb_dir,
-            "weight": INDICATOR_WEIGHTS["Bollinger Bands"]
-        })
-        total_score += bb_score * INDICATOR_WEIGHTS["Bollinger Bands"]
-
-        # 4. SMA Cross (20/50)
-        # SMA20 > SMA50 = Golden cross (Bull); SMA20 < SMA50 = Death cross (Bear)
-        sma20 = last_row.get('SMA_20', 0)
-        sma50 = last_row.get('SMA_50', 0)
-
-        sma_signal = "NEUTRAL"
-        sma_dir = "neutral"
-        sma_score = 0
-        if sma20 > sma50:
-            sma_signal = "Golden Cross"
-            sma_dir = "bull"
-            sma_score = 1
-        elif sma20 < sma50:
-            sma_signal = "Death Cross"
-            sma_dir = "bear"
-            sma_score = -1
-
-        signals.append({
-            "indicator": "SMA Cross (20/50)",
-            "value": round(float(sma20 - sma50), 2) if not pd.isna(sma20-sma50) else 0,
-            "signal": sma_signal,
-            "direction": sma_dir,
-            "weight": INDICATOR_WEIGHTS["SMA Cross"]
-        })
-        total_score += sma_score * INDICATOR_WEIGHTS["SMA Cross"]
-
-        # 5. EMA Cross (9/21)
-        ema9 = last_row.get('EMA_9', 0)
-        ema21 = last_row.get('EMA_21', 0)
-
-        ema_signal = "NEUTRAL"
-        ema_dir = "neutral"
-        ema_score = 0
-        if ema9 > ema21:
-            ema_signal = "Bullish Trend"
-            ema_dir = "bull"
-            ema_score = 1
-        elif ema9 < ema21:
-            ema_signal = "Bearish Trend"
-            ema_dir = "bear"
-            ema_score = -1
-
-        signals.append({
-            "indicator": "EMA Cross (9/21)",
-            "value": round(float(ema9 - ema21), 2) if not pd.isna(ema9-ema21) else 0,
-            "signal": ema_signal,
-            "direction": ema_dir,
-            "weight": INDICATOR_WEIGHTS["EMA Cross"]
-        })
-        total_score += ema_score * INDICATOR_WEIGHTS["EMA Cross"]
-
-        # 6. Stochastic (14,3,3)
-        stoch_k = last_row.get('STOCHk_14_3_3', 50)
-
-        stoch_signal = "NEUTRAL"
-        stoch_dir = "neutral"
-        stoch_score = 0
-        if stoch_k < 20:
-            stoch_signal = "Oversold"
-            stoch_dir = "bull"
-            stoch_score = 1
-        elif stoch_k > 80:
-            stoch_signal = "Overbought"
-            stoch_dir = "bear"
-            stoch_score = -1
-
-        signals.append({
-            "indicator": "Stochastic",
-            "value": round(float(stoch_k), 2) if not pd.isna(stoch_k) else 0,
-            "signal": stoch_signal,
-            "direction": stoch_dir,
-            "weight": INDICATOR_WEIGHTS["Stochastic"]
-        })
-        total_score += stoch_score * INDICATOR_WEIGHTS["Stochastic"]
-
-        # 7. Volume Trend
-        # Rising volume + rising price = confirmed Bull; Rising volume + falling price = confirmed Bear
-        vol_change = last_row.get('vol_change', 0)
-        price_change = last_row.get('price_change', 0)
-
-        vol_signal = "NEUTRAL"
-        vol_dir = "neutral"
-        vol_score = 0
-        if vol_change > 0 and price_change > 0:
-            vol_signal = "Bullish Volume"
-            vol_dir = "bull"
-            vol_score = 1
-        elif vol_change > 0 and price_change < 0:
-            vol_signal = "Bearish Volume"
-            vol_dir = "bear"
-            vol_score = -1
-
-        signals.append({
-            "indicator": "Volume Trend",
-            "value": round(float(vol_change), 2) if not pd.isna(vol_change) else 0,
-            "signal": vol_signal,
-            "direction": vol_dir,
-            "weight": INDICATOR_WEIGHTS["Volume Trend"]
-        })
-        total_score += vol_score * INDICATOR_WEIGHTS["Volume Trend"]
-
-        # 8. Williams %R (14)
-        willr = last_row.get('WILLR', -50)
-        willr_signal = "NEUTRAL"
-        willr_dir = "neutral"
-        willr_score = 0
-        if willr < -80:
-            willr_signal = "Oversold"
-            willr_dir = "bull"
-            willr_score = 1
-        elif willr > -20:
-            willr_signal = "Overbought"
-            willr_dir = "bear"
-            willr_score = -1
-
-        signals.append({
-            "indicator": "Williams %R",
-            "value": round(float(willr), 2) if not pd.isna(willr) else 0,
-            "signal": willr_signal,
-            "direction": willr_dir,
-            "weight": INDICATOR_WEIGHTS["Williams %R"]
-        })
-        total_score += willr_score * INDICATOR_WEIGHTS["Williams %R"]
-
-        # 9. CCI (20)
-        cci = last_row.get('CCI', 0)
-        cci_signal = "NEUTRAL"
-        cci_dir = "neutral"
-        cci_score = 0
-        if cci > 100:
-            cci_signal = "Bullish Momentum"
-            cci_dir = "bull"
-            cci_score = 1
-        elif cci < -100:
-            cci_signal = "Bearish Momentum"
-            cci_dir = "bear"
-            cci_score = -1
-
-        signals.append({
-            "indicator": "CCI (20)",
-            "value": round(float(cci), 2) if not pd.isna(cci) else 0,
-            "signal": cci_signal,
-            "direction": cci_dir,
-            "weight": INDICATOR_WEIGHTS["CCI"]
-        })
-        total_score += cci_score * INDICATOR_WEIGHTS["CCI"]
-
-        # Final Score Normalization
-        max_possible_score = sum(INDICATOR_WEIGHTS.values())
-        normalized_score = (total_score / max_possible_score) * 100
+    @staticmethod
+    def evaluate(df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Scores the last row of a DataFrame that already carries the
+        indicator columns the rules read (compiled_rules.indicator_columns).
+        """
+        if df.empty:
+            raise ValueError("Empty DataFrame provided to prediction engine")
 
-        overall_signal = "NEUTRAL"
-        if normalized_score >= 60: overall_signal = "STRONG BUY"
-        elif normalized_score >= 20: overall_signal = "BUY"
-        elif normalized_score <= -60: overall_signal = "STRONG SELL"
-        elif normalized_score <= -20: overall_signal = "SELL"
+        scored = compiled_rules.score(compiled_rules.features_from_frame(df.iloc[-1:]))
+        return PredictionEngine._build_result(scored, 0)
 
-        predicted_direction = "SIDEWAYS"
-        if normalized_score > 20: predicted_direction = "UP"
-        elif normalized_score < -20: predicted_direction = "DOWN"
+    @staticmethod
+    def score_history(df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Scores every row of a compute_all DataFrame in one pass. Returns arrays
+        aligned with the rows of `df` (see CompiledRules.score).
+        """
+        return compiled_rules.score(compiled_rules.features_from_frame(df))
 
-        confidence = abs(normalized_score)
-        # Map 0-100 to 50-99
-        confidence = 50 + (confidence * 0.49)
+    @staticmethod
+    def calculate_signals_batch(frames: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
+        """
+        Same result as calculate_signals for every coin in `frames`, computed in bulk.
+        Histories of equal length are stacked into a coins x time matrix so indicators
+        and the nine weighted scores are evaluated with array operations.
+        Coins with an empty history are left out of the result.
+        """
+        groups: Dict[int, List[str]] = {}
+        ordered: Dict[str, pd.DataFrame] = {}
+        for coin_id, df in frames.items():
+            if df.empty:
+                continue
+            ordered[coin_id] = df.sort_values('time')
+            groups.setdefault(len(df), []).append(coin_id)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for coin_ids in groups.values():
+            stacked = [
+                np.stack([ordered[c][col].to_numpy(dtype=float) for c in coin_ids])
+                for col in OHLCV_COLUMNS
+            ]
+            matrix = compute_indicator_matrix(*stacked, columns=compiled_rules.indicator_columns)
+            # Last candle of every coin
+            features = compiled_rules.features_from_matrix(stacked[3][:, -1], matrix[:, -1, :])
+            scored = compiled_rules.score(features)
+            for i, coin_id in enumerate(coin_ids):
+                results[coin_id] = PredictionEngine._build_result(scored, i)
+        return results
 
-        atr = last_row.get('ATR', close * 0.05)
-        # Predicted price range = current_price ± (ATR * multiplier based on confidence)
-        multiplier = 1 + (confidence / 100)
-        predicted_price_range = {
-            "low": round(close - (atr * multiplier), 2),
-            "mid": round(close + (normalized_score/100 * atr * multiplier), 2),
-            "high": round(close + (atr * multiplier), 2)
-        }
+    @staticmethod
+    def _build_result(scored: Dict[str, Any], i: int) -> Dict[str, Any]:
+        """Builds the calculate_signals response for row `i` of a CompiledRules.score result."""
+        signals = []
+        for r, rule in enumerate(compiled_rules.rules):
+            choice = scored["choices"][i, r]
+            outcomes = compiled_rules.outcomes[r]
+            signal, direction, _ = outcomes[choice] if choice < len(outcomes) else INSUFFICIENT_OUTCOME
+            signals.append({
+                "indicator": rule["indicator"],
+                "value": round(float(scored["values"][i, r]), 2),
+                "signal": signal,
+                "direction": direction,
+                "weight": rule["weight"]
+            })
+
+        overall_signal = str(scored["overall_signal"][i])
+        predicted_direction = str(scored["predicted_direction"][i])
+        confidence = float(scored["confidence"][i])
 
         summary = f"The overall market sentiment for this coin is {overall_signal} with a confidence of {round(confidence, 1)}%. "
         if predicted_direction == "UP":
@@ -306,7 +352,11 @@ class PredictionEngine:
             "overall_signal": overall_signal,
             "confidence": round(confidence, 2),
             "predicted_direction": predicted_direction,
-            "predicted_price_range": predicted_price_range,
+            "predicted_price_range": {
+                "low": round(float(scored["low"][i]), 2),
+                "mid": round(float(scored["mid"][i]), 2),
+                "high": round(float(scored["high"][i]), 2)
+            },
             "horizon": "24h",
             "signals": signals,
             "summary": summary
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+try:
+    from .candle_resampler import TIMEFRAME_GRANULARITY
+    from .coingecko import WEB_CONCURRENCY, CoinGeckoService
+    from .incremental_indicators import IncrementalIndicatorService
+    from .ohlcv_encoding import CHART_COLUMNS
+    from .signal_service import SignalService
+    from .upstream_scheduler import Priority, TokenBucket, count_upstream_calls, upstream_priority
+except ImportError:
+    from services.candle_resampler import TIMEFRAME_GRANULARITY
+    from services.coingecko import WEB_CONCURRENCY, CoinGeckoService
+    from services.incremental_indicators import IncrementalIndicatorService
+    from services.ohlcv_encoding import CHART_COLUMNS
+    from services.signal_service import SignalService
+    from services.upstream_scheduler import Priority, TokenBucket, count_upstream_calls, upstream_priority
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() not in ("0", "false", "no")
+# How often hot keys are checked, and how close to expiry they are refreshed (seconds)
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "10"))
+PREFETCH_LEAD = float(os.getenv("PREFETCH_LEAD", "30"))
+# Number of hottest keys kept warm
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "50"))
+# Upstream calls per minute prefetching may spend, split between workers like the upstream limit.
+# A refresh needs room for up to two calls but is charged only for those it makes
+PREFETCH_CALLS_PER_MINUTE = float(os.getenv("PREFETCH_CALLS_PER_MINUTE", "12")) / WEB_CONCURRENCY
+# Request counts decay with this half-life, so popularity follows recent traffic
+POPULARITY_HALF_LIFE = 3600.0
+MAX_TRACKED_KEYS = 1000
+CALLS_PER_REFRESH = 2
+
+Key = Tuple[str, int, str, str]  # (coin_id, days, vs_currency, granularity)
+
+
+class PrefetchScheduler:
+    """
+    Keeps the most requested OHLCV windows warm.
+
+    Routers record each request; a background loop picks the hottest keys by
+    exponentially decayed request count and refreshes those about to expire,
+    then recomputes what was served from them (chart indicators, or the
+    prediction of each timeframe rolled up from them) so the next request is
+    a cache hit. Refreshes spend an upstream
+    call budget, charged only for calls that reach the upstream, and are
+    skipped while interactive requests are queued or the upstream is backing
+    off.
+    """
+
+    def __init__(
+        self,
+        interval: float = PREFETCH_INTERVAL,
+        lead: float = PREFETCH_LEAD,
+        top_n: int = PREFETCH_TOP_N,
+        calls_per_minute: float = PREFETCH_CALLS_PER_MINUTE,
+    ):
+        self.interval = interval
+        self.lead = lead
+        self.top_n = top_n
+        # Up to half a minute of budget can be spent in one burst
+        self.budget = TokenBucket(calls_per_minute / 60, max(CALLS_PER_REFRESH, calls_per_minute / 2))
+        # key -> (decayed request count, last update)
+        self._popularity: Dict[Key, Tuple[float, float]] = {}
+        # key -> timeframes predicted from it (None: the chart of the window itself)
+        self._uses: Dict[Key, Set[Optional[str]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.refreshed = 0
+        self.upstream_calls = 0
+        self.precomputed = 0
+        self.skipped_budget = 0
+        self.skipped_busy = 0
+        self.errors = 0
+
+    def record(self, coin_id: str, days: int, vs_currency: str = "usd", timeframe: Optional[str] = None):
+        """Counts a request for the `days` window, served as a chart or as `timeframe` predictions."""
+        now = time.monotonic()
+        granularity = TIMEFRAME_GRANULARITY[timeframe] if timeframe else CoinGeckoService.granularity_for(days)[0]
+        key = (coin_id, days, vs_currency, granularity)
+        score, updated = self._popularity.get(key, (0.0, now))
+        self._popularity[key] = (score * 0.5 ** ((now - updated) / POPULARITY_HALF_LIFE) + 1, now)
+        self._uses.setdefault(key, set()).add(timeframe)
+        if len(self._popularity) > MAX_TRACKED_KEYS:
+            coldest = min(self._popularity, key=lambda k: self._score(k, now))
+            del self._popularity[coldest]
+            del self._uses[coldest]
+
+    def _score(self, key: Key, now: float) -> float:
+        score, updated = self._popularity[key]
+        return score * 0.5 ** ((now - updated) / POPULARITY_HALF_LIFE)
+
+    def hot_keys(self) -> List[Key]:
+        now = time.monotonic()
+        return sorted(self._popularity, key=lambda k: self._score(k, now), reverse=True)[:self.top_n]
+
+    async def run_once(self) -> int:
+        """Refreshes hot keys that are about to expire. Returns the number refreshed."""
+        refreshed = 0
+        for key in self.hot_keys():
+            coin_id, days, vs_currency, granularity = key
+            expires_in = CoinGeckoService.ohlcv_expires_in(coin_id, days, vs_currency, granularity)
+            if expires_in is not None and expires_in > self.lead:
+                continue
+            # Interactive traffic first: don't add to a queue or a backoff
+            upstream = CoinGeckoService.upstream_stats()
+            if upstream["queue_depth"]["INTERACTIVE"] or upstream["paused_for"] > 0:
+                self.skipped_busy += 1
+                break
+            if self.budget.delay(time.monotonic(), CALLS_PER_REFRESH) > 0:
+                self.skipped_budget += 1
+                break
+
+            try:
+                with upstream_priority(Priority.PREFETCH):
+                    # Windows the candle store or another worker already has cost nothing
+                    with count_upstream_calls() as calls:
+                        try:
+                            df = await CoinGeckoService.refresh_ohlcv(coin_id, days, vs_currency, granularity)
+                        finally:
+                            self.budget.spend(time.monotonic(), calls[0])
+                            self.upstream_calls += calls[0]
+                    self.refreshed += 1
+                    refreshed += 1
+                    for timeframe in sorted(self._uses.get(key, ()), key=str):
+                        if timeframe is None:
+                            await IncrementalIndicatorService.compute_async(
+                                (coin_id, vs_currency, days), df, columns=CHART_COLUMNS
+                            )
+                        else:
+                            await SignalService.get_prediction(coin_id, vs_currency=vs_currency, timeframe=timeframe)
+                    self.precomputed += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Prefetch of %s/%s/%s/%s failed: %s", coin_id, days, vs_currency, granularity, e)
+        return refreshed
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if PREFETCH_ENABLED and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "tracked_keys": len(self._popularity),
+            "hot_keys": [
+                {"coin_id": c, "days": d, "vs_currency": v, "granularity": g,
+                 "score": round(self._score((c, d, v, g), now), 2)}
+                for c, d, v, g in self.hot_keys()[:10]
+            ],
+            "refreshed": self.refreshed,
+            "upstream_calls": self.upstream_calls,
+            "precomputed": self.precomputed,
+            "skipped_budget": self.skipped_budget,
+            "skipped_busy": self.skipped_busy,
+            "errors": self.errors,
+            "budget_tokens": round(self.budget.tokens, 2),
+        }
+
+
+prefetch_scheduler = PrefetchScheduler()
@@ -0,0 +1,136 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from cachetools import TTLCache
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same
+    key await the in-flight call instead of starting their own.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Returns the in-flight task for `key`, starting `fn` if there is none."""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        self.calls += 1
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+
+        def _done(t: asyncio.Task):
+            if self._in_flight.get(key) is t:
+                del self._in_flight[key]
+            # Mark the error as retrieved even if every caller went away
+            if not t.cancelled():
+                t.exception()
+
+        task.add_done_callback(_done)
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # shield: a cancelled caller must not cancel the call other callers share
+        return await asyncio.shield(self.start(key, fn))
+
+
+class StaleWhileRevalidateCache:
+    """
+    TTL cache whose expired entries are still served for `max_stale` seconds
+    while a single background task refreshes them. Misses and refreshes are
+    coalesced per key through SingleFlight.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, max_stale: float):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        # Entries live for ttl + max_stale; within that window they are (value, fetched_at)
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl + max_stale)
+        self._flight = SingleFlight()
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refresh_errors = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() - entry[1] < self.ttl
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._entries[key][0]
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self._entries[key] = (value, time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        """Seconds until the entry goes stale (negative once stale), None when absent."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return self.ttl - (time.monotonic() - entry[1])
+
+    async def refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Fetches and stores a new value now, joining a refresh already in flight."""
+        return await self._flight.do(key, lambda: self._refresh(key, fetch))
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        revalidate: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        """`revalidate`, if given, replaces `fetch` for background refreshes."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                self.hits += 1
+                return value
+            # Expired but still within max_stale: serve it and refresh once in the background
+            self.stale_hits += 1
+            if not self._flight.in_flight(key):
+                task = self._flight.start(key, lambda: self._refresh(key, revalidate or fetch))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return value
+
+        self.misses += 1
+        return await self._flight.do(key, lambda: self._refresh(key, fetch))
+
+    async def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetch()
+        except Exception:
+            self.refresh_errors += 1
+            raise
+        self[key] = value
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "coalesced": self._flight.coalesced,
+            "upstream_fetches": self._flight.calls,
+            "refresh_errors": self.refresh_errors,
+        }
@@ -0,0 +1,52 @@
+import itertools
+from array import array
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+class RingBuffer:
+    """
+    Fixed-capacity, array-backed buffer: once full, each append overwrites the
+    oldest item in O(1), so memory stays flat however long the owner runs.
+
+    Every item gets a sequence number from `counter`. Buffers sharing a counter
+    can be paged through together with one cursor: ask for the items after the
+    highest sequence number seen so far.
+    """
+
+    def __init__(self, capacity: int, counter: Optional[Iterator[int]] = None):
+        self.capacity = capacity
+        self._items: List[Any] = [None] * capacity
+        self._seqs = array('q', [0]) * capacity
+        self._counter = counter if counter is not None else itertools.count(1)
+        self._appended = 0
+        self.last_seq = 0
+
+    def append(self, item: Any) -> int:
+        seq = next(self._counter)
+        slot = self._appended % self.capacity
+        self._items[slot] = item
+        self._seqs[slot] = seq
+        self._appended += 1
+        self.last_seq = seq
+        return seq
+
+    def __len__(self) -> int:
+        return min(self._appended, self.capacity)
+
+    def entries(self, since: Optional[int] = None, limit: Optional[int] = None) -> List[Tuple[int, Any]]:
+        """(seq, item) pairs oldest first: those after `since`, at most the newest `limit`."""
+        out = []
+        # Walk back from the newest; sequence numbers only grow along the ring
+        for k in range(self._appended - 1, self._appended - len(self) - 1, -1):
+            slot = k % self.capacity
+            seq = self._seqs[slot]
+            if since is not None and seq <= since:
+                break
+            out.append((seq, self._items[slot]))
+            if limit is not None and len(out) >= limit:
+                break
+        out.reverse()
+        return out
+
+    def items(self, since: Optional[int] = None, limit: Optional[int] = None) -> List[Any]:
+        return [item for _, item in self.entries(since, limit)]
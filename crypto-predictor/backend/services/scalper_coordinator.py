@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import orjson
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+try:
+    from .exchange_service import exchange_pool
+    from .scalper_service import ScalperService
+    from .shared_cache import SharedStore, shared_store
+except ImportError:
+    from services.exchange_service import exchange_pool
+    from services.scalper_service import ScalperService
+    from services.shared_cache import SharedStore, shared_store
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = "scalper:leader"
+COMMAND_KEY = "scalper:command"
+STATUS_KEY = "scalper:status"
+RESULT_KEY = "scalper:result:"
+# The leader renews its lease every heartbeat; another worker takes over once it lapses
+LEASE_TTL = 10.0
+HEARTBEAT = 2.0
+# How often the leader checks for relayed commands, and how long a relaying worker waits
+COMMAND_POLL = 0.2
+COMMAND_TIMEOUT = 20.0
+# Config fields that only travel sealed to the leader's key
+SECRET_FIELDS = ("api_key", "secret", "passphrase")
+
+
+class ScalperCommandError(Exception):
+    """A start/stop command failed on the worker running the scalper."""
+
+
+class ScalperUnavailable(Exception):
+    """No worker picked up a relayed command in time."""
+
+
+def _raw_public(key: X25519PublicKey) -> bytes:
+    return key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+
+def _cipher(shared: bytes) -> AESGCM:
+    return AESGCM(HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"scalper-command").derive(shared))
+
+
+def seal(payload: Dict[str, Any], public_key: bytes, aad: bytes) -> Dict[str, str]:
+    """
+    Encrypts `payload` to a leader's X25519 public key with a one-off key pair
+    (ECDH, HKDF, AES-GCM). Only that leader process can open it, and nobody
+    once it has exited.
+    """
+    ephemeral = X25519PrivateKey.generate()
+    shared = ephemeral.exchange(X25519PublicKey.from_public_bytes(public_key))
+    nonce = os.urandom(12)
+    return {
+        "key": _raw_public(ephemeral.public_key()).hex(),
+        "nonce": nonce.hex(),
+        "data": _cipher(shared).encrypt(nonce, orjson.dumps(payload), aad).hex(),
+    }
+
+
+def unseal(sealed: Dict[str, str], private_key: X25519PrivateKey, aad: bytes) -> Dict[str, Any]:
+    shared = private_key.exchange(X25519PublicKey.from_public_bytes(bytes.fromhex(sealed["key"])))
+    return orjson.loads(_cipher(shared).decrypt(bytes.fromhex(sealed["nonce"]), bytes.fromhex(sealed["data"]), aad))
+
+
+def _after(items: List[Dict[str, Any]], since: int) -> List[Dict[str, Any]]:
+    return [item for item in items if (item.get("seq") or 0) > since]
+
+
+def _page(status: Dict[str, Any], since: Optional[int]) -> Dict[str, Any]:
+    """Narrows a published status to the trades and logs after `since`."""
+    if since is None:
+        return status
+
+    def narrow(part: Dict[str, Any]) -> Dict[str, Any]:
+        events = _after(part.get("events", []), since)
+        return {**part, "recent_trades": _after(part["recent_trades"], since),
+                "events": events, "logs": [event["message"] for event in events]}
+
+    return {**narrow(status), "sessions": [narrow(session) for session in status.get("sessions", [])]}
+
+
+class ScalperCoordinator:
+    """
+    Pins the scalper to one worker process.
+
+    Workers compete for a lease in the shared store; the holder runs the
+    ScalperService, executes start/stop commands relayed by the other workers
+    and publishes its status, so every worker answers the trading endpoints the
+    same way. With one worker it is always the leader and nothing is relayed.
+
+    The lease names the leader's public key: relayed exchange credentials are
+    sealed to it, so the store never holds them in the clear.
+    """
+
+    def __init__(self, store: SharedStore = shared_store, scalper: Optional[ScalperService] = None,
+                 lease_ttl: float = LEASE_TTL, heartbeat: float = HEARTBEAT,
+                 poll: float = COMMAND_POLL, timeout: float = COMMAND_TIMEOUT):
+        self.store = store
+        self.scalper = scalper or ScalperService()
+        self.lease_ttl = lease_ttl
+        self.heartbeat = heartbeat
+        self.poll = poll
+        self.timeout = timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._private_key = X25519PrivateKey.generate()
+        # Lease value: "<worker id> <public key>"
+        self._lease = f"{self.worker_id} {_raw_public(self._private_key.public_key()).hex()}".encode()
+        self.is_leader = False
+        self._renewed = 0.0
+        self._published = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def elect(self) -> bool:
+        """Takes or renews the lease. Returns whether this worker leads."""
+        now = time.monotonic()
+        if self.is_leader:
+            if now - self._renewed < self.heartbeat:
+                return True
+            # Compare-and-set: renews only a lease that is still ours, or retakes a lapsed one
+            if (await self.store.replace(LEADER_KEY, self._lease, self._lease, self.lease_ttl)
+                    or await self.store.add(LEADER_KEY, self._lease, self.lease_ttl)):
+                self._renewed = now
+                return True
+            # Lease lapsed (e.g. a long pause) and another worker took over
+            logger.warning("Worker %s lost the scalper lease", self.worker_id)
+            self.is_leader = False
+            if self.scalper.is_running:
+                self.scalper.stop()
+            return False
+        if await self.store.add(LEADER_KEY, self._lease, self.lease_ttl):
+            logger.info("Worker %s runs the scalper", self.worker_id)
+            self.is_leader = True
+            self._renewed = now
+        return self.is_leader
+
+    async def run_once(self):
+        if not await self.elect():
+            return
+        raw = await self.store.get(COMMAND_KEY)
+        if raw is not None:
+            await self.store.delete(COMMAND_KEY)
+            command = orjson.loads(raw)
+            result = await self._execute(command)
+            await self.store.set(RESULT_KEY + command["id"], orjson.dumps(result), self.timeout)
+        # Status of every session can be large: publish it each heartbeat and after commands
+        now = time.monotonic()
+        if raw is not None or now - self._published >= self.heartbeat:
+            await self.store.set(STATUS_KEY, orjson.dumps(self._local_status()), self.lease_ttl)
+            self._published = now
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Scalper coordination failed: %s", e)
+            await asyncio.sleep(self.poll)
+
+    async def start(self):
+        try:
+            await self.elect()
+        except Exception as e:
+            logger.warning("Scalper election failed: %s", e)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            # Hand over right away instead of after the lease expires
+            self.is_leader = False
+            try:
+                await self.store.delete(LEADER_KEY)
+                await self.store.delete(STATUS_KEY)
+            except Exception as e:
+                logger.warning("Releasing the scalper lease failed: %s", e)
+
+    def _local_status(self, since: Optional[int] = None) -> Dict[str, Any]:
+        status = self.scalper.get_status(since)
+        return {
+            **status,
+            "recent_trades": [t.model_dump() for t in status["recent_trades"]],
+            "sessions": [
+                {**session, "recent_trades": [t.model_dump() for t in session["recent_trades"]]}
+                for session in status.get("sessions", [])
+            ],
+        }
+
+    async def _execute(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        if command["action"] == "start":
+            config = command["config"]
+            exchange_service = None
+            try:
+                if "sealed" in config:
+                    try:
+                        config = {**config, **unseal(config["sealed"], self._private_key, command["id"].encode())}
+                    except InvalidTag:
+                        # Leadership changed after the relaying worker sealed them
+                        raise ValueError("Credentials were sealed for another scalper worker, retry")
+                # Pooled client: markets are loaded and the connection checked once per credentials
+                exchange_service = await exchange_pool.acquire(
+                    exchange_id=config["exchange_id"],
+                    api_key=config["api_key"],
+                    secret=config["secret"],
+                    passphrase=config.get("passphrase"),
+                    testnet=config.get("testnet", True),
+                )
+                self.scalper.start(exchange_service, command["symbols"])
+            except Exception as e:
+                if exchange_service is not None:
+                    await exchange_pool.release(exchange_service)
+                return {"ok": False, "detail": str(e)}
+        else:
+            self.scalper.stop(command.get("session_id"))
+        return {"ok": True, "status": self._local_status()}
+
+    async def _relay(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs `command` on the leader: locally, or through the shared store."""
+        if self.is_leader:
+            result = await self._execute(command)
+        else:
+            command["id"] = uuid.uuid4().hex
+            if command["action"] == "start":
+                command["config"] = await self._seal(command["config"], command["id"].encode())
+            deadline = time.monotonic() + self.timeout
+            # One pending command at a time; the slot expires if no leader takes it
+            while not await self.store.add(COMMAND_KEY, orjson.dumps(command), self.timeout):
+                if time.monotonic() >= deadline:
+                    raise ScalperUnavailable("Scalper worker is busy")
+                await asyncio.sleep(self.poll)
+            while (raw := await self.store.get(RESULT_KEY + command["id"])) is None:
+                if time.monotonic() >= deadline:
+                    raise ScalperUnavailable("No worker is running the scalper")
+                await asyncio.sleep(self.poll)
+            await self.store.delete(RESULT_KEY + command["id"])
+            result = orjson.loads(raw)
+        if not result["ok"]:
+            raise ScalperCommandError(result["detail"])
+        return result["status"]
+
+    async def _seal(self, config: Dict[str, Any], aad: bytes) -> Dict[str, Any]:
+        """`config` with its credentials sealed to the current leader."""
+        lease = await self.store.get(LEADER_KEY)
+        if lease is None:
+            raise ScalperUnavailable("No worker is running the scalper")
+        public_key = bytes.fromhex(lease.rsplit(b" ", 1)[1].decode())
+        secrets = {field: config[field] for field in SECRET_FIELDS if config.get(field) is not None}
+        public = {field: value for field, value in config.items() if field not in SECRET_FIELDS}
+        return {**public, "sealed": seal(secrets, public_key, aad)}
+
+    async def start_scalper(self, config: Dict[str, Any], symbols: List[str]) -> Dict[str, Any]:
+        return await self._relay({"action": "start", "config": config, "symbols": symbols})
+
+    async def stop_scalper(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Stops one session, or all of them."""
+        return await self._relay({"action": "stop", "session_id": session_id})
+
+    async def status(self, since: Optional[int] = None) -> Dict[str, Any]:
+        """Scalper status; with `since`, only the trades and logs after that cursor."""
+        if self.is_leader:
+            return self._local_status(since)
+        raw = await self.store.get(STATUS_KEY)
+        if raw is None:
+            return {"is_running": False, "symbol": None, "recent_trades": [], "logs": [], "events": [],
+                    "sessions": [], "cursor": since or 0}
+        # The published status holds the recent entries; older ones are only on the leader
+        return _page(orjson.loads(raw), since)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"worker_id": self.worker_id, "is_leader": self.is_leader, **self.scalper.stats()}
+
+
+scalper_coordinator = ScalperCoordinator()
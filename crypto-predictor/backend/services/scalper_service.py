@@ -1,111 +1,400 @@
 import asyncio
+import itertools
+import math
+import os
 import time
-import pandas as pd
-import pandas_ta as ta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterable, Iterator, NamedTuple, Sequence, Tuple, Union
 try:
-    from .exchange_service import ExchangeService
+    from .exchange_service import ExchangeService, exchange_pool
+    from .market_feed import SCALPER_FEED, STREAM_RETRY_AFTER, MarketDataFeed
+    from .ring_buffer import RingBuffer
+    from .scalper_strategy import EmaRsiCrossStrategy
+    from .upstream_scheduler import TokenBucket
     from ..models.schemas import TradeSignal
 except ImportError:
-    from services.exchange_service import ExchangeService
+    from services.exchange_service import ExchangeService, exchange_pool
+    from services.market_feed import SCALPER_FEED, STREAM_RETRY_AFTER, MarketDataFeed
+    from services.ring_buffer import RingBuffer
+    from services.scalper_strategy import EmaRsiCrossStrategy
+    from services.upstream_scheduler import TokenBucket
     from models.schemas import TradeSignal
 
+CANDLE_MS = 60 * 1000
+# Seconds after a candle closes before it is fetched (exchanges publish it with a short delay)
+CANDLE_CLOSE_GRACE = float(os.getenv("SCALPER_CLOSE_GRACE", "2"))
+# Candles fetched when a session starts, enough to warm up EMA 21 and RSI 14
+WARMUP_CANDLES = 100
+# Concurrent candle fetches per exchange client
+EXCHANGE_FETCH_CONCURRENCY = 8
+# How often a streaming group picks up new or stopped sessions and checks its streams
+STREAM_SUPERVISE = 1.0
+# Retained per session (and for the engine's own log); older entries are overwritten
+MAX_LOGS = 100
+MAX_TRADES = 100
+# Entries in a status without a cursor, and at most per page with one
+RECENT_LOGS = 20
+RECENT_TRADES = 10
+MAX_PAGE = 200
+
+REASONS = {
+    "buy": "EMA Gold Cross + RSI Bull",
+    "sell": "EMA Death Cross + RSI Bear",
+}
+
+LOG_FORMATS = {
+    "tick": "Price: {price} | EMA Fast: {ema_fast:.2f} | EMA Slow: {ema_slow:.2f} | RSI: {rsi:.2f}",
+    "signal": "{label} SIGNAL detected at {price}",
+    "error": "Error in scalper loop: {error}",
+    "started": "Scalper started for {symbol} on {exchange_id}",
+    "stopped": "Scalper stopped for {session_id}",
+    "trade": "{side} {symbol} on {exchange_id} at {price}",
+    "fallback": "Streaming unavailable on {exchange_id}, polling instead: {error}",
+}
+
+
+class LogEvent(NamedTuple):
+    """A structured log entry, only formatted into text when read."""
+    at: float
+    level: str
+    event: str
+    fields: Dict[str, Any]
+
+    def message(self) -> str:
+        return f"[{time.strftime('%H:%M:%S', time.localtime(self.at))}] {LOG_FORMATS[self.event].format(**self.fields)}"
+
+    def to_dict(self, seq: int) -> Dict[str, Any]:
+        return {
+            "seq": seq,
+            "time": int(self.at * 1000),
+            "level": self.level,
+            "event": self.event,
+            # NaN (indicators still warming up) isn't valid JSON
+            "fields": {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in self.fields.items()},
+            "message": self.message(),
+        }
+
+
+def _page(buffer: RingBuffer, since: Optional[int], recent: int) -> List[Tuple[int, Any]]:
+    return buffer.entries(limit=recent) if since is None else buffer.entries(since, MAX_PAGE)
+
+
+class ScalperSession:
+    """One (exchange, symbol) pair with its own incremental strategy state."""
+
+    def __init__(self, exchange_id: str, symbol: str, strategy: Optional[EmaRsiCrossStrategy] = None,
+                 counter: Optional[Iterator[int]] = None):
+        self.session_id = f"{exchange_id}:{symbol}"
+        self.exchange_id = exchange_id
+        self.symbol = symbol
+        self.strategy = strategy or EmaRsiCrossStrategy()
+        # Open time of the newest candle folded into the strategy
+        self.last_candle: Optional[int] = None
+        self.candles_processed = 0
+        # Still forming candle from the stream and the signal it would give if it closed now
+        self.forming: Optional[List[float]] = None
+        self.forming_signal: Optional[str] = None
+        # Trades and logs share the engine's sequence numbers, so one cursor pages through all of them
+        counter = counter if counter is not None else itertools.count(1)
+        self.trades = RingBuffer(MAX_TRADES, counter)
+        self.logs = RingBuffer(MAX_LOGS, counter)
+
+    def log(self, event: str, level: str = "info", **fields):
+        self.logs.append(LogEvent(time.time(), level, event, fields))
+
+    def on_candles(self, candles: Sequence[Sequence[float]], now_ms: Optional[int] = None) -> List[TradeSignal]:
+        """
+        Folds in the closed candles newer than the last one seen. With `now_ms`,
+        candles still forming at that time are left for the next round (streamed
+        candles are known to be closed and skip the check). Returns new trade
+        signals; the warm-up history only signals on its newest candle.
+        """
+        warm = self.last_candle is not None
+        closed = [
+            candle for candle in sorted(candles)
+            if (now_ms is None or candle[0] + CANDLE_MS <= now_ms)
+            and (self.last_candle is None or candle[0] > self.last_candle)
+        ]
+        signals = []
+        for i, (time_ms, _open, _high, _low, close, _volume) in enumerate(closed):
+            side = self.strategy.update(float(close))
+            if side is not None and (warm or i == len(closed) - 1):
+                signal = TradeSignal(
+                    timestamp=int(time_ms) + CANDLE_MS,
+                    symbol=self.symbol,
+                    side=side,
+                    price=float(close),
+                    reason=REASONS[side],
+                )
+                signal.seq = self.trades.append(signal)
+                signals.append(signal)
+        folded = len(closed)
+        if closed:
+            self.last_candle = int(closed[-1][0])
+        self.candles_processed += folded
+
+        if folded:
+            s = self.strategy
+            self.log("tick", price=s.close, ema_fast=s.ema_fast, ema_slow=s.ema_slow, rsi=s.rsi)
+            for signal in signals:
+                label = "🚀 BULLISH" if signal.side == "buy" else "📉 BEARISH"
+                self.log("signal", label=label, price=signal.price)
+        return signals
+
+    def on_forming(self, candle: Optional[Sequence[float]]):
+        """Tracks the forming candle; signals still only fire once it closes."""
+        if candle is None or (self.last_candle is not None and candle[0] <= self.last_candle):
+            self.forming, self.forming_signal = None, None
+            return
+        self.forming = list(candle)
+        self.forming_signal = self.strategy.preview(float(candle[4])) if self.last_candle is not None else None
+
+    def status(self, since: Optional[int] = None) -> Dict[str, Any]:
+        """Recent trades and logs, or with `since` those after that sequence number."""
+        events = [event.to_dict(seq) for seq, event in _page(self.logs, since, RECENT_LOGS)]
+        forming = None
+        if self.forming is not None:
+            forming = {"time": int(self.forming[0]), "close": self.forming[4], "signal": self.forming_signal}
+        return {
+            "session_id": self.session_id,
+            "exchange_id": self.exchange_id,
+            "symbol": self.symbol,
+            "last_candle": self.last_candle,
+            "last_price": None if self.last_candle is None else self.strategy.close,
+            "candles_processed": self.candles_processed,
+            "forming": forming,
+            "recent_trades": [trade for _, trade in _page(self.trades, since, RECENT_TRADES)],
+            "logs": [event["message"] for event in events],
+            "events": events,
+        }
+
+
+class _ExchangeGroup:
+    """Sessions sharing one exchange client, its rate limit and its market data loop."""
+
+    def __init__(self, exchange_service: ExchangeService):
+        self.exchange_service = exchange_service
+        self.exchange_id = exchange_service.exchange.id
+        # ccxt's rateLimit is the minimum delay between requests in ms
+        rate_limit_ms = getattr(exchange_service.exchange, "rateLimit", 1000) or 1000
+        self.bucket = TokenBucket(1000 / rate_limit_ms, EXCHANGE_FETCH_CONCURRENCY)
+        self.sessions: Dict[str, ScalperSession] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.feed: Optional[MarketDataFeed] = None
+        self.mode = "poll"
+        # monotonic time before which streaming isn't retried after it failed
+        self.stream_retry_at = 0.0
+        self.rounds = 0
+        self.fetches = 0
+        self.errors = 0
+        self.stream_updates = 0
+        self.fallbacks = 0
+
+
 class ScalperService:
+    """
+    Scalper engine for many (exchange, symbol) sessions in one process.
+
+    Sessions on the same exchange client follow the exchange's WebSocket
+    klines (or trades) over one ccxt.pro connection, so a closed candle reaches
+    the session's incremental EMA/RSI state as soon as the exchange reports it.
+    Where streaming is unavailable or fails, the sessions are polled together
+    once per candle instead, right after it closes (aligned to the wall clock
+    rather than a drifting sleep), fetching only the candles since the last one
+    seen with requests paced by the exchange's rate limit.
+    """
     _instance = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(ScalperService, cls).__new__(cls)
-            cls._instance.is_running = False
-            cls._instance.task = None
-            cls._instance.exchange_service = None
-            cls._instance.symbol = None
-            cls._instance.trades: List[TradeSignal] = []
-            cls._instance.logs: List[str] = []
+            cls._instance._groups: Dict[int, _ExchangeGroup] = {}
+            cls._instance._seq = itertools.count(1)
+            cls._instance.logs = RingBuffer(MAX_LOGS, cls._instance._seq)
         return cls._instance
 
-    def start(self, exchange_service: ExchangeService, symbol: str):
-        if self.is_running:
-            return
-        self.is_running = True
-        self.exchange_service = exchange_service
-        self.symbol = symbol
-        self.task = asyncio.create_task(self._run_loop())
-        self._add_log(f"Scalper started for {symbol}")
+    @property
+    def is_running(self) -> bool:
+        return any(group.sessions for group in self._groups.values())
+
+    @property
+    def sessions(self) -> Dict[str, ScalperSession]:
+        return {sid: s for group in self._groups.values() for sid, s in group.sessions.items()}
+
+    def start(self, exchange_service: ExchangeService, symbols: Union[str, Iterable[str]]) -> List[str]:
+        """
+        Starts a session per symbol on `exchange_service`, taking over the
+        caller's lease on it. Returns the session ids started.
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        group = self._groups.get(id(exchange_service))
+        if group is None:
+            group = _ExchangeGroup(exchange_service)
+            self._groups[id(exchange_service)] = group
+        else:
+            # Same pooled client: the group already holds a lease on it
+            asyncio.create_task(exchange_pool.release(exchange_service))
+        running = self.sessions
+
+        started = []
+        for symbol in symbols:
+            session_id = f"{group.exchange_id}:{symbol}"
+            if session_id in running:
+                continue
+            group.sessions[session_id] = ScalperSession(group.exchange_id, symbol, counter=self._seq)
+            started.append(session_id)
+            self._add_log("started", symbol=symbol, exchange_id=group.exchange_id)
+
+        if not group.sessions:
+            # Every symbol was already running on another client
+            del self._groups[id(exchange_service)]
+            asyncio.create_task(exchange_pool.release(exchange_service))
+        elif group.task is None or group.task.done():
+            group.task = asyncio.create_task(self._run_loop(group))
+        return started
 
-    def stop(self):
-        self.is_running = False
-        if self.task:
-            self.task.cancel()
+    def stop(self, session_id: Optional[str] = None):
+        """Stops one session, or all of them."""
+        for key, group in list(self._groups.items()):
+            stopped = [sid for sid in group.sessions if session_id is None or sid == session_id]
+            for sid in stopped:
+                del group.sessions[sid]
+                self._add_log("stopped", session_id=sid)
+            if stopped and not group.sessions:
+                del self._groups[key]
+                if group.task:
+                    group.task.cancel()
+                asyncio.create_task(self._cleanup(group))
 
-        asyncio.create_task(self._cleanup())
-        self._add_log("Scalper stopped")
+    async def _cleanup(self, group: _ExchangeGroup):
+        await exchange_pool.release(group.exchange_service)
 
-    async def _cleanup(self):
-        if self.exchange_service:
-            await self.exchange_service.close()
+    def _add_log(self, event: str, level: str = "info", **fields):
+        self.logs.append(LogEvent(time.time(), level, event, fields))
 
-    def _add_log(self, message: str):
-        timestamp = time.strftime("%H:%M:%S")
-        self.logs.append(f"[{timestamp}] {message}")
-        if len(self.logs) > 100:
-            self.logs.pop(0)
+    async def _run_loop(self, group: _ExchangeGroup):
+        while group.sessions:
+            if SCALPER_FEED == "stream" and time.monotonic() >= group.stream_retry_at:
+                try:
+                    await self._stream(group)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    group.fallbacks += 1
+                    group.stream_retry_at = time.monotonic() + STREAM_RETRY_AFTER
+                    self._add_log("fallback", "warning", exchange_id=group.exchange_id, error=str(e))
+                continue
+            group.mode = "poll"
+            await self._poll(group)
+            # Next round shortly after the next candle closes
+            now = time.time()
+            next_close = (int(now * 1000) // CANDLE_MS + 1) * CANDLE_MS / 1000
+            await asyncio.sleep(next_close + CANDLE_CLOSE_GRACE - now)
 
-    async def _run_loop(self):
-        while self.is_running:
+    async def _stream(self, group: _ExchangeGroup):
+        """Follows the group's sessions over WebSockets. Returns or raises only when streaming fails."""
+        group.feed = MarketDataFeed.open(group.exchange_service)
+        group.mode = "stream"
+        tasks: Dict[str, asyncio.Task] = {}
+        try:
+            while group.sessions:
+                for sid, session in group.sessions.items():
+                    if sid not in tasks:
+                        tasks[sid] = asyncio.create_task(self._stream_session(group, session))
+                for sid in [sid for sid in tasks if sid not in group.sessions]:
+                    tasks.pop(sid).cancel()
+                for task in tasks.values():
+                    if task.done():
+                        # Surfaces the stream's error
+                        task.result()
+                await asyncio.wait(list(tasks.values()), timeout=STREAM_SUPERVISE, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            feed, group.feed = group.feed, None
             try:
-                # 1. Fetch OHLCV (1m timeframe for scalping)
-                ohlcv = await self.exchange_service.exchange.fetch_ohlcv(self.symbol, timeframe='1m', limit=50)
-                df = pd.DataFrame(ohlcv, columns=['time', 'open', 'high', 'low', 'close', 'volume'])
-
-                # 2. Compute Indicators
-                df['ema_fast'] = ta.ema(df['close'], length=9)
-                df['ema_slow'] = ta.ema(df['close'], length=21)
-                df['rsi'] = ta.rsi(df['close'], length=14)
-
-                last = df.iloc[-1]
-                prev = df.iloc[-2]
-
-                self._add_log(f"Price: {last['close']} | EMA Fast: {round(last['ema_fast'], 2)} | EMA Slow: {round(last['ema_slow'], 2)} | RSI: {round(last['rsi'], 2)}")
-
-                # 3. Strategy: EMA Crossover + RSI Confirmation
-                # Buy when Fast EMA crosses above Slow EMA and RSI > 50
-                if prev['ema_fast'] <= prev['ema_slow'] and last['ema_fast'] > last['ema_slow'] and last['rsi'] > 50:
-                    self._add_log(f"🚀 BULLISH SIGNAL detected at {last['close']}")
-                    # In a real scenario, we'd place an order here
-                    # await self.exchange_service.create_market_order(self.symbol, 'buy', 0.001)
-                    self.trades.append(TradeSignal(
-                        timestamp=int(time.time() * 1000),
-                        symbol=self.symbol,
-                        side="buy",
-                        price=float(last['close']),
-                        reason="EMA Gold Cross + RSI Bull"
-                    ))
-
-                # Sell when Fast EMA crosses below Slow EMA and RSI < 50
-                elif prev['ema_fast'] >= prev['ema_slow'] and last['ema_fast'] < last['ema_slow'] and last['rsi'] < 50:
-                    self._add_log(f"📉 BEARISH SIGNAL detected at {last['close']}")
-                    # await self.exchange_service.create_market_order(self.symbol, 'sell', 0.001)
-                    self.trades.append(TradeSignal(
-                        timestamp=int(time.time() * 1000),
-                        symbol=self.symbol,
-                        side="sell",
-                        price=float(last['close']),
-                        reason="EMA Death Cross + RSI Bear"
-                    ))
-
-                await asyncio.sleep(60) # Wait for next candle
-
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                self._add_log(f"Error in scalper loop: {e}")
-                await asyncio.sleep(10)
-
-    def get_status(self) -> Dict[str, Any]:
+                await feed.close()
+            except Exception:
+                pass
+
+    async def _stream_session(self, group: _ExchangeGroup, session: ScalperSession):
+        # Warm up (or catch up after polling) over REST, then follow the stream
+        await self._fetch(group, session)
+        async for closed, forming in group.feed.candles(session.symbol):
+            group.stream_updates += 1
+            if closed and session.last_candle is not None and closed[0][0] > session.last_candle + CANDLE_MS:
+                # Candles missed while (re)connecting come from REST first
+                await self._fetch(group, session)
+            self._fold(session, closed)
+            session.on_forming(forming)
+
+    def _fold(self, session: ScalperSession, candles: Sequence[Sequence[float]], now_ms: Optional[int] = None):
+        for signal in session.on_candles(candles, now_ms):
+            self._add_log("trade", side=signal.side.upper(), symbol=signal.symbol,
+                          exchange_id=session.exchange_id, price=signal.price)
+            # In a real scenario, we'd place an order here
+            # await group.exchange_service.create_market_order(signal.symbol, signal.side, 0.001)
+
+    async def _fetch(self, group: _ExchangeGroup, session: ScalperSession):
+        """Fetches and folds the closed candles since the session's last one over REST."""
+        while not group.bucket.take(time.monotonic()):
+            await asyncio.sleep(group.bucket.delay(time.monotonic()))
+        since = None if session.last_candle is None else session.last_candle + CANDLE_MS
+        try:
+            candles = await group.exchange_service.exchange.fetch_ohlcv(
+                session.symbol, timeframe='1m', since=since, limit=WARMUP_CANDLES
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            group.errors += 1
+            session.log("error", "error", error=str(e))
+            return
+        group.fetches += 1
+        self._fold(session, candles, int(time.time() * 1000))
+
+    async def _poll(self, group: _ExchangeGroup):
+        """One round: fetch and fold new candles for every session of the group."""
+        group.rounds += 1
+        semaphore = asyncio.Semaphore(EXCHANGE_FETCH_CONCURRENCY)
+
+        async def fetch(session: ScalperSession):
+            async with semaphore:
+                await self._fetch(group, session)
+
+        await asyncio.gather(*(fetch(s) for s in list(group.sessions.values())))
+
+    def get_status(self, since: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Status with the recent trades and logs. With `since` (the cursor of a
+        previous status) only the entries added after it are included.
+        """
+        sessions = list(self.sessions.values())
+        statuses = [s.status(since) for s in sessions]
+        trades = sorted((t for status in statuses for t in status["recent_trades"]), key=lambda t: t.seq)
+        # The engine's own log interleaved with every session's ticks, signals and errors
+        events = [event.to_dict(seq) for seq, event in _page(self.logs, since, RECENT_LOGS)]
+        events = sorted(events + [e for status in statuses for e in status["events"]], key=lambda e: e["seq"])
+        events = events[-(RECENT_LOGS if since is None else MAX_PAGE):]
+        cursor = max([self.logs.last_seq] + [max(s.logs.last_seq, s.trades.last_seq) for s in sessions])
         return {
-            "is_running": self.is_running,
-            "symbol": self.symbol,
-            "recent_trades": self.trades[-10:],
-            "logs": self.logs[-20:]
+            "is_running": bool(sessions),
+            "symbol": sessions[0].symbol if sessions else None,
+            "recent_trades": trades[-(RECENT_TRADES if since is None else MAX_PAGE):],
+            "logs": [event["message"] for event in events],
+            "events": events,
+            "sessions": statuses,
+            "cursor": cursor,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "exchanges": [
+                {"exchange_id": g.exchange_id, "sessions": len(g.sessions), "mode": g.mode, "rounds": g.rounds,
+                 "fetches": g.fetches, "errors": g.errors, "stream_updates": g.stream_updates,
+                 "fallbacks": g.fallbacks}
+                for g in self._groups.values()
+            ],
         }
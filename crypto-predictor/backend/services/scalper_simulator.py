@@ -0,0 +1,225 @@
+"""
+Replays stored 1m candles through the scalper strategy.
+
+Run from the backend directory, e.g. sweeping the EMA lengths over a CSV of
+time,open,high,low,close,volume rows (time in ms) or a candle store series:
+    python -m services.scalper_simulator candles.csv --fast 5,9,12 --slow 21,30 --fee 0.001
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+try:
+    from .candle_store import CANDLE_COLUMNS, CandleStore
+    from .scalper_service import CANDLE_MS, REASONS
+    from .scalper_strategy import EmaRsiCrossStrategy
+    from ..models.schemas import TradeSignal
+except ImportError:
+    from services.candle_store import CANDLE_COLUMNS, CandleStore
+    from services.scalper_service import CANDLE_MS, REASONS
+    from services.scalper_strategy import EmaRsiCrossStrategy
+    from models.schemas import TradeSignal
+
+# Taker fee and slippage per fill, as fractions of the fill price
+DEFAULT_FEE = 0.001
+DEFAULT_SLIPPAGE = 0.0005
+INITIAL_CASH = 10_000.0
+
+STRATEGY_PARAMS = ("fast", "slow", "rsi_length", "rsi_threshold")
+
+Candles = Dict[str, np.ndarray]
+
+
+def load_candles(path: str) -> Candles:
+    """
+    1m candles from a candle store series directory (memory-mapped) or a
+    CSV/Parquet file with time (ms), open, high, low, close and volume columns.
+    """
+    if os.path.isdir(path):
+        return CandleStore.read_series_dir(path)
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    df = df.sort_values('time')
+    return {c: df[c].to_numpy(dtype=dtype) for c, dtype in CANDLE_COLUMNS.items()}
+
+
+class ScalperSimulator:
+    @staticmethod
+    def run(candles: Candles, symbol: str = "SIM", fast: int = 9, slow: int = 21, rsi_length: int = 14,
+            rsi_threshold: float = 50, fee: float = DEFAULT_FEE, slippage: float = DEFAULT_SLIPPAGE,
+            initial_cash: float = INITIAL_CASH, allow_short: bool = False, record: bool = True) -> Dict[str, Any]:
+        """
+        Event-driven replay through EmaRsiCrossStrategy, one closed candle at a time.
+
+        A signal on a candle's close becomes a market order filled at the next
+        candle's open, moved against us by `slippage` and charged `fee` on the
+        notional. A buy goes all-in long; a sell exits the long (or flips short
+        with `allow_short`). Equity is marked to every close. With `record`,
+        the TradeSignal records and the equity curve are returned too.
+        """
+        strategy = EmaRsiCrossStrategy(fast, slow, rsi_length, rsi_threshold)
+        times = np.asarray(candles['time']).tolist()
+        opens = np.asarray(candles['open']).tolist()
+        closes = np.asarray(candles['close']).tolist()
+        n = len(closes)
+
+        cash, units = float(initial_cash), 0.0
+        entry_equity = 0.0
+        fees = 0.0
+        fills = wins = round_trips = 0
+        pending: Optional[str] = None
+        signals: List[TradeSignal] = []
+        signal_count = 0
+        equity = np.empty(n) if record else None
+        peak, max_drawdown = float(initial_cash), 0.0
+
+        for i in range(n):
+            if pending is not None:
+                price = opens[i] * (1 + slippage if pending == "buy" else 1 - slippage)
+                target = 1 if pending == "buy" else (-1 if allow_short else 0)
+                held = (units > 0) - (units < 0)
+                if target != held:
+                    value = cash + units * price
+                    if held:
+                        round_trips += 1
+                        wins += value > entry_equity
+                    target_units = target * value / (price * (1 + fee))
+                    quantity = target_units - units
+                    cost = abs(quantity * price) * fee
+                    cash -= quantity * price + cost
+                    units = target_units
+                    fees += cost
+                    fills += 1
+                    entry_equity = value
+                pending = None
+
+            close = closes[i]
+            side = strategy.update(close)
+            if side is not None:
+                signal_count += 1
+                if record:
+                    signals.append(TradeSignal(
+                        timestamp=int(times[i]) + CANDLE_MS, symbol=symbol, side=side,
+                        price=close, reason=REASONS[side],
+                    ))
+                if i + 1 < n:
+                    pending = side
+
+            value = cash + units * close
+            if record:
+                equity[i] = value
+            if value > peak:
+                peak = value
+            elif peak > 0 and 1 - value / peak > max_drawdown:
+                max_drawdown = 1 - value / peak
+
+        final = cash + units * closes[-1] if n else float(initial_cash)
+        result = {
+            "params": {"fast": fast, "slow": slow, "rsi_length": rsi_length, "rsi_threshold": rsi_threshold},
+            "candles": n,
+            "signals": signal_count,
+            "fills": fills,
+            "round_trips": round_trips,
+            "win_rate": round(wins / round_trips, 4) if round_trips else None,
+            "fees_paid": round(fees, 6),
+            "final_equity": round(final, 6),
+            "total_return": round(final / initial_cash - 1, 6),
+            "buy_and_hold_return": round(closes[-1] / closes[0] - 1, 6) if n else 0.0,
+            "max_drawdown": round(max_drawdown, 6),
+        }
+        if record:
+            result["trade_signals"] = signals
+            result["equity"] = pd.DataFrame({"time": np.asarray(candles['time']), "equity": equity})
+        return result
+
+    @staticmethod
+    def grid(**values: Iterable) -> List[Dict[str, Any]]:
+        """Every combination of the given strategy parameter values, skipping fast >= slow."""
+        names = list(values)
+        combos = [dict(zip(names, combo)) for combo in itertools.product(*values.values())]
+        return [c for c in combos if c.get("fast", 9) < c.get("slow", 21)]
+
+    @staticmethod
+    def sweep(candles: Candles, params: List[Dict[str, Any]], workers: Optional[int] = None,
+              **config) -> List[Dict[str, Any]]:
+        """
+        Runs every parameter set over the same candles, one process per core,
+        and returns the summaries best total return first. Each worker receives
+        the candles once rather than with every task.
+        """
+        runs = [{**config, **p, "record": False} for p in params]
+        workers = min(workers or os.cpu_count() or 1, len(runs))
+        if workers <= 1:
+            results = [ScalperSimulator.run(candles, **run) for run in runs]
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                     initargs=({c: np.asarray(v) for c, v in candles.items()},)) as pool:
+                results = list(pool.map(_run_worker, runs))
+        return sorted(results, key=lambda r: r["total_return"], reverse=True)
+
+
+_worker_candles: Optional[Candles] = None
+
+
+def _init_worker(candles: Candles):
+    global _worker_candles
+    _worker_candles = candles
+
+
+def _run_worker(run: Dict[str, Any]) -> Dict[str, Any]:
+    return ScalperSimulator.run(_worker_candles, **run)
+
+
+def _values(text: str, cast=int) -> List:
+    return [cast(v) for v in text.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay 1m candles through the scalper strategy.")
+    parser.add_argument("path", help="CSV/Parquet file or candle store series directory")
+    parser.add_argument("--fast", default="9", help="fast EMA lengths, comma separated")
+    parser.add_argument("--slow", default="21", help="slow EMA lengths, comma separated")
+    parser.add_argument("--rsi-length", default="14")
+    parser.add_argument("--rsi-threshold", default="50")
+    parser.add_argument("--fee", type=float, default=DEFAULT_FEE)
+    parser.add_argument("--slippage", type=float, default=DEFAULT_SLIPPAGE)
+    parser.add_argument("--allow-short", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--equity", help="write the best run's equity curve to this CSV")
+    args = parser.parse_args()
+
+    candles = load_candles(args.path)
+    params = ScalperSimulator.grid(
+        fast=_values(args.fast), slow=_values(args.slow),
+        rsi_length=_values(args.rsi_length), rsi_threshold=_values(args.rsi_threshold, float),
+    )
+    config = {"fee": args.fee, "slippage": args.slippage, "allow_short": args.allow_short}
+    started = time.perf_counter()
+    results = ScalperSimulator.sweep(candles, params, args.workers, **config)
+    elapsed = time.perf_counter() - started
+    total = len(candles['close']) * len(params)
+    print(f"{len(params)} run(s) over {len(candles['close'])} candles in {elapsed:.1f}s "
+          f"({total / elapsed / 1e6:.2f}M candles/s)")
+    print(f"{'fast':>5} {'slow':>5} {'rsi':>4} {'thr':>5} {'return':>9} {'b&h':>9} {'maxdd':>7} {'trips':>6} {'win':>6}")
+    for r in results[:args.top]:
+        p = r["params"]
+        win = "-" if r["win_rate"] is None else f"{r['win_rate']:.2f}"
+        print(f"{p['fast']:>5} {p['slow']:>5} {p['rsi_length']:>4} {p['rsi_threshold']:>5g} {r['total_return']:>9.4f} "
+              f"{r['buy_and_hold_return']:>9.4f} {r['max_drawdown']:>7.4f} {r['round_trips']:>6} {win:>6}")
+    if args.equity and results:
+        best = ScalperSimulator.run(candles, **{**config, **results[0]["params"]})
+        best["equity"].to_csv(args.equity, index=False)
+
+
+if __name__ == "__main__":
+    main()
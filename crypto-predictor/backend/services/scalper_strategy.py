@@ -0,0 +1,54 @@
+import copy
+import math
+from typing import Optional
+try:
+    from .incremental_indicators import NAN, _EMA, _RMA
+except ImportError:
+    from services.incremental_indicators import NAN, _EMA, _RMA
+
+
+class EmaRsiCrossStrategy:
+    """
+    EMA crossover confirmed by RSI, folded in one closed candle at a time.
+
+    Buys when the fast EMA crosses above the slow EMA with RSI above the
+    threshold, sells when it crosses below with RSI below it. EMA and RSI follow
+    pandas_ta (SMA-seeded EMA, Wilder RSI), so the signals match recomputing
+    ta.ema / ta.rsi over the whole history on every candle.
+    """
+
+    def __init__(self, fast: int = 9, slow: int = 21, rsi_length: int = 14, rsi_threshold: float = 50):
+        self.rsi_threshold = rsi_threshold
+        self._ema_fast = _EMA(fast)
+        self._ema_slow = _EMA(slow)
+        self._rsi_gain = _RMA(rsi_length)
+        self._rsi_loss = _RMA(rsi_length)
+        self.close = NAN
+        self.ema_fast = NAN
+        self.ema_slow = NAN
+        self.rsi = NAN
+
+    def update(self, close: float) -> Optional[str]:
+        """Folds in the close of a finished candle. Returns "buy", "sell" or None."""
+        rsi = NAN
+        if not math.isnan(self.close):
+            diff = close - self.close
+            gain = self._rsi_gain.update(diff if diff > 0 else 0.0)
+            loss = self._rsi_loss.update(-diff if diff < 0 else 0.0)
+            if gain + loss != 0:
+                rsi = 100 * gain / (gain + loss)
+        prev_fast, prev_slow = self.ema_fast, self.ema_slow
+        fast = self._ema_fast.update(close)
+        slow = self._ema_slow.update(close)
+        self.close, self.ema_fast, self.ema_slow, self.rsi = close, fast, slow, rsi
+
+        # NaN comparisons are False, so nothing fires while the indicators warm up
+        if prev_fast <= prev_slow and fast > slow and rsi > self.rsi_threshold:
+            return "buy"
+        if prev_fast >= prev_slow and fast < slow and rsi < self.rsi_threshold:
+            return "sell"
+        return None
+
+    def preview(self, close: float) -> Optional[str]:
+        """Signal the forming candle would give if it closed at `close`, without folding it in."""
+        return copy.deepcopy(self).update(close)
@@ -0,0 +1,496 @@
+import abc
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# "" keeps the shared tier in files under SHARED_CACHE_DIR (shared by workers on one host);
+# redis://host:6379/0 shares it between hosts
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+SHARED_CACHE_DIR = os.getenv(
+    "SHARED_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "shared"),
+)
+REDIS_KEY_PREFIX = "crypto-predictor:"
+# How often expired file entries are deleted
+SHARED_CACHE_SWEEP_INTERVAL = float(os.getenv("SHARED_CACHE_SWEEP_INTERVAL", "300"))
+# A key lock file older than this was left by a crashed writer
+_LOCK_STALE = 5.0
+
+# Deletes KEYS[1] only while it still holds ARGV[1], so a lock is only released by its holder
+_DISCARD_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Value framing: one type byte, then the payload
+_FRAME = b"F"
+_JSON = b"J"
+# Expiry header of file entries (unix time, 0 = never)
+_EXPIRY = struct.Struct("<d")
+
+
+def encode_frame(df: pd.DataFrame) -> bytes:
+    """
+    A DataFrame as a small JSON header followed by the raw NumPy buffer of each
+    column, padded to 8 bytes so columns decode as aligned zero-copy views.
+    """
+    columns = []
+    buffers = []
+    for name in df.columns:
+        values = np.ascontiguousarray(df[name].to_numpy())
+        if values.dtype == object:
+            raise TypeError(f"Column {name!r} has no fixed-width dtype")
+        columns.append([str(name), values.dtype.str, len(values)])
+        buffers.append(values.tobytes())
+    header = orjson.dumps({"columns": columns})
+    header += b" " * (-(len(header) + 4) % 8)
+    return struct.pack("<I", len(header)) + header + b"".join(buffers)
+
+
+def decode_frame(data: bytes) -> pd.DataFrame:
+    (header_size,) = struct.unpack_from("<I", data)
+    header = orjson.loads(data[4:4 + header_size])
+    offset = 4 + header_size
+    columns = {}
+    for name, dtype, length in header["columns"]:
+        dtype = np.dtype(dtype)
+        columns[name] = np.frombuffer(data, dtype=dtype, count=length, offset=offset)
+        offset += dtype.itemsize * length
+    return pd.DataFrame(columns, copy=False)
+
+
+def encode_value(value: Any) -> bytes:
+    if isinstance(value, pd.DataFrame):
+        return _FRAME + encode_frame(value)
+    return _JSON + orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def decode_value(data: bytes) -> Any:
+    kind, payload = data[:1], memoryview(data)[1:]
+    if kind == _FRAME:
+        return decode_frame(payload)
+    if kind == _JSON:
+        return orjson.loads(payload)
+    raise ValueError(f"Unknown shared cache value type {kind!r}")
+
+
+class SharedStore(abc.ABC):
+    """
+    Byte store shared by all worker processes.
+
+    `add` only writes when the key is absent (or expired), and `replace` and
+    `discard` only act while it holds an expected value; locks and leases are
+    built on them.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        ...
+
+    @abc.abstractmethod
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        ...
+
+    @abc.abstractmethod
+    async def replace(self, key: str, expected: bytes, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Atomically sets `key` to `value` if it currently holds `expected`."""
+
+    @abc.abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abc.abstractmethod
+    async def discard(self, key: str, expected: bytes) -> bool:
+        """Atomically deletes `key` if it currently holds `expected`."""
+
+    async def sweep(self) -> int:
+        """Deletes expired entries the backend doesn't expire itself. Returns how many."""
+        return 0
+
+    def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @asynccontextmanager
+    async def lock(self, name: str, ttl: float = 30, wait: float = 15, poll: float = 0.05) -> AsyncIterator["SharedLock"]:
+        """
+        Cross-process lock, held for at most `ttl` seconds. Yields a SharedLock
+        that is truthy if it was acquired within `wait` seconds; callers proceed
+        either way, so a crashed holder or an unavailable store delays work
+        instead of blocking it, but must not write what the lock guards unless
+        `renew()` confirms they still hold it.
+        """
+        lock = SharedLock(self, "lock:" + name, ttl)
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                lock.acquired = await self.add(lock.key, lock.token, ttl)
+            except Exception as e:
+                logger.warning("Shared lock %s unavailable: %s", name, e)
+                break
+            if lock.acquired or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(poll)
+        try:
+            yield lock
+        finally:
+            if lock.acquired:
+                try:
+                    # Only our own token: after our ttl ran out the lock may be someone else's
+                    await self.discard(lock.key, lock.token)
+                except Exception as e:
+                    logger.warning("Releasing shared lock %s failed: %s", name, e)
+
+
+class SharedLock:
+    """A SharedStore.lock, truthy while this worker holds it."""
+
+    def __init__(self, store: SharedStore, key: str, ttl: float):
+        self.store = store
+        self.key = key
+        self.ttl = ttl
+        self.token = uuid.uuid4().bytes
+        self.acquired = False
+
+    def __bool__(self) -> bool:
+        return self.acquired
+
+    async def renew(self) -> bool:
+        """
+        Extends the hold by another `ttl` if the lock is still ours. Returns
+        False once it expired (and may have been taken over), so guarded writes
+        are skipped rather than overlapping the new holder's.
+        """
+        if self.acquired:
+            try:
+                self.acquired = await self.store.replace(self.key, self.token, self.token, self.ttl)
+            except Exception as e:
+                logger.warning("Renewing shared lock %s failed: %s", self.key, e)
+                self.acquired = False
+        return self.acquired
+
+
+class FileSharedStore(SharedStore):
+    """
+    One file per key under `root` (a tmpfs such as /dev/shm keeps it in shared
+    memory). Writes go to a temp file and are renamed into place, so readers
+    never see a partial value. Writers of a key serialize on a lock file
+    created with O_EXCL; expired entries are deleted when read and by a
+    periodic sweep.
+    """
+
+    def __init__(self, root: str = SHARED_CACHE_DIR, sweep_interval: float = SHARED_CACHE_SWEEP_INTERVAL):
+        self.root = root
+        self.sweep_interval = sweep_interval
+        self._task: Optional[asyncio.Task] = None
+        try:
+            os.makedirs(root, exist_ok=True)
+        except OSError as e:
+            # Read-only volume: every operation fails and callers fall back to their own caches
+            logger.warning("Shared cache directory %s unavailable: %s", root, e)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(key.encode()).hexdigest())
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> bytes:
+        return _EXPIRY.pack(time.time() + ttl if ttl else 0.0)
+
+    @staticmethod
+    def _load(path: str) -> Optional[bytes]:
+        """The whole entry (expiry header included), or None."""
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _live(data: Optional[bytes]) -> Optional[bytes]:
+        """The value of an entry, or None when missing or expired."""
+        if data is None:
+            return None
+        (expires,) = _EXPIRY.unpack_from(data)
+        if expires and expires <= time.time():
+            return None
+        return data[_EXPIRY.size:]
+
+    def _write(self, path: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    @asynccontextmanager
+    async def _locked(self, path: str, wait: float = 2.0) -> AsyncIterator[bool]:
+        """
+        Holds the key's lock file while a writer reads, compares and replaces
+        its entry. Yields False (without the lock) if it stays taken for `wait`
+        seconds; a lock left behind by a crashed writer is broken after _LOCK_STALE.
+        """
+        lock = os.path.join(self.root, "." + os.path.basename(path) + ".lock")
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                os.close(os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(lock).st_mtime > _LOCK_STALE:
+                        os.unlink(lock)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() >= deadline:
+                    yield False
+                    return
+                await asyncio.sleep(0.001)
+        try:
+            yield True
+        finally:
+            try:
+                os.unlink(lock)
+            except FileNotFoundError:
+                pass
+
+    async def _expire(self, path: str, wait: float = 0) -> bool:
+        """Deletes the entry at `path` if it is still expired once locked."""
+        async with self._locked(path, wait) as locked:
+            data = self._load(path)
+            if not locked or data is None or self._live(data) is not None:
+                return False
+            os.unlink(path)
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        data = self._load(path)
+        value = self._live(data)
+        if value is None and data is not None:
+            await self._expire(path)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        path = self._path(key)
+        async with self._locked(path):
+            # Unlocked after waiting: last writer wins, as without the lock
+            self._write(path, self._expiry(ttl) + value)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        path = self._path(key)
+        async with self._locked(path) as locked:
+            if not locked or self._live(self._load(path)) is not None:
+                return False
+            self._write(path, self._expiry(ttl) + value)
+        return True
+
+    async def replace(self, key: str, expected: bytes, value: bytes, ttl: Optional[float] = None) -> bool:
+        path = self._path(key)
+        async with self._locked(path) as locked:
+            if not locked or self._live(self._load(path)) != expected:
+                return False
+            self._write(path, self._expiry(ttl) + value)
+        return True
+
+    async def delete(self, key: str):
+        path = self._path(key)
+        async with self._locked(path):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    async def discard(self, key: str, expected: bytes) -> bool:
+        path = self._path(key)
+        async with self._locked(path) as locked:
+            if not locked or self._live(self._load(path)) != expected:
+                return False
+            os.unlink(path)
+        return True
+
+    async def sweep(self) -> int:
+        deleted = 0
+        now = time.time()
+        for entry in os.scandir(self.root):
+            try:
+                if not entry.is_file():
+                    continue
+                if entry.name.startswith("."):
+                    # Temp and lock files of writers that died mid-write
+                    if now - entry.stat().st_mtime > 60:
+                        os.unlink(entry.path)
+                elif await self._expire(entry.path):
+                    deleted += 1
+            except (FileNotFoundError, struct.error):
+                pass
+        return deleted
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning("Shared cache sweep failed: %s", e)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class RedisSharedStore(SharedStore):
+    """Redis (or any server speaking its protocol) backend; shares the tier across hosts."""
+
+    def __init__(self, url: Optional[str] = None, client: Any = None):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("SHARED_CACHE_URL points at Redis but the 'redis' package is not installed") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(REDIS_KEY_PREFIX + key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await self.client.set(REDIS_KEY_PREFIX + key, value, px=int(ttl * 1000) if ttl else None)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(await self.client.set(REDIS_KEY_PREFIX + key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    async def replace(self, key: str, expected: bytes, value: bytes, ttl: Optional[float] = None) -> bool:
+        from redis.exceptions import WatchError
+
+        key = REDIS_KEY_PREFIX + key
+        # WATCH makes the transaction fail if another client changes the key in between
+        async with self.client.pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            if await pipe.get(key) != expected:
+                await pipe.unwatch()
+                return False
+            pipe.multi()
+            pipe.set(key, value, px=int(ttl * 1000) if ttl else None)
+            try:
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def delete(self, key: str):
+        await self.client.delete(REDIS_KEY_PREFIX + key)
+
+    async def discard(self, key: str, expected: bytes) -> bool:
+        return bool(await self.client.eval(_DISCARD_SCRIPT, 1, REDIS_KEY_PREFIX + key, expected))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_shared_store(url: str = SHARED_CACHE_URL) -> SharedStore:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedStore(url)
+    if url.startswith("file://"):
+        return FileSharedStore(url[len("file://"):])
+    if url:
+        raise ValueError(f"Unsupported SHARED_CACHE_URL: {url}")
+    return FileSharedStore()
+
+
+class SharedCache:
+    """
+    Values encoded into a SharedStore with a TTL. Store errors are logged and
+    treated as misses, so an unavailable tier falls back to per-process caching.
+    """
+
+    def __init__(self, store: SharedStore):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            data = await self.store.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared cache read of %s failed: %s", key, e)
+            return None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return decode_value(data)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        try:
+            await self.store.set(key, encode_value(value), ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared cache write of %s failed: %s", key, e)
+
+    async def get_or_load(self, key: str, ttl: float, load, lock: Optional[str] = None, refresh: bool = False) -> Any:
+        """
+        The shared value for `key`, or `load(lock)` stored for `ttl` seconds.
+        The load runs under the cross-process `lock` (default: the key), so one
+        worker fetches while the others wait and then read its result; it is
+        handed the SharedLock to guard writes of its own. A worker that gave up
+        waiting loads for itself without sharing the result. With `refresh`,
+        the shared value is ignored and always reloaded.
+        """
+        value = None if refresh else await self.get(key)
+        if value is not None:
+            return value
+        async with self.store.lock(lock or key) as held:
+            value = None if refresh else await self.get(key)
+            if value is None:
+                value = await load(held)
+                if await held.renew():
+                    await self.set(key, value, ttl)
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.store).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+shared_store = create_shared_store()
+shared_cache = SharedCache(shared_store)
@@ -0,0 +1,69 @@
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+try:
+    from .candle_resampler import CandleResampler
+    from .coingecko import CoinGeckoService
+    from .derived_cache import derived_cache, frame_fingerprint
+    from .incremental_indicators import IncrementalIndicatorService
+    from .prediction_engine import PREDICTION_HISTORY_DAYS, PredictionEngine, compiled_rules
+except ImportError:
+    from services.candle_resampler import CandleResampler
+    from services.coingecko import CoinGeckoService
+    from services.derived_cache import derived_cache, frame_fingerprint
+    from services.incremental_indicators import IncrementalIndicatorService
+    from services.prediction_engine import PREDICTION_HISTORY_DAYS, PredictionEngine, compiled_rules
+
+
+# (candles, source key, fingerprint)
+Candles = Tuple[pd.DataFrame, Hashable, str]
+
+
+class SignalService:
+    @staticmethod
+    async def get_prediction(coin_id: str, days: int = PREDICTION_HISTORY_DAYS, vs_currency: str = "usd",
+                             timeframe: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Prediction for the latest candles of a coin: the `days` window as
+        CoinGecko serves it, or candles of `timeframe` (1h|4h|1d) rolled up from
+        a finer series. Indicators are folded in incrementally and the result is
+        reused until the candles change.
+        """
+        candles = await SignalService.get_candles(coin_id, days, vs_currency, timeframe)
+        return await SignalService.predict(candles, timeframe)
+
+    @staticmethod
+    async def get_candles(coin_id: str, days: int = PREDICTION_HISTORY_DAYS, vs_currency: str = "usd",
+                          timeframe: Optional[str] = None) -> Candles:
+        """The candles a prediction is made from, with their source key and fingerprint."""
+        if timeframe is None:
+            df = await CoinGeckoService.get_ohlcv(coin_id, days, vs_currency)
+            source = (coin_id, vs_currency, days)
+        else:
+            df = await CandleResampler.get_candles(coin_id, timeframe, vs_currency)
+            source = (coin_id, vs_currency, timeframe)
+        return df, source, frame_fingerprint(df)
+
+    @staticmethod
+    def version(candles: Candles) -> Tuple[str, str]:
+        """Identifies the prediction `candles` give: their fingerprint and the scoring rules'."""
+        return candles[2], compiled_rules.fingerprint
+
+    @staticmethod
+    async def predict(candles: Candles, timeframe: Optional[str] = None) -> Dict[str, Any]:
+        df, source, fingerprint = candles
+
+        async def compute() -> Dict[str, Any]:
+            # Indicators are computed off the event loop; scoring the last row is cheap
+            frame = await IncrementalIndicatorService.compute_async(
+                source, df, fingerprint, compiled_rules.indicator_columns
+            )
+            result = PredictionEngine.evaluate(frame)
+            if timeframe is not None:
+                # The predicted range spans one candle of the timeframe
+                result["horizon"] = timeframe
+            return result
+
+        return await derived_cache.get_or_compute_async(
+            "prediction", source, fingerprint, compute, compiled_rules.fingerprint,
+        )
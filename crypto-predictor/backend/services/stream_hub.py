@@ -0,0 +1,216 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+try:
+    from .coingecko import CoinGeckoService
+    from .incremental_indicators import IncrementalIndicatorService
+    from .ohlcv_encoding import CHART_COLUMNS, OHLCVEncoder
+    from .signal_service import SignalService
+except ImportError:
+    from services.coingecko import CoinGeckoService
+    from services.incremental_indicators import IncrementalIndicatorService
+    from services.ohlcv_encoding import CHART_COLUMNS, OHLCVEncoder
+    from services.signal_service import SignalService
+
+# Seconds between recomputations of a topic
+STREAM_INTERVAL = float(os.getenv("STREAM_INTERVAL", "30"))
+# Messages buffered per subscriber; a subscriber that falls behind is resynced with a snapshot
+SUBSCRIBER_QUEUE_SIZE = 32
+
+Topic = Tuple[str, int]  # (coin_id, days)
+TopicState = Dict[str, Any]  # symbol, candles (columnar arrays), prediction, overview
+
+
+def _encode(message: Dict[str, Any]) -> str:
+    return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def _topic_json(topic: Topic) -> Dict[str, Any]:
+    return {"coin_id": topic[0], "days": topic[1]}
+
+
+class StreamHub:
+    """
+    Computes each subscribed (coin_id, days) topic once per interval and fans
+    the result out to every subscriber queue.
+
+    A new subscriber first receives a full snapshot, then only deltas:
+    candles that are new or changed (including their indicator values), the
+    prediction when it changes along with any signal flips, and the overview
+    when it changes. Work scales with the number of distinct topics; a topic's
+    worker stops when its last subscriber leaves.
+    """
+
+    def __init__(self, compute: Optional[Callable[[Topic], Awaitable[TopicState]]] = None,
+                 interval: float = STREAM_INTERVAL):
+        self._compute = compute
+        self.interval = interval
+        # topic -> {subscriber queue: needs a snapshot}
+        self._subscribers: Dict[Topic, Dict[asyncio.Queue, bool]] = {}
+        self._states: Dict[Topic, TopicState] = {}
+        self._workers: Dict[Topic, asyncio.Task] = {}
+        self.computations = 0
+        self.messages_sent = 0
+        self.resyncs = 0
+
+    @staticmethod
+    async def compute_topic(topic: Topic) -> TopicState:
+        """Candles with indicators for the chart window, plus the coin's prediction and overview."""
+        coin_id, days = topic
+        df, prediction, overview = await asyncio.gather(
+            CoinGeckoService.get_ohlcv(coin_id, days),
+            # Same daily candles /prediction/signals serves by default
+            SignalService.get_prediction(coin_id, timeframe="1d"),
+            CoinGeckoService.get_market_overview(coin_id),
+        )
+        df = await IncrementalIndicatorService.compute_async((coin_id, "usd", days), df, columns=CHART_COLUMNS)
+        return {
+            "symbol": coin_id.upper(),
+            "candles": OHLCVEncoder.columns(df),
+            "prediction": prediction,
+            "overview": overview,
+        }
+
+    @staticmethod
+    def snapshot(topic: Topic, state: TopicState) -> Dict[str, Any]:
+        return {"type": "snapshot", "topic": _topic_json(topic), **state}
+
+    @staticmethod
+    def diff(topic: Topic, previous: TopicState, state: TopicState) -> Optional[Dict[str, Any]]:
+        """Delta message from `previous` to `state`, or None when nothing changed."""
+        delta: Dict[str, Any] = {}
+
+        old, new = previous["candles"], state["candles"]
+        times = new["time"]
+        # Position of each new candle in the previous series (times are sorted)
+        pos = np.minimum(np.searchsorted(old["time"], times), max(len(old["time"]) - 1, 0))
+        if len(old["time"]):
+            changed = old["time"][pos] != times
+            for field, values in new.items():
+                before = old[field][pos]
+                if values.dtype.kind == "f":
+                    changed |= ~((before == values) | (np.isnan(before) & np.isnan(values)))
+                else:
+                    changed |= before != values
+        else:
+            changed = np.ones(len(times), dtype=bool)
+        if changed.any():
+            delta["candles"] = {field: values[changed] for field, values in new.items()}
+        # Candles before `start` slid out of the window
+        if len(times) and (not len(old["time"]) or times[0] != old["time"][0]):
+            delta["start"] = int(times[0])
+
+        if state["prediction"] != previous["prediction"]:
+            delta["prediction"] = state["prediction"]
+            flips = StreamHub.signal_flips(previous["prediction"], state["prediction"])
+            if flips:
+                delta["signal_flips"] = flips
+
+        if state["overview"] != previous["overview"]:
+            delta["overview"] = state["overview"]
+
+        if not delta:
+            return None
+        return {"type": "delta", "topic": _topic_json(topic), **delta}
+
+    @staticmethod
+    def signal_flips(previous: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, str]]:
+        flips = []
+        for key in ("overall_signal", "predicted_direction"):
+            if previous[key] != current[key]:
+                flips.append({"indicator": key, "from": previous[key], "to": current[key]})
+        before = {s["indicator"]: s["signal"] for s in previous["signals"]}
+        for signal in current["signals"]:
+            old = before.get(signal["indicator"])
+            if old is not None and old != signal["signal"]:
+                flips.append({"indicator": signal["indicator"], "from": old, "to": signal["signal"]})
+        return flips
+
+    def subscribe(self, topic: Topic, queue: asyncio.Queue):
+        subscribers = self._subscribers.setdefault(topic, {})
+        state = self._states.get(topic)
+        subscribers[queue] = True
+        if state is not None:
+            self._offer(topic, queue, _encode(StreamHub.snapshot(topic, state)))
+        worker = self._workers.get(topic)
+        if worker is None or worker.done():
+            self._workers[topic] = asyncio.ensure_future(self._run(topic))
+
+    def unsubscribe(self, topic: Topic, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(topic)
+        if subscribers is None:
+            return
+        subscribers.pop(queue, None)
+        if not subscribers:
+            del self._subscribers[topic]
+            self._states.pop(topic, None)
+            worker = self._workers.pop(topic, None)
+            if worker is not None:
+                worker.cancel()
+
+    def _offer(self, topic: Topic, queue: asyncio.Queue, payload: str, snapshot: bool = True):
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Dropped a message: the next broadcast sends this subscriber a full snapshot
+            self._subscribers[topic][queue] = True
+            self.resyncs += 1
+            return
+        self.messages_sent += 1
+        if snapshot:
+            self._subscribers[topic][queue] = False
+
+    def _broadcast(self, topic: Topic, state: TopicState, delta: Optional[Dict[str, Any]]):
+        # Each payload is serialized once and shared by all subscribers
+        snapshot_payload = None
+        delta_payload = _encode(delta) if delta is not None else None
+        for queue, needs_snapshot in list(self._subscribers.get(topic, {}).items()):
+            if needs_snapshot:
+                if snapshot_payload is None:
+                    snapshot_payload = _encode(StreamHub.snapshot(topic, state))
+                self._offer(topic, queue, snapshot_payload)
+            elif delta_payload is not None:
+                self._offer(topic, queue, delta_payload, snapshot=False)
+
+    async def _run(self, topic: Topic):
+        compute = self._compute or StreamHub.compute_topic
+        while topic in self._subscribers:
+            try:
+                state = await compute(topic)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                payload = _encode({"type": "error", "topic": _topic_json(topic), "detail": str(e)})
+                for queue in list(self._subscribers.get(topic, {})):
+                    self._offer(topic, queue, payload, snapshot=False)
+            else:
+                self.computations += 1
+                previous = self._states.get(topic)
+                self._states[topic] = state
+                delta = StreamHub.diff(topic, previous, state) if previous is not None else None
+                self._broadcast(topic, state, delta)
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+        self._subscribers.clear()
+        self._states.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "topics": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "computations": self.computations,
+            "messages_sent": self.messages_sent,
+            "resyncs": self.resyncs,
+        }
+
+
+stream_hub = StreamHub()
@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+
+class Priority(IntEnum):
+    """Lower values are served first."""
+    INTERACTIVE = 0
+    PREFETCH = 1
+    BATCH = 2
+
+
+# Priority of upstream calls made in the current task (and tasks it spawns)
+request_priority: ContextVar[Priority] = ContextVar("upstream_priority", default=Priority.INTERACTIVE)
+
+# Upstream calls made in the current task (and tasks it spawns), while counted
+call_counter: ContextVar[Optional[List[int]]] = ContextVar("upstream_call_counter", default=None)
+
+# Upstream responses that mean "slow down and try again later"
+RETRY_STATUSES = {429, 503}
+
+
+@contextmanager
+def upstream_priority(priority: Priority):
+    """Runs upstream calls made inside the block at `priority`."""
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+@contextmanager
+def count_upstream_calls():
+    """Counts upstream calls made inside the block; the count is `counter[0]` afterwards."""
+    counter = [0]
+    token = call_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        call_counter.reset(token)
+
+
+class UpstreamRateLimited(Exception):
+    """The upstream kept throttling us, or the request queue is full."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float, cost: float = 1) -> float:
+        """Seconds until `cost` tokens are available."""
+        self._refill(now)
+        return 0.0 if self.tokens >= cost else (cost - self.tokens) / self.rate
+
+    def take(self, now: float, cost: float = 1) -> bool:
+        if self.delay(now, cost) > 0:
+            return False
+        self.tokens -= cost
+        return True
+
+    def spend(self, now: float, cost: float = 1):
+        """Takes `cost` tokens even if that leaves the bucket in debt."""
+        self._refill(now)
+        self.tokens -= cost
+
+
+class UpstreamScheduler:
+    """
+    Admission control for upstream HTTP calls.
+
+    Every call takes a token from a shared bucket. When none is available
+    callers queue by priority (then arrival), so interactive requests overtake
+    queued prefetch and batch work. 429/503 responses pause the whole queue for
+    Retry-After (or an exponential backoff with jitter) before retrying.
+    """
+
+    def __init__(
+        self,
+        calls_per_minute: float = 30,
+        burst: float = 10,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        max_queue: int = 500,
+    ):
+        self.bucket = TokenBucket(calls_per_minute / 60, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_queue = max_queue
+        self._queue: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self.granted = {p.name: 0 for p in Priority}
+        self.wait_total = {p.name: 0.0 for p in Priority}
+        self.wait_max = {p.name: 0.0 for p in Priority}
+        self.throttled = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def _record(self, priority: int, waited: float):
+        name = Priority(priority).name
+        self.granted[name] += 1
+        self.wait_total[name] += waited
+        self.wait_max[name] = max(self.wait_max[name], waited)
+
+    def _delay(self, now: float) -> float:
+        return max(self._paused_until - now, self.bucket.delay(now))
+
+    def queue_depth(self) -> Dict[str, int]:
+        depth = {p.name: 0 for p in Priority}
+        for priority, _, _, future in self._queue:
+            if not future.done():
+                depth[Priority(priority).name] += 1
+        return depth
+
+    async def acquire(self, priority: Priority):
+        """Waits for a token at `priority`."""
+        now = time.monotonic()
+        if not self._queue and self._paused_until <= now and self.bucket.take(now):
+            self._record(priority, 0.0)
+            return
+
+        if sum(self.queue_depth().values()) >= self.max_queue:
+            self.rejected += 1
+            raise UpstreamRateLimited("Upstream request queue is full", retry_after=max(1.0, self._delay(now)))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (int(priority), next(self._seq), now, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._queue:
+            priority, _, enqueued, future = self._queue[0]
+            if future.done():
+                # Caller went away while queued
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            delay = self._delay(now)
+            if delay > 0:
+                # Re-check the head afterwards: a higher priority caller may have arrived
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(self._queue)
+            self.bucket.take(now)
+            self._record(priority, now - enqueued)
+            future.set_result(None)
+
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        backoff = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return backoff * (0.5 + random.random() / 2)
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        priority: Optional[Priority] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Sends a request through the bucket, retrying throttled responses."""
+        if priority is None:
+            priority = request_priority.get()
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(priority)
+            counter = call_counter.get()
+            if counter is not None:
+                counter[0] += 1
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+
+            self.throttled += 1
+            delay = self._retry_delay(response, attempt)
+            # Upstream limits apply to the whole client, so everyone waits
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            if attempt == self.max_retries or delay > self.backoff_max:
+                raise UpstreamRateLimited(
+                    f"Upstream returned {response.status_code} for {response.request.url.path}",
+                    retry_after=delay,
+                )
+            self.retries += 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "calls_per_minute": self.bucket.rate * 60,
+            "burst": self.bucket.capacity,
+            "tokens": round(self.bucket.tokens, 3),
+            "paused_for": round(max(0.0, self._paused_until - now), 3),
+            "queue_depth": self.queue_depth(),
+            "granted": dict(self.granted),
+            "avg_wait_ms": {
+                name: round(self.wait_total[name] / count * 1000, 3) if count else 0.0
+                for name, count in self.granted.items()
+            },
+            "max_wait_ms": {name: round(w * 1000, 3) for name, w in self.wait_max.items()},
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "rejected": self.rejected,
+        }
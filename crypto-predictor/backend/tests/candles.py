@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+HOUR_MS = 3_600_000
+
+
+def make_candles(n: int, seed: int = 0, interval: int = HOUR_MS, start: int = 0,
+                 volatility: float = 0.01) -> pd.DataFrame:
+    """
+    `n` random-walk OHLCV candles `interval` ms apart from `start`, the same for
+    the same `seed`. Each candle opens at the previous close, and high/low
+    bracket open and close, as on an exchange.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, n)))
+    open_ = np.r_[100.0, close[:-1]]
+    return pd.DataFrame({
+        'time': start + np.arange(n, dtype=np.int64) * interval,
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.uniform(0, volatility, n)),
+        'low': np.minimum(open_, close) * (1 - rng.uniform(0, volatility, n)),
+        'close': close,
+        'volume': rng.uniform(1000, 2000, n),
+    })
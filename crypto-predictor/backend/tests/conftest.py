@@ -0,0 +1,8 @@
+import pytest
+from services.shared_cache import FileSharedStore, shared_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_shared_cache(tmp_path, monkeypatch):
+    """Each test gets an empty shared cache instead of the one under data/shared."""
+    monkeypatch.setattr(shared_cache, "store", FileSharedStore(str(tmp_path / "shared")))
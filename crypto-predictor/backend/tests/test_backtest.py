@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from services.backtest import BacktestService
+from services.prediction_engine import PredictionEngine
+from tests.candles import make_candles
+
+
+def test_year_of_hourly_data():
+    result = BacktestService.run(make_candles(365 * 24))
+
+    assert result["horizon_bars"] == 24
+    assert result["evaluated_bars"] == 365 * 24 - 49 - 24
+    assert 0 <= result["hit_rate"] <= 1
+    assert 0 <= result["range_coverage"] <= 1
+    assert sum(s["count"] for s in result["signals"]) == result["evaluated_bars"]
+
+
+def test_trending_market_is_profitable_when_long():
+    df = make_candles(300)
+    df['close'] = np.linspace(100, 200, 300)
+    df['high'] = df['close'] + 1
+    df['low'] = df['close'] - 1
+
+    result = BacktestService.run(df, horizon=1)
+
+    assert result["total_return"] > 0
+    assert result["max_drawdown"] == 0
+
+
+def test_fees_reduce_return():
+    df = make_candles(500, seed=4)
+    gross = BacktestService.run(df, horizon=1)
+    net = BacktestService.run(df, horizon=1, fee=0.001)
+    assert net["total_return"] < gross["total_return"]
+
+
+def test_pnl_holds_each_call_for_the_hit_rate_horizon(monkeypatch):
+    df = make_candles(200, seed=2)
+    real = PredictionEngine.score_history
+
+    def one_call(indicators):
+        # A single BUY at bar 100, flat everywhere else
+        scored = dict(real(indicators))
+        scored["overall_signal"] = np.where(np.arange(len(indicators)) == 100, "BUY", "NEUTRAL")
+        return scored
+
+    monkeypatch.setattr(PredictionEngine, "score_history", staticmethod(one_call))
+    close = df['close'].to_numpy()
+    for horizon in (1, 24):
+        result = BacktestService.run(df, horizon=horizon)
+        # 1/horizon of the capital rides bars 101..100+horizon, the same move the hit rate scores
+        expected = np.prod(1 + (close[101:101 + horizon] / close[100:100 + horizon] - 1) / horizon) - 1
+        assert result["total_return"] == pytest.approx(expected, abs=1e-6)
+        assert result["trades"] == 2
+
+
+def test_backtest_days_are_bounded():
+    from main import app
+
+    response = TestClient(app).get("/api/prediction/backtest", params={"coin_ids": "bitcoin", "days": 100_000})
+    assert response.status_code == 422
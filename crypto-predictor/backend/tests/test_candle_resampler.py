@@ -0,0 +1,105 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from services.candle_resampler import (
+    HOUR_MS, INDICATOR_HISTORY, TIMEFRAME_GRANULARITY, TIMEFRAME_HISTORY_DAYS, CandleResampler, RollupEngine,
+)
+from services.coingecko import CoinGeckoService
+from services.signal_service import SignalService
+from tests.candles import make_candles
+
+HALF_HOUR_MS = HOUR_MS // 2
+
+
+def test_resample_matches_pandas():
+    df = make_candles(500, interval=HALF_HOUR_MS, start=HALF_HOUR_MS)
+    rolled = CandleResampler.resample(df, "4h", HALF_HOUR_MS)
+
+    # Candles are stamped with their close time, so buckets are closed and labelled on the right
+    expected = df.assign(time=pd.to_datetime(df['time'], unit='ms')).resample(
+        '4h', on='time', closed='right', label='right'
+    ).agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+    assert rolled['time'].tolist() == ((expected.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).tolist()
+    np.testing.assert_allclose(rolled[['open', 'high', 'low', 'close', 'volume']].to_numpy(), expected.to_numpy())
+
+    # A window starting inside a bucket leaves that bucket out
+    pd.testing.assert_frame_equal(
+        CandleResampler.resample(df.iloc[3:], "4h", HALF_HOUR_MS), rolled.iloc[1:].reset_index(drop=True)
+    )
+
+
+def test_close_stamped_candles_roll_into_the_bucket_they_close_in():
+    # 30m candles closing at 00:30, 01:00, 01:30 and 02:00
+    df = make_candles(4, interval=HALF_HOUR_MS, start=HALF_HOUR_MS)
+    rolled = CandleResampler.resample(df, "1h", HALF_HOUR_MS)
+    assert rolled['time'].tolist() == [HOUR_MS, 2 * HOUR_MS]
+    assert rolled['open'].tolist() == df['open'].iloc[[0, 2]].tolist()
+    assert rolled['close'].tolist() == df['close'].iloc[[1, 3]].tolist()
+    assert rolled['volume'].tolist() == pytest.approx([df['volume'][:2].sum(), df['volume'][2:].sum()])
+
+    # 4h candles closing at 04:00 ... 24:00 make up one whole day
+    day = make_candles(6, interval=4 * HOUR_MS, start=4 * HOUR_MS)
+    daily = CandleResampler.resample(day, "1d")
+    assert daily['time'].tolist() == [24 * HOUR_MS] and daily['close'][0] == day['close'].iloc[-1]
+
+
+def test_rollups_follow_new_revised_and_sliding_candles():
+    full = make_candles(600, interval=HALF_HOUR_MS, start=HALF_HOUR_MS)
+    engine = RollupEngine(4 * HOUR_MS, HALF_HOUR_MS)
+
+    def check(window):
+        pd.testing.assert_frame_equal(engine.update(window), CandleResampler.resample(window, "4h", HALF_HOUR_MS))
+
+    check(full.iloc[:300])
+    built = engine.buckets_aggregated
+    # One appended candle only re-aggregates its bucket
+    check(full.iloc[:301])
+    assert engine.buckets_aggregated - built == 1
+    # The newest candle revised
+    revised = full.iloc[:301].copy()
+    revised.loc[300, ['close', 'high']] = [1e6, 1e6]
+    check(revised)
+    # The window slides forward into the middle of a bucket
+    check(full.iloc[45:400])
+    assert engine.rebuilds == 1
+
+
+def test_prediction_runs_on_the_requested_timeframe(monkeypatch):
+    requested = []
+
+    async def get_ohlcv(coin_id, days=30, vs_currency="usd", granularity=None):
+        requested.append((days, granularity))
+        if granularity == "4h":
+            return make_candles(days * 6, interval=4 * HOUR_MS, start=0)
+        return make_candles(days * 48, interval=HALF_HOUR_MS, start=HALF_HOUR_MS)
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(get_ohlcv))
+
+    async def run():
+        return {tf: await SignalService.get_prediction("rollcoin", timeframe=tf) for tf in ("1h", "4h", "1d")}
+
+    predictions = asyncio.run(run())
+    assert requested == [(TIMEFRAME_HISTORY_DAYS[tf], TIMEFRAME_GRANULARITY[tf]) for tf in ("1h", "4h", "1d")]
+    assert {p["horizon"] for p in predictions.values()} == {"1h", "4h", "1d"}
+    # Every timeframe gets enough candles for SMA 50 and the MACD signal line
+    for prediction in predictions.values():
+        signals = {s["indicator"]: s["signal"] for s in prediction["signals"]}
+        assert "INSUFFICIENT DATA" not in signals.values()
+    for tf in ("1h", "4h", "1d"):
+        days = TIMEFRAME_HISTORY_DAYS[tf]
+        base = make_candles(days * 24 * HOUR_MS // CandleResampler.base_interval(tf),
+                            interval=CandleResampler.base_interval(tf), start=CandleResampler.base_interval(tf))
+        assert len(CandleResampler.resample(base, tf)) >= INDICATOR_HISTORY - 1
+
+
+def test_short_history_skips_rules_lacking_it(monkeypatch):
+    async def get_ohlcv(coin_id, days=30, vs_currency="usd", granularity=None):
+        # The candle store only has the 30 days CoinGecko serves of the 4h series so far
+        return make_candles(30 * 6, interval=4 * HOUR_MS, start=0)
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(get_ohlcv))
+    daily = asyncio.run(SignalService.get_prediction("coldcoin", timeframe="1d"))
+    signals = {s["indicator"]: s["signal"] for s in daily["signals"]}
+    assert signals["MACD (12,26,9)"] == signals["SMA Cross (20/50)"] == "INSUFFICIENT DATA"
+    assert signals["RSI (14)"] != "INSUFFICIENT DATA"
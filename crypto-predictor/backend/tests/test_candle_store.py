@@ -0,0 +1,233 @@
+import asyncio
+import os
+import time
+import numpy as np
+from services import coingecko
+from services.candle_store import CandleStore
+from services.coingecko import CoinGeckoService, DAY_MS
+from tests.candles import HOUR_MS, make_candles
+
+
+def test_append_and_slice(tmp_path):
+    store = CandleStore(str(tmp_path))
+    key = ("bitcoin", "usd", "4h")
+    df = make_candles(100, start=0, interval=4 * HOUR_MS)
+
+    assert store.upsert(key, df.iloc[:60]) == 60
+    # Overlapping, unchanged candles are skipped and only new ones appended
+    assert store.upsert(key, df.iloc[50:]) == 40
+    assert store.length(key) == 100
+
+    sliced = store.read(key, start=df['time'][10], end=df['time'][19])
+    assert len(sliced) == 10
+    assert isinstance(store.read_arrays(key)['close'], np.memmap)
+    np.testing.assert_array_equal(store.read(key).to_numpy(dtype=float), df.to_numpy(dtype=float))
+
+
+def test_revised_candle_rewrites_series(tmp_path):
+    store = CandleStore(str(tmp_path))
+    key = ("bitcoin", "usd", "4h")
+    df = make_candles(10, start=0, interval=4 * HOUR_MS)
+    store.upsert(key, df)
+    before = store.read(key)
+
+    revised = df.iloc[-3:].copy()
+    revised.loc[9, 'close'] = 999.0
+    assert store.upsert(key, revised) == -1
+
+    assert store.read(key)['close'].iloc[-1] == 999.0
+    assert len(store.read(key)) == 10
+    # Frames handed out earlier keep their snapshot
+    assert before['close'].iloc[-1] == df['close'].iloc[-1]
+
+
+def test_torn_append_is_ignored(tmp_path):
+    store = CandleStore(str(tmp_path))
+    key = ("bitcoin", "usd", "4h")
+    store.upsert(key, make_candles(5, start=0, interval=4 * HOUR_MS))
+    with open(store._column_path(key, 'close'), 'ab') as f:
+        f.write(b'\x00' * 3)
+    assert store.length(key) == 5
+    assert store.upsert(key, make_candles(2, start=5 * 4 * HOUR_MS, interval=4 * HOUR_MS)) == 2
+    assert store.length(key) == 7
+
+
+def test_service_fetches_only_missing_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(coingecko, "candle_store", CandleStore(str(tmp_path)))
+    coingecko.ohlcv_cache.clear()
+    now = int(time.time() * 1000)
+    calls = []
+
+    async def fake_fetch(coin_id, days, vs_currency):
+        calls.append(days)
+        start = now - days * DAY_MS
+        start -= start % (4 * HOUR_MS)
+        return make_candles(days * 6 + 1, start=start, interval=4 * HOUR_MS)
+
+    monkeypatch.setattr(CoinGeckoService, "_fetch_ohlcv", staticmethod(fake_fetch))
+
+    month = asyncio.run(CoinGeckoService.get_ohlcv("bitcoin", 30))
+    week = asyncio.run(CoinGeckoService.get_ohlcv("bitcoin", 7))
+    fortnight = asyncio.run(CoinGeckoService.get_ohlcv("bitcoin", 14))
+
+    # One upstream fetch for the widest 4h window, the rest are slices
+    assert calls == [30]
+    assert len(week) < len(fortnight) < len(month)
+    assert week['time'].iloc[-1] == month['time'].iloc[-1]
+
+
+def test_service_revises_the_forming_candle(tmp_path, monkeypatch):
+    monkeypatch.setattr(coingecko, "candle_store", CandleStore(str(tmp_path)))
+    coingecko.ohlcv_cache.clear()
+    now = int(time.time() * 1000)
+    start = now - 30 * DAY_MS
+    start -= start % (4 * HOUR_MS)
+    candles = make_candles(30 * 6 + 1, start=start, interval=4 * HOUR_MS)
+    calls = []
+
+    async def fake_fetch(coin_id, days, vs_currency):
+        calls.append(days)
+        return candles[candles['time'] >= now - days * DAY_MS].copy()
+
+    monkeypatch.setattr(CoinGeckoService, "_fetch_ohlcv", staticmethod(fake_fetch))
+
+    before = asyncio.run(CoinGeckoService.get_ohlcv("bitcoin", 30))
+    # The forming candle moved within its interval, and the cached windows expired
+    candles.loc[candles.index[-1], 'close'] = 12345.0
+    coingecko.ohlcv_cache.clear()
+    store = coingecko.shared_cache.store
+    asyncio.run(store.delete(CoinGeckoService._ohlcv_key("bitcoin", 30, "usd")))
+    asyncio.run(store.delete(CoinGeckoService._series_key(("bitcoin", "usd", "4h"))))
+    month = asyncio.run(CoinGeckoService.get_ohlcv("bitcoin", 30))
+    week = asyncio.run(CoinGeckoService.get_ohlcv("bitcoin", 7))
+
+    # Refetched the shortest 4h window once rather than waiting for the next candle
+    assert calls == [30, 3]
+    assert month['close'].iloc[-1] == week['close'].iloc[-1] == 12345.0
+    assert len(month) == len(before)
+
+
+def test_refresh_skips_the_shared_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(coingecko, "candle_store", CandleStore(str(tmp_path)))
+    coingecko.ohlcv_cache.clear()
+    now = int(time.time() * 1000)
+    start = now - 30 * DAY_MS
+    start -= start % (4 * HOUR_MS)
+    candles = make_candles(30 * 6 + 1, start=start, interval=4 * HOUR_MS)
+    calls = []
+
+    async def fake_fetch(coin_id, days, vs_currency):
+        calls.append(days)
+        return candles[candles['time'] >= now - days * DAY_MS].copy()
+
+    monkeypatch.setattr(CoinGeckoService, "_fetch_ohlcv", staticmethod(fake_fetch))
+    store = coingecko.shared_cache.store
+    series = CoinGeckoService._series_key(("bitcoin", "usd", "4h"))
+
+    asyncio.run(CoinGeckoService.get_ohlcv("bitcoin", 30))
+    # Refreshed by another worker moments ago: sliced from the store, no upstream call
+    asyncio.run(CoinGeckoService.refresh_ohlcv("bitcoin", 30))
+    assert calls == [30]
+
+    # The shared window and series marker are still live but older than a refresh accepts
+    candles.loc[candles.index[-1], 'close'] = 12345.0
+    asyncio.run(coingecko.shared_cache.set(series, now - 120_000, coingecko.OHLCV_SHARED_TTL))
+    refreshed = asyncio.run(CoinGeckoService.refresh_ohlcv("bitcoin", 30))
+
+    assert calls == [30, 3]
+    assert refreshed['close'].iloc[-1] == 12345.0
+    # The shared window was replaced too, so other workers read the refreshed candles
+    coingecko.ohlcv_cache.clear()
+    assert asyncio.run(CoinGeckoService.get_ohlcv("bitcoin", 30))['close'].iloc[-1] == 12345.0
+    asyncio.run(store.delete(CoinGeckoService._ohlcv_key("bitcoin", 30, "usd")))
+    asyncio.run(store.delete(series))
+
+
+def test_rewrite_swaps_every_column_at_once(tmp_path):
+    store = CandleStore(str(tmp_path))
+    key = ("bitcoin", "usd", "4h")
+    df = make_candles(10, start=0, interval=4 * HOUR_MS)
+    store.upsert(key, df)
+    series = store._series_dir(key)
+    first = os.readlink(os.path.join(series, "current"))
+    mapped = store.read_arrays(key)
+
+    for close in (999.0, 998.0):
+        revised = df.iloc[-1:].copy()
+        revised['close'] = close
+        assert store.upsert(key, revised) == -1
+    # Each rewrite is a new version behind one symlink; only the live and previous ones are kept
+    versions = sorted(e for e in os.listdir(series) if e != "current")
+    assert len(versions) == 2 and first not in versions
+    assert store.read(key)['close'].iloc[-1] == 998.0
+    # Maps of a pruned version stay readable
+    assert mapped['close'][-1] == df['close'].iloc[-1]
+
+
+def test_flat_series_is_read_and_migrated(tmp_path):
+    store = CandleStore(str(tmp_path))
+    key = ("bitcoin", "usd", "4h")
+    df = make_candles(10, start=0, interval=4 * HOUR_MS)
+    series = store._series_dir(key)
+    os.makedirs(series)
+    for column in df.columns:
+        df[column].to_numpy(dtype='<i8' if column == 'time' else '<f8').tofile(os.path.join(series, f"{column}.bin"))
+
+    assert store.length(key) == 10
+    revised = df.iloc[-1:].copy()
+    revised['close'] = 999.0
+    assert store.upsert(key, revised) == -1
+    assert not any(e.endswith(".bin") for e in os.listdir(series))
+    assert store.read(key)['close'].iloc[-1] == 999.0
+
+
+def test_unlocked_load_does_not_write_the_series(tmp_path, monkeypatch):
+    monkeypatch.setattr(coingecko, "candle_store", CandleStore(str(tmp_path)))
+    now = int(time.time() * 1000)
+
+    async def fake_fetch(coin_id, days, vs_currency):
+        return make_candles(days * 6 + 1, start=now - days * DAY_MS, interval=4 * HOUR_MS)
+
+    monkeypatch.setattr(CoinGeckoService, "_fetch_ohlcv", staticmethod(fake_fetch))
+
+    async def run():
+        async with coingecko.shared_cache.store.lock("unlocked-series", ttl=0.01) as lock:
+            await asyncio.sleep(0.05)
+            # Held past its ttl: the fetch is served but not stored
+            return await CoinGeckoService._load_ohlcv("unlockedcoin", 30, "usd", lock=lock)
+
+    df = asyncio.run(run())
+    assert len(df) > 0
+    assert coingecko.candle_store.length(("unlockedcoin", "usd", "4h")) == 0
+
+
+def test_window_longer_than_upstream_serves_reads_back_from_the_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(coingecko, "candle_store", CandleStore(str(tmp_path)))
+    coingecko.ohlcv_cache.clear()
+    now = int(time.time() * 1000)
+    half_hour = HOUR_MS // 2
+    end = now - now % half_hour
+    history = make_candles(4 * 48, start=end - (4 * 48 - 1) * half_hour, interval=half_hour)
+    calls = []
+
+    async def fake_fetch(coin_id, days, vs_currency):
+        calls.append(days)
+        return history[history['time'] >= now - days * DAY_MS].copy()
+
+    monkeypatch.setattr(CoinGeckoService, "_fetch_ohlcv", staticmethod(fake_fetch))
+    # Older 30m candles kept from earlier fetches
+    coingecko.candle_store.upsert(("longcoin", "usd", "30m"), history.iloc[:96])
+
+    window = asyncio.run(CoinGeckoService.get_ohlcv("longcoin", 3, granularity="30m"))
+    # CoinGecko serves 30m candles for 2 days at most: that much is fetched, the rest read back
+    assert calls == [2]
+    assert window['time'].iloc[0] <= now - 3 * DAY_MS + half_hour
+    assert np.all(np.diff(window['time']) == half_hour)
+
+    coingecko.ohlcv_cache.clear()
+    store = coingecko.shared_cache.store
+    asyncio.run(store.delete(CoinGeckoService._ohlcv_key("longcoin", 3, "usd", "30m")))
+    asyncio.run(CoinGeckoService.get_ohlcv("longcoin", 3, granularity="30m"))
+    # Still covered as far as CoinGecko reaches: no refetch of the widest range
+    assert calls == [2]
+    asyncio.run(store.delete(CoinGeckoService._series_key(("longcoin", "usd", "30m"))))
@@ -0,0 +1,60 @@
+import asyncio
+import time
+import httpx
+from services import coingecko
+from services.candle_store import CandleStore
+from services.coingecko import CoinGeckoService
+from services.market_table import MarketTable
+
+UPSTREAM_LATENCY = 0.05
+
+
+class MockUpstream:
+    """Local stand-in for CoinGecko that tracks concurrency and connections."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.paths = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.paths.append(request.url.path)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(UPSTREAM_LATENCY)
+        self.in_flight -= 1
+        now = int(time.time() * 1000)
+        if request.url.path.endswith("/ohlc"):
+            return httpx.Response(200, json=[[now - 3_600_000, 1, 2, 0.5, 1.5], [now, 1.5, 2.5, 1, 2]])
+        if request.url.path.endswith("/market_chart"):
+            return httpx.Response(200, json={"total_volumes": [[now - 3_600_000, 10], [now, 20]]})
+        return httpx.Response(200, json=[{"id": "bitcoin", "name": "Bitcoin", "symbol": "btc"}])
+
+
+def test_ohlc_and_market_chart_are_fetched_concurrently(tmp_path, monkeypatch):
+    monkeypatch.setattr(coingecko, "candle_store", CandleStore(str(tmp_path)))
+    monkeypatch.setattr(coingecko, "market_table", MarketTable(["bitcoin"]))
+    coingecko.ohlcv_cache.clear()
+    coingecko.overview_cache.clear()
+    upstream = MockUpstream()
+
+    async def run():
+        await CoinGeckoService.startup(transport=httpx.MockTransport(upstream.handler))
+        try:
+            started = time.perf_counter()
+            df = await CoinGeckoService.get_ohlcv("bitcoin", 1)
+            elapsed = time.perf_counter() - started
+            client = await CoinGeckoService.client()
+            await CoinGeckoService.get_market_overview("bitcoin")
+            # Later calls reuse the same pooled client
+            assert await CoinGeckoService.client() is client
+            return df, elapsed
+        finally:
+            await CoinGeckoService.shutdown()
+
+    df, elapsed = asyncio.run(run())
+
+    assert upstream.max_in_flight == 2
+    assert elapsed < 2 * UPSTREAM_LATENCY
+    assert list(df['volume']) == [10, 20]
+    assert upstream.paths[:2] == ["/api/v3/coins/bitcoin/ohlc", "/api/v3/coins/bitcoin/market_chart"]
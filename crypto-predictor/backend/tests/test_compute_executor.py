@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from multiprocessing.shared_memory import SharedMemory
+from services import compute_executor as executor_module
+from services.compute_executor import ComputeExecutor, ComputeSaturated, SharedFrame
+from services.indicators import IndicatorService
+from tests.candles import make_candles
+
+
+def crashing_job(df):
+    os._exit(1)
+
+
+def blocking_job(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_event_loop_keeps_running_during_compute():
+    executor = ComputeExecutor("thread", workers=2, max_pending=4)
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    async def run():
+        beat = asyncio.ensure_future(heartbeat())
+        await executor.run(blocking_job, 0.2)
+        beat.cancel()
+
+    asyncio.run(run())
+    executor.shutdown()
+    # Inline, the 200ms job would have allowed a single tick
+    assert ticks >= 10
+
+
+def test_rejects_work_beyond_max_pending():
+    executor = ComputeExecutor("thread", workers=1, max_pending=2)
+
+    async def run():
+        jobs = [asyncio.ensure_future(executor.run(blocking_job, 0.1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ComputeSaturated):
+            await executor.run(blocking_job, 0.1)
+        await asyncio.gather(*jobs)
+        # Slots are freed once the jobs finish
+        return await executor.run(blocking_job, 0)
+
+    assert asyncio.run(run()) == 0
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["pending"] == 0
+    executor.shutdown()
+
+
+def test_shared_frame_round_trip_and_release():
+    df = make_candles(50, seed=7)
+    frame = SharedFrame(df)
+    attached, shm = frame.attach()
+    pd.testing.assert_frame_equal(attached, df)
+    del attached
+    shm.close()
+
+    frame.release()
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=frame.name)
+
+
+def test_process_pool_matches_inline_results():
+    df = make_candles(300, seed=7)
+    executor = ComputeExecutor("process", workers=1, max_pending=4)
+    try:
+        result = asyncio.run(executor.run(IndicatorService.compute_all, df))
+    finally:
+        executor.shutdown()
+    pd.testing.assert_frame_equal(result, IndicatorService.compute_all(df))
+
+
+def test_saturated_executor_maps_to_503(monkeypatch):
+    from main import app
+    from services.coingecko import CoinGeckoService
+
+    async def get_ohlcv(coin_id, days=30, vs_currency="usd"):
+        return make_candles(120, seed=7)
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(get_ohlcv))
+    monkeypatch.setattr(executor_module.compute_executor, "max_pending", 0)
+    response = TestClient(app).get("/api/market/ohlcv", params={"coin_id": "busycoin", "days": 5})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_process_pool_recovers_from_a_crashed_worker():
+    from concurrent.futures.process import BrokenProcessPool
+    executor = ComputeExecutor("process", workers=1, max_pending=4)
+    df = make_candles(50, seed=7)
+
+    async def run():
+        with pytest.raises(BrokenProcessPool):
+            await executor.run(crashing_job, df)
+        await asyncio.sleep(0.05)
+        # The slot and the shared memory were given back, and a new pool serves the next job
+        assert executor.pending == 0
+        await executor.run(IndicatorService.compute_all, df)
+
+        class BrokenPool:
+            def submit(self, call):
+                raise BrokenProcessPool("crashed while idle")
+
+            def shutdown(self, wait=True, cancel_futures=False):
+                pass
+
+        # A pool found broken on submit is replaced and the job retried
+        executor.shutdown()
+        executor._pool = BrokenPool()
+        return await executor.run(IndicatorService.compute_all, df)
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert len(result) == len(df) and executor.pending == 0
@@ -0,0 +1,82 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from services.coingecko import CoinGeckoService
+from services.derived_cache import DerivedResultCache, derived_cache, frame_fingerprint
+from services.indicators import IndicatorService
+from tests.candles import make_candles
+
+
+def test_fingerprint_follows_content():
+    df = make_candles(50)
+    assert frame_fingerprint(df) == frame_fingerprint(df.copy())
+    changed = df.copy()
+    changed.loc[49, 'close'] += 0.01
+    assert frame_fingerprint(changed) != frame_fingerprint(df)
+    assert frame_fingerprint(df.iloc[1:]) != frame_fingerprint(df)
+
+
+def test_changed_source_invalidates_entry():
+    cache = DerivedResultCache(max_bytes=1 << 20)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert cache.get_or_compute("prediction", "btc", "v1", compute, "rules") == {"value": 1}
+    assert cache.get_or_compute("prediction", "btc", "v1", compute, "rules") == {"value": 1}
+    # Different rule parameters are separate entries
+    assert cache.get_or_compute("prediction", "btc", "v1", compute, "other-rules") == {"value": 2}
+    assert cache.get_or_compute("prediction", "btc", "v2", compute, "rules") == {"value": 3}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 3, 1)
+    assert stats["entries"] == 2
+
+
+def test_eviction_is_lru_by_bytes():
+    cache = DerivedResultCache(max_bytes=3 * 8000 + 100)
+    for name in ("a", "b", "c"):
+        cache.put("frame", name, "v", np.zeros(1000))  # 8000 bytes each
+    cache.get("frame", "a", "v")  # a becomes most recently used
+    cache.put("frame", "d", "v", np.zeros(1000))
+
+    assert cache.get("frame", "b", "v") is None
+    assert cache.get("frame", "a", "v") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 3 * 8000
+
+    cache.put("frame", "huge", "v", np.zeros(10_000))
+    assert cache.stats()["uncacheable"] == 1
+
+
+def test_ohlcv_endpoint_reuses_indicators_until_candles_change(monkeypatch):
+    from main import app
+
+    frames = {"df": make_candles(100)}
+    computed = []
+    original = IndicatorService.compute
+
+    async def get_ohlcv(coin_id, days=30, vs_currency="usd"):
+        return frames["df"]
+
+    def counting_compute(df, columns):
+        computed.append(tuple(columns))
+        return original(df, columns)
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(get_ohlcv))
+    monkeypatch.setattr(IndicatorService, "compute", staticmethod(counting_compute))
+    derived_cache.clear()
+    client = TestClient(app)
+    params = {"coin_id": "cachecoin", "days": 30}
+
+    first = client.get("/api/market/ohlcv", params=params).json()
+    columnar = client.get("/api/market/ohlcv", params={**params, "format": "columnar"}).json()
+    assert client.get("/api/market/ohlcv", params=params).json() == first
+    assert len(computed) == 1
+    assert len(columnar["columns"]["time"]) == 100
+
+    frames["df"] = make_candles(101)
+    assert len(client.get("/api/market/ohlcv", params=params).json()["prices"]) == 101
+    assert len(computed) == 2
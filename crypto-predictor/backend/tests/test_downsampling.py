@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from services.downsampling import DAY_MS, Downsampler
+from services.indicators import IndicatorService
+from tests.candles import HOUR_MS, make_candles
+
+
+def test_window_is_inclusive():
+    df = make_candles(100)
+    window = Downsampler.window(df, start=10 * HOUR_MS, end=20 * HOUR_MS)
+    assert list(window['time']) == [t * HOUR_MS for t in range(10, 21)]
+    assert len(Downsampler.window(df, start=10 * HOUR_MS + 1)) == 89
+    assert len(Downsampler.window(df)) == 100
+
+
+def test_ohlc_buckets_match_groupby():
+    df = IndicatorService.compute(make_candles(1000), ['RSI'])
+    merged = Downsampler.ohlc(df, 300)
+
+    groups = df.groupby(np.arange(len(df)) // 4)
+    expected = pd.DataFrame({
+        'time': groups['time'].first(), 'open': groups['open'].first(), 'high': groups['high'].max(),
+        'low': groups['low'].min(), 'close': groups['close'].last(), 'volume': groups['volume'].sum(),
+        'RSI': groups['RSI'].apply(lambda s: s.iloc[-1]),
+    }).reset_index(drop=True)
+    assert len(merged) == 250
+    pd.testing.assert_frame_equal(merged[expected.columns], expected, check_dtype=False)
+    assert len(Downsampler.ohlc(df, 5000)) == 1000
+
+
+def test_lttb_keeps_ends_and_spikes():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500)
+    y[4321] = 25.0
+    indices = Downsampler.lttb_indices(x, y, 200)
+
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == 9_999
+    assert np.all(np.diff(indices) > 0)
+    assert 4321 in indices
+    assert list(Downsampler.lttb_indices(x[:50], y[:50], 200)) == list(range(50))
+
+
+def test_range_start_snaps_to_a_bounded_window():
+    now = 1000 * DAY_MS
+    assert Downsampler.days_for(now - 3 * DAY_MS, 1, now) == 7
+    assert Downsampler.days_for(now - 31 * DAY_MS, 1, now) == 90
+    assert Downsampler.days_for(now - 90 * DAY_MS, 1, now) == 90
+    # Never further back than a year, however early the start
+    assert Downsampler.days_for(0, 1, now) == 365
+    # A start inside the requested window keeps it
+    assert Downsampler.days_for(now - DAY_MS, 30, now) == 30
+
+
+def test_ohlcv_range_is_downsampled_after_indicators(monkeypatch):
+    from main import app
+    from services.coingecko import CoinGeckoService
+
+    candles = make_candles(3000)
+
+    async def get_ohlcv(coin_id, days=30, vs_currency="usd"):
+        return candles
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(get_ohlcv))
+    client = TestClient(app)
+    full = IndicatorService.compute_all(candles)
+
+    response = client.get("/api/market/ohlcv", params={
+        "coin_id": "rangecoin", "days": 5, "start": 1000 * HOUR_MS, "max_points": 200,
+    })
+    assert response.status_code == 200
+    prices = response.json()["prices"]
+    assert len(prices) == 200
+    assert prices[0]["time"] == 1000 * HOUR_MS
+    assert prices[0]["open"] == full['open'][1000]
+    # Indicators come from the full-resolution series: the last point carries the last candle's RSI
+    assert abs(prices[-1]["rsi"] - full['RSI'].iloc[-1]) < 1e-9
+    assert prices[-1]["close"] == full['close'].iloc[-1]
+
+    line = client.get("/api/market/ohlcv", params={
+        "coin_id": "rangecoin", "days": 5, "max_points": 100, "downsample": "lttb", "format": "columnar",
+    }).json()["columns"]
+    assert len(line["time"]) == 100
+    assert set(line["time"]) <= set(full['time'])
+
+    # Windows are asked for in fixed sizes, so a fixed start doesn't add a new series every day
+    requested = []
+
+    async def record_days(coin_id, days=30, vs_currency="usd"):
+        requested.append(days)
+        return candles
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(record_days))
+    assert client.get("/api/market/ohlcv", params={"coin_id": "rangecoin", "start": 0}).status_code == 200
+    assert requested == [365]
+    reversed_range = client.get("/api/market/ohlcv", params={"coin_id": "rangecoin", "start": 2, "end": 1})
+    assert reversed_range.status_code == 400
@@ -1,7 +1,8 @@
 import pytest
 import pandas as pd
 import numpy as np
-from services.prediction_engine import PredictionEngine
+from services.indicators import IndicatorService
+from services.prediction_engine import PredictionEngine, CompiledRules
 
 def test_prediction_logic():
     # Mock data for a Strong Buy signal
@@ -47,3 +48,62 @@ def test_indicator_values():
 
     # Check if price range is valid
     assert result["predicted_price_range"]["low"] < result["predicted_price_range"]["high"]
+
+def test_batch_matches_single_coin():
+    rng = np.random.default_rng(7)
+    frames = {}
+    for i, n in enumerate([100, 100, 100, 60, 30]):
+        close = 100 + np.cumsum(rng.normal(0, 2, n))
+        frames[f"coin-{i}"] = pd.DataFrame({
+            'time': range(n),
+            'open': close + rng.normal(0, 1, n),
+            'high': close + rng.uniform(0, 3, n),
+            'low': close - rng.uniform(0, 3, n),
+            'close': close,
+            'volume': rng.uniform(1000, 2000, n)
+        })
+    frames["empty"] = pd.DataFrame(columns=['time', 'open', 'high', 'low', 'close', 'volume'])
+
+    results = PredictionEngine.calculate_signals_batch(frames)
+
+    assert "empty" not in results
+    for coin_id, df in frames.items():
+        if coin_id != "empty":
+            assert results[coin_id] == PredictionEngine.calculate_signals(df)
+
+def test_score_history_matches_last_row():
+    rng = np.random.default_rng(3)
+    close = 100 + np.cumsum(rng.normal(0, 2, 120))
+    df = pd.DataFrame({
+        'time': range(120),
+        'open': close,
+        'high': close + 2,
+        'low': close - 2,
+        'close': close,
+        'volume': rng.uniform(1000, 2000, 120)
+    })
+    indicators = IndicatorService.compute_all(df)
+
+    history = PredictionEngine.score_history(indicators)
+    assert history["normalized_score"].shape == (120,)
+
+    for end in (60, 90, 120):
+        result = PredictionEngine.evaluate(indicators.iloc[:end])
+        assert history["overall_signal"][end - 1] == result["overall_signal"]
+        assert round(float(history["confidence"][end - 1]), 2) == result["confidence"]
+
+def test_custom_rule_table():
+    rules = CompiledRules([{
+        "name": "RSI", "indicator": "RSI (14)", "weight": 1, "value": "RSI",
+        "cases": [
+            ([("RSI", "<", 30)], "Oversold", "bull", 1),
+            ([("RSI", ">", 70)], "Overbought", "bear", -1),
+        ],
+    }])
+    features = np.zeros((3, len(rules.columns)))
+    features[:, rules.column_index["RSI"]] = [10, 50, 90]
+
+    scored = rules.score(features)
+
+    assert list(scored["choices"][:, 0]) == [1, 0, 2]
+    assert list(scored["overall_signal"]) == ["STRONG BUY", "NEUTRAL", "STRONG SELL"]
@@ -0,0 +1,125 @@
+import asyncio
+import ccxt.async_support as ccxt
+import pytest
+from fastapi.testclient import TestClient
+from services import scalper_service
+from services.exchange_service import ExchangePool
+from services.scalper_service import ScalperService
+from tests.test_scalper import FakeExchange
+
+
+class FakeClient:
+    instances = []
+
+    def __init__(self, exchange_id, api_key, secret, passphrase=None, testnet=True):
+        self.fail = exchange_id == "down"
+        self.revoked = api_key == "revoked"
+        self.exchange = FakeExchange()
+        self.markets_loaded = 0
+        self.closed = False
+        FakeClient.instances.append(self)
+
+    async def load_markets(self):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionError("exchange unreachable")
+        self.markets_loaded += 1
+
+    async def get_balance(self, currency="USDT"):
+        if self.revoked:
+            raise ccxt.AuthenticationError("invalid api key")
+        return 100.0
+
+    async def close(self):
+        self.closed = True
+
+
+CONFIG = {"exchange_id": "binance", "api_key": "key", "secret": "secret", "testnet": True}
+
+
+def test_clients_are_pooled_by_credentials():
+    FakeClient.instances.clear()
+    pool = ExchangePool(factory=FakeClient)
+
+    async def run():
+        # Concurrent first uses create one client and load markets once
+        first, second = await asyncio.gather(pool.acquire(**CONFIG), pool.acquire(**CONFIG))
+        assert first is second and first.markets_loaded == 1
+        other = await pool.acquire(**{**CONFIG, "secret": "other"})
+        live = await pool.acquire(**{**CONFIG, "testnet": False})
+        assert len({id(first), id(other), id(live)}) == 3
+        assert pool.stats()["created"] == 3 and pool.stats()["reused"] == 1
+
+        with pytest.raises(ConnectionError):
+            await pool.acquire(**{**CONFIG, "exchange_id": "down"})
+        # A client that failed to warm up is closed, not pooled
+        assert FakeClient.instances[-1].closed and pool.stats()["clients"] == 3
+        # Rejected credentials fail the connection check instead of reading as a zero balance
+        with pytest.raises(ccxt.AuthenticationError):
+            await pool.acquire(**{**CONFIG, "api_key": "revoked"})
+        assert FakeClient.instances[-1].closed and pool.stats()["clients"] == 3
+
+        async with pool.client(**CONFIG) as client:
+            assert client is first
+        await pool.close()
+        assert all(c.closed for c in FakeClient.instances)
+
+    asyncio.run(run())
+
+
+def test_key_does_not_contain_credentials():
+    key = ExchangePool.key("binance", "my-api-key", "my-secret")
+    assert key.startswith("binance:testnet:")
+    assert "my-api-key" not in key and "my-secret" not in key
+
+
+def test_idle_clients_are_evicted_once_released():
+    pool = ExchangePool(idle_ttl=0, factory=FakeClient)
+
+    async def run():
+        client = await pool.acquire(**CONFIG)
+        # Leased: kept however long it has been idle
+        assert await pool.sweep() == 0
+        await pool.release(client)
+        assert await pool.sweep() == 1
+        assert client.closed and pool.stats()["clients"] == 0
+        # Next use creates a fresh client
+        assert await pool.acquire(**CONFIG) is not client
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_scalper_sessions_share_and_release_the_pooled_client(monkeypatch):
+    pool = ExchangePool(idle_ttl=0, factory=FakeClient)
+    monkeypatch.setattr(scalper_service, "exchange_pool", pool)
+    monkeypatch.setattr(scalper_service, "SCALPER_FEED", "poll")
+
+    async def run():
+        scalper = ScalperService()
+        client = await pool.acquire(**CONFIG)
+        scalper.start(client, ["BTC/USDT"])
+        # A second start with the same credentials joins the same group
+        assert await pool.acquire(**CONFIG) is client
+        scalper.start(client, ["ETH/USDT"])
+        await asyncio.sleep(0)
+        assert len(scalper._groups) == 1 and len(scalper.sessions) == 2
+        assert await pool.sweep() == 0
+
+        scalper.stop()
+        await asyncio.sleep(0)
+        assert await pool.sweep() == 1 and client.closed
+
+    asyncio.run(run())
+
+
+def test_balance_endpoint_rejects_bad_credentials(monkeypatch):
+    from main import app
+    from routers import trading
+    monkeypatch.setattr(trading, "exchange_pool", ExchangePool(factory=FakeClient))
+    client = TestClient(app)
+
+    ok = client.post("/api/trading/balance", json=CONFIG)
+    assert ok.status_code == 200 and ok.json() == {"currency": "USDT", "balance": 100.0}
+    rejected = client.post("/api/trading/balance", json={**CONFIG, "api_key": "revoked"})
+    assert rejected.status_code == 401
@@ -0,0 +1,125 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from services.http_caching import CompressionMiddleware, choose_encoding, etag_matches, make_etag
+from tests.candles import make_candles
+
+
+def test_etag_matching():
+    etag = make_etag("ohlcv", ("bitcoin", "usd", 30), "abc")
+    assert etag == make_etag("ohlcv", ("bitcoin", "usd", 30), "abc")
+    assert etag != make_etag("ohlcv", ("bitcoin", "usd", 30), "abd")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    # Tags of compressed representations match their source
+    assert etag_matches(f'{etag[:-1]}-gzip"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") in ("br", "gzip")
+
+
+def test_compression_middleware():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    async def big():
+        return JSONResponse({"values": list(range(1000))}, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    client = TestClient(app)
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == '"v1-gzip"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(response.content)
+    assert response.json()["values"][-1] == 999
+
+    plain = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["ETag"] == '"v1"'
+
+    short = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in short.headers
+    assert short.json() == {"ok": True}
+
+
+def test_unchanged_ohlcv_is_304_without_recomputing(monkeypatch):
+    from main import app
+    from services.coingecko import CoinGeckoService
+    from services.incremental_indicators import IncrementalIndicatorService
+
+    candles = {"df": make_candles(120)}
+    computed = []
+    compute_async = IncrementalIndicatorService.compute_async
+
+    async def get_ohlcv(coin_id, days=30, vs_currency="usd"):
+        return candles["df"]
+
+    async def counting(*args, **kwargs):
+        computed.append(args[0])
+        return await compute_async(*args, **kwargs)
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(get_ohlcv))
+    monkeypatch.setattr(IncrementalIndicatorService, "compute_async", staticmethod(counting))
+    client = TestClient(app)
+    params = {"coin_id": "etagcoin", "days": 5}
+
+    first = client.get("/api/market/ohlcv", params=params)
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/market/ohlcv", params=params, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    columnar = client.get("/api/market/ohlcv", params={**params, "format": "columnar"}, headers={"If-None-Match": etag})
+    assert columnar.status_code == 200
+    assert len(computed) == 2
+
+    candles["df"] = make_candles(121)
+    changed = client.get("/api/market/ohlcv", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()["prices"]) == 121
+
+
+def test_unchanged_prediction_is_304_without_scoring(monkeypatch):
+    from main import app
+    from services.candle_resampler import CandleResampler
+    from services.signal_service import SignalService
+
+    predicted = []
+    predict = SignalService.predict
+
+    async def get_candles(coin_id, timeframe, vs_currency="usd"):
+        return make_candles(200)
+
+    async def counting(candles, timeframe=None):
+        predicted.append(timeframe)
+        return await predict(candles, timeframe)
+
+    monkeypatch.setattr(CandleResampler, "get_candles", staticmethod(get_candles))
+    monkeypatch.setattr(SignalService, "predict", staticmethod(counting))
+    client = TestClient(app)
+    params = {"coin_id": "etagcoin", "timeframe": "4h"}
+
+    first = client.get("/api/prediction/signals", params=params)
+    assert first.status_code == 200
+    again = client.get("/api/prediction/signals", params=params, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    other = client.get("/api/prediction/signals", params={**params, "timeframe": "1d"},
+                       headers={"If-None-Match": first.headers["ETag"]})
+    assert other.status_code == 200
+    assert predicted == ["4h", "1d"]
@@ -0,0 +1,67 @@
+import numpy as np
+from services.indicators import IndicatorService
+from services.incremental_indicators import IncrementalIndicatorEngine, INDICATOR_COLUMNS
+from tests.candles import make_candles
+
+
+def assert_matches_batch(result, df):
+    expected = IndicatorService.compute_all(df)
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(
+            result[column].to_numpy(dtype=float),
+            expected[column].to_numpy(dtype=float),
+            rtol=1e-8, atol=1e-8, err_msg=column
+        )
+
+
+def test_cold_start_matches_batch():
+    df = make_candles(200)
+    result = IncrementalIndicatorEngine().update(df)
+    assert_matches_batch(result, df)
+
+
+def test_appended_and_revised_candles_match_batch():
+    df = make_candles(260)
+    engine = IncrementalIndicatorEngine()
+    engine.update(df.iloc[:200])
+
+    for n in range(201, 261):
+        # The newest candle is still forming: publish a revision first
+        revised = df.iloc[:n].copy()
+        revised.loc[n - 1, 'close'] += 0.25
+        engine.update(revised)
+        result = engine.update(df.iloc[:n])
+
+    assert engine.rebuilds == 1
+    # Each step folds the previous candle once and the newest candle twice
+    assert engine.candles_folded == 200 + 3 * 60
+    assert_matches_batch(result, df)
+
+
+def test_changed_history_triggers_rebuild():
+    df = make_candles(120)
+    engine = IncrementalIndicatorEngine()
+    engine.update(df)
+
+    changed = df.copy()
+    changed.loc[10, 'close'] += 5
+    result = engine.update(changed)
+
+    assert engine.rebuilds == 2
+    assert_matches_batch(result, changed)
+
+
+def test_sliding_window_matches_batch_over_the_window():
+    df = make_candles(150)
+    engine = IncrementalIndicatorEngine()
+    engine.update(df.iloc[:140])
+    window = df.iloc[10:].reset_index(drop=True)
+    result = engine.update(window)
+
+    # Candles that left the window no longer count, as in a batch computation over it
+    assert engine.rebuilds == 2
+    assert result['time'].iloc[0] == df['time'].iloc[10]
+    assert_matches_batch(result, window)
+    # And the window keeps folding incrementally from there
+    engine.update(df.iloc[10:].reset_index(drop=True))
+    assert engine.rebuilds == 2
@@ -0,0 +1,97 @@
+import asyncio
+
+import numpy as np
+import pytest
+from services.indicators import IndicatorService
+from services.indicator_kernel import (
+    INDICATOR_COLUMNS, OHLCV_COLUMNS, compute_indicator_matrix, compute_indicators, plan,
+)
+from tests.candles import make_candles
+
+
+def test_kernel_matches_pandas_ta():
+    df = make_candles(300)
+    result = IndicatorService.compute_all(df)
+    expected = IndicatorService.compute_all_pandas_ta(df)
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(
+            result[column].to_numpy(dtype=float),
+            expected[column].to_numpy(dtype=float),
+            rtol=1e-8, atol=1e-8, err_msg=column
+        )
+
+
+def test_compute_all_keeps_input_columns_and_sorts():
+    df = make_candles(80).iloc[::-1]
+    result = IndicatorService.compute_all(df)
+    assert list(result.columns) == ['time'] + OHLCV_COLUMNS + INDICATOR_COLUMNS
+    assert result['time'].is_monotonic_increasing
+
+
+def test_short_history_is_all_nan():
+    df = make_candles(10)
+    result = IndicatorService.compute_all(df)
+    assert result['SMA_50'].isna().all()
+    assert result['MACDs_12_26_9'].isna().all()
+
+
+def test_batched_rows_match_single_series():
+    frames = [make_candles(120, seed=s) for s in range(3)]
+    stacked = [np.stack([f[col].to_numpy() for f in frames]) for col in OHLCV_COLUMNS]
+    batch = compute_indicator_matrix(*stacked)
+    assert batch.shape == (3, 120, len(INDICATOR_COLUMNS))
+    for i, frame in enumerate(frames):
+        single = compute_indicator_matrix(*(frame[col].to_numpy() for col in OHLCV_COLUMNS))
+        np.testing.assert_allclose(batch[i], single, rtol=1e-12, equal_nan=True)
+
+
+def test_subset_computes_only_needed_nodes():
+    assert plan(('RSI',)) == ('prev_close', 'diff', 'RSI')
+    assert set(plan(('WILLR',))) == {'highest_14', 'lowest_14', 'from_low', 'hl_range', 'WILLR'}
+    with pytest.raises(ValueError):
+        plan(('NOPE',))
+
+    df = make_candles(200)
+    full = IndicatorService.compute_all(df)
+    columns = ['CCI', 'MACDh_12_26_9', 'BBP_20_2.0']
+    subset = IndicatorService.compute(df, columns)
+    assert list(subset.columns) == ['time'] + OHLCV_COLUMNS + columns
+    for column in columns:
+        np.testing.assert_allclose(subset[column], full[column], rtol=1e-12, equal_nan=True)
+
+
+def test_intermediates_are_shared_across_requests():
+    df = make_candles(100)
+    inputs = [df[col].to_numpy(dtype=float) for col in OHLCV_COLUMNS]
+    values = compute_indicators(*inputs, columns=['RSI'])
+    diff = values['diff']
+    assert 'ATR' not in values
+
+    compute_indicators(*inputs, columns=['price_change', 'ATR'], values=values)
+    assert values['diff'] is diff
+    np.testing.assert_allclose(values['ATR'], IndicatorService.compute_all(df)['ATR'], equal_nan=True)
+
+
+@pytest.mark.parametrize("shares_state", [True, False])
+def test_executors_compute_requested_columns_only(monkeypatch, shares_state):
+    from services import incremental_indicators
+    from services.compute_executor import ComputeExecutor
+    from services.incremental_indicators import IncrementalIndicatorService
+    from services.ohlcv_encoding import CHART_COLUMNS
+
+    class Inline(ComputeExecutor):
+        pass
+
+    # Like the thread (shared state) or process executor, minus the threads and processes
+    Inline.shares_state = shares_state
+    monkeypatch.setattr(incremental_indicators, "compute_executor", Inline("inline"))
+    df = make_candles(120)
+
+    key = ("subsetcoin", "usd", 5, shares_state)
+    frame = asyncio.run(IncrementalIndicatorService.compute_async(key, df, columns=CHART_COLUMNS))
+
+    # The all-column running state is left alone either way
+    assert key not in incremental_indicators.indicator_engines
+
+    assert set(frame.columns) == {'time'} | set(OHLCV_COLUMNS) | set(CHART_COLUMNS)
+    np.testing.assert_allclose(frame['RSI'], IndicatorService.compute_all(df)['RSI'], equal_nan=True)
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from unittest.mock import patch
+import pytest
+from services.market_feed import CANDLE_MS, CandleBuilder, MarketDataFeed, StreamingUnavailable
+from services.scalper_service import ScalperService
+from tests.test_scalper import FakeExchange
+
+web = pytest.importorskip("aiohttp.web")
+ccxtpro = pytest.importorskip("ccxt.pro")
+
+
+def test_candle_builder_from_trades():
+    builder = CandleBuilder()
+    assert builder.add_trade(1_000, 10.0, 1.0) == []
+    assert builder.add_trade(30_000, 12.0, 2.0) == []
+    assert builder.add_trade(59_999, 9.0, 1.0) == []
+    assert builder.current == [0, 10.0, 12.0, 9.0, 9.0, 4.0]
+
+    # A trade two intervals later closes the candle and a flat one for the quiet minute
+    closed = builder.add_trade(2 * CANDLE_MS + 5, 11.0, 1.0)
+    assert closed == [[0, 10.0, 12.0, 9.0, 9.0, 4.0], [CANDLE_MS, 9.0, 9.0, 9.0, 9.0, 0.0]]
+    # Late trades for closed candles are dropped
+    assert builder.add_trade(CANDLE_MS + 1, 50.0, 1.0) == []
+    assert builder.current == [2 * CANDLE_MS, 11.0, 11.0, 11.0, 11.0, 1.0]
+
+    # No trades: closed on the timer once the interval is over
+    assert builder.close_until(3 * CANDLE_MS - 1) == []
+    assert builder.close_until(4 * CANDLE_MS) == [
+        [2 * CANDLE_MS, 11.0, 11.0, 11.0, 11.0, 1.0], [3 * CANDLE_MS, 11.0, 11.0, 11.0, 11.0, 0.0],
+    ]
+    assert builder.current is None
+
+
+def test_candle_builder_from_klines():
+    builder = CandleBuilder()
+    assert builder.add_kline([0, 1, 2, 0.5, 1.5, 10]) == []
+    assert builder.add_kline([0, 1, 3, 0.5, 2.5, 20]) == []
+    assert builder.add_kline([CANDLE_MS, 2.5, 2.5, 2.5, 2.5, 1]) == [[0, 1.0, 3.0, 0.5, 2.5, 20.0]]
+    # Older rows repeated from the cache change nothing
+    assert builder.add_kline([0, 1, 3, 0.5, 2.5, 20]) == []
+    assert builder.current == [CANDLE_MS, 2.5, 2.5, 2.5, 2.5, 1.0]
+
+
+def test_feed_needs_klines_or_trades():
+    class Client:
+        id = "nows"
+        has = {"watchTicker": True}
+
+    with pytest.raises(StreamingUnavailable):
+        MarketDataFeed(Client())
+
+
+class FakeBinanceFeed:
+    """Local stand-in for Binance's WebSocket market data: answers subscriptions, pushes klines on demand."""
+
+    def __init__(self):
+        self.subscriptions = []
+        self.sockets = []
+
+    async def handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.sockets.append(ws)
+        async for msg in ws:
+            data = msg.json()
+            self.subscriptions += data["params"]
+            await ws.send_json({"result": None, "id": data["id"]})
+        return ws
+
+    async def push(self, market_id, candle):
+        t, o, h, l, c, v = candle
+        k = {"t": t, "T": t + CANDLE_MS - 1, "s": market_id, "i": "1m",
+             "o": str(o), "h": str(h), "l": str(l), "c": str(c), "v": str(v), "x": False}
+        message = {"stream": f"{market_id.lower()}@kline_1m", "data": {"e": "kline", "E": t, "s": market_id, "k": k}}
+        for ws in self.sockets:
+            await ws.send_json(message)
+
+    async def start(self):
+        app = web.Application()
+        # ccxt appends a connection number to the url
+        app.router.add_get("/ws/{n}", self.handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def binance_client(port):
+    client = ccxtpro.binance({"options": {"defaultType": "spot"}})
+    client.urls["api"]["ws"]["spot"] = f"ws://127.0.0.1:{port}/ws"
+    client.set_markets([
+        {"id": f"{base}USDT", "symbol": f"{base}/USDT", "base": base, "quote": "USDT", "baseId": base,
+         "quoteId": "USDT", "lowercaseId": f"{base.lower()}usdt", "type": "spot", "spot": True,
+         "active": True, "precision": {}, "limits": {}, "info": {}}
+        for base in ("BTC", "ETH")
+    ])
+    return client
+
+
+class StreamingExchangeService:
+    def __init__(self, exchange, port):
+        self.exchange = exchange
+        self.port = port
+
+    def stream_client(self):
+        return binance_client(self.port)
+
+    async def close(self):
+        pass
+
+
+def test_feed_yields_closed_candles_from_websocket():
+    async def run():
+        server = FakeBinanceFeed()
+        await server.start()
+        feed = MarketDataFeed(binance_client(server.port))
+        stream = feed.candles("BTC/USDT")
+        first = asyncio.ensure_future(stream.__anext__())
+        while not server.subscriptions:
+            await asyncio.sleep(0.01)
+        assert server.subscriptions == ["btcusdt@kline_1m"]
+
+        t = int(time.time() * 1000) // CANDLE_MS * CANDLE_MS
+        await server.push("BTCUSDT", [t, 1, 2, 0.5, 1.5, 10])
+        assert await first == ([], [t, 1.0, 2.0, 0.5, 1.5, 10.0])
+        await server.push("BTCUSDT", [t, 1, 3, 0.5, 2.5, 20])
+        assert await stream.__anext__() == ([], [t, 1.0, 3.0, 0.5, 2.5, 20.0])
+        # The first update of the next candle closes the previous one
+        await server.push("BTCUSDT", [t + CANDLE_MS, 2.5, 2.5, 2.5, 2.5, 1])
+        closed, forming = await asyncio.wait_for(stream.__anext__(), 1)
+        assert closed == [[t, 1.0, 3.0, 0.5, 2.5, 20.0]]
+        assert forming[0] == t + CANDLE_MS
+
+        await stream.aclose()
+        await feed.close()
+        await server.stop()
+
+    asyncio.run(run())
+
+
+def test_scalper_streams_closed_candles_into_sessions():
+    exchange = FakeExchange()
+
+    async def run():
+        server = FakeBinanceFeed()
+        await server.start()
+        scalper = ScalperService()
+        scalper.start(StreamingExchangeService(exchange, server.port), ["BTC/USDT", "ETH/USDT"])
+        while len(server.subscriptions) < 2:
+            await asyncio.sleep(0.01)
+        sessions = scalper.sessions
+        # Warmed up over REST, forming candle left out
+        assert all(s.candles_processed == 99 for s in sessions.values())
+        group = next(iter(scalper._groups.values()))
+        assert group.mode == "stream"
+
+        t = exchange.now
+        price = exchange.closes[-1]
+        await server.push("BTCUSDT", [t, price, price, price, price, 1])
+        await server.push("BTCUSDT", [t + CANDLE_MS, price, price, price, price, 1])
+        pushed = time.monotonic()
+        btc = sessions["fakex:BTC/USDT"]
+        while btc.candles_processed < 100:
+            assert time.monotonic() - pushed < 1
+            await asyncio.sleep(0.005)
+        assert btc.last_candle == t
+        assert btc.status()["forming"]["time"] == t + CANDLE_MS
+        assert sessions["fakex:ETH/USDT"].candles_processed == 99
+        # No REST polling while streaming
+        assert group.rounds == 0 and group.fetches == 2
+
+        scalper.stop()
+        await asyncio.sleep(0.05)
+        await server.stop()
+
+    with patch("services.scalper_service.time.time", side_effect=lambda: (exchange.now + 1000) / 1000):
+        asyncio.run(run())
+
+
+def test_scalper_falls_back_to_polling_without_websocket():
+    exchange = FakeExchange()
+
+    async def run():
+        # Nothing listens on the port: the stream fails and REST polling takes over
+        scalper = ScalperService()
+        scalper.start(StreamingExchangeService(exchange, 1), ["BTC/USDT"])
+        group = next(iter(scalper._groups.values()))
+        for _ in range(200):
+            if group.mode == "poll" and group.rounds:
+                break
+            await asyncio.sleep(0.02)
+        assert group.mode == "poll" and group.fallbacks == 1
+        assert scalper.sessions["fakex:BTC/USDT"].candles_processed == 99
+        assert scalper.stats()["exchanges"][0]["mode"] == "poll"
+        scalper.stop()
+        await asyncio.sleep(0)
+
+    with patch("services.scalper_service.time.time", side_effect=lambda: (exchange.now + 1000) / 1000):
+        asyncio.run(run())
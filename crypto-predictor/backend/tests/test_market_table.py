@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+import pytest
+from services import coingecko, market_table as market_table_module
+from services.coingecko import CoinGeckoService, CoinNotFound
+from services.market_table import MarketTable
+
+COINS = [f"coin{i}" for i in range(30)]
+
+
+class MarketsUpstream:
+    """Stand-in for /coins/markets that lists every requested id it knows."""
+
+    def __init__(self, known):
+        self.known = set(known)
+        self.calls = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/coins/markets")
+        ids = request.url.params["ids"].split(",")
+        self.calls.append(ids)
+        return httpx.Response(200, json=[{
+            "id": c, "name": c.title(), "symbol": f"s{c[4:]}", "current_price": 100 + len(self.calls),
+            "market_cap": 1e9, "total_volume": 1e6, "price_change_percentage_24h": 1.5,
+            "price_change_percentage_7d_in_currency": None, "ath": 200, "atl": 1, "circulating_supply": 21e6,
+        } for c in ids if c in self.known])
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(coingecko, "market_table", MarketTable(COINS))
+    coingecko.overview_cache.clear()
+    yield MarketsUpstream(COINS + ["latecoin"])
+    coingecko.overview_cache.clear()
+
+
+def run(upstream, calls):
+    async def main():
+        await CoinGeckoService.startup(transport=httpx.MockTransport(upstream.handler))
+        try:
+            return await calls()
+        finally:
+            await CoinGeckoService.shutdown()
+    return asyncio.run(main())
+
+
+def test_one_listing_serves_every_tracked_overview(upstream):
+    async def calls():
+        table = await CoinGeckoService.get_market_overviews()
+        singles = [await CoinGeckoService.get_market_overview(c) for c in COINS]
+        by_symbol = await CoinGeckoService.get_market_overview("S7")
+        return table, singles, by_symbol
+
+    table, singles, by_symbol = run(upstream, calls)
+
+    assert len(upstream.calls) == 1
+    assert list(table) == COINS
+    assert singles == [table[c] for c in COINS]
+    assert by_symbol == table["coin7"]
+    assert table["coin0"] == {
+        "name": "Coin0", "symbol": "S0", "current_price": 101, "market_cap": 1e9, "volume_24h": 1e6,
+        "price_change_24h": 1.5, "price_change_7d": 0, "ath": 200, "atl": 1, "circulating_supply": 21e6,
+    }
+
+
+def test_tracked_coins_are_listed_a_page_at_a_time(upstream, monkeypatch):
+    monkeypatch.setattr(market_table_module, "MARKETS_PAGE_SIZE", 12)
+
+    overviews = run(upstream, CoinGeckoService.get_market_overviews)
+
+    assert len(overviews) == 30
+    assert [len(ids) for ids in upstream.calls] == [12, 12, 6]
+
+
+def test_untracked_coins_are_listed_once_then_tracked(upstream):
+    async def calls():
+        first = await CoinGeckoService.get_market_overviews(["coin1", "latecoin", "nosuchcoin"])
+        again = await CoinGeckoService.get_market_overviews(["latecoin", "nosuchcoin"])
+        with pytest.raises(CoinNotFound):
+            await CoinGeckoService.get_market_overview("nosuchcoin")
+        return first, again
+
+    first, again = run(upstream, calls)
+
+    assert set(first) == {"coin1", "latecoin"}
+    assert set(again) == {"latecoin"}
+    # The tracked listing, then one call for the two coins it didn't have; misses are cached
+    assert upstream.calls == [COINS, ["latecoin", "nosuchcoin"]]
+    assert "latecoin" in coingecko.market_table.tracked
+    assert "nosuchcoin" not in coingecko.market_table.tracked
@@ -0,0 +1,75 @@
+import math
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from services.coingecko import CoinGeckoService
+from services.ohlcv_encoding import ARROW_MEDIA_TYPE, OHLCV_FIELDS, OHLCVEncoder
+from tests.candles import make_candles
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from main import app
+
+    async def fake_ohlcv(coin_id, days=30, vs_currency="usd"):
+        return make_candles(120)
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(fake_ohlcv))
+    return TestClient(app)
+
+
+def test_columnar_json_matches_rows(client):
+    params = {"coin_id": "bitcoin", "days": 30}
+    rows = client.get("/api/market/ohlcv", params=params).json()["prices"]
+    response = client.get("/api/market/ohlcv", params={**params, "format": "columnar"})
+
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+    assert body["symbol"] == "BITCOIN"
+    assert list(body["columns"]) == list(OHLCV_FIELDS)
+    for field, values in body["columns"].items():
+        expected = [row[field] for row in rows]
+        assert len(values) == len(expected)
+        for got, want in zip(values, expected):
+            if want is None:
+                assert got is None
+            else:
+                assert math.isclose(got, want, rel_tol=1e-12)
+    # Warm-up NaNs become null
+    assert body["columns"]["rsi"][0] is None and body["columns"]["rsi"][-1] is not None
+
+
+def test_arrow_stream_via_accept(client):
+    pa = pytest.importorskip("pyarrow")
+    response = client.get(
+        "/api/market/ohlcv",
+        params={"coin_id": "bitcoin"},
+        headers={"Accept": f"{ARROW_MEDIA_TYPE}, application/json;q=0.5"},
+    )
+
+    assert response.headers["content-type"] == ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == list(OHLCV_FIELDS)
+    assert table.schema.field("time").type == pa.int64()
+    assert table.schema.metadata[b"symbol"] == b"BITCOIN"
+    assert table.column("rsi").null_count == 14
+    assert table.num_rows == 120
+
+
+def test_msgpack_encoding():
+    msgpack = pytest.importorskip("msgpack")
+    df = make_candles(5)
+    body, media_type = OHLCVEncoder.encode("BTC", df, OHLCVEncoder.media_type_for("application/msgpack"))
+
+    assert media_type == "application/msgpack"
+    payload = msgpack.unpackb(body)
+    assert payload["columns"]["time"] == list(df["time"])
+    # No indicator columns in the frame: all null
+    assert payload["columns"]["macd"] == [None] * 5
+
+
+def test_unknown_accept_falls_back_to_json():
+    assert OHLCVEncoder.media_type_for("text/html, */*") == "application/json"
+    assert OHLCVEncoder.media_type_for(None) == "application/json"
+    body, _ = OHLCVEncoder.encode("BTC", make_candles(3))
+    assert orjson.loads(body)["columns"]["close"] == pytest.approx(list(make_candles(3)["close"]))
@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from services import prefetch_scheduler as prefetch
+from services.coingecko import CoinGeckoService
+from services.prefetch_scheduler import PrefetchScheduler
+from services.signal_service import SignalService
+from services.upstream_scheduler import call_counter
+from tests.candles import make_candles
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake CoinGecko layer: `expiry` maps keys to seconds until stale, `calls` is the upstream calls per refresh."""
+    state = {"expiry": {}, "refreshed": [], "predicted": [], "interactive": 0, "paused": 0.0, "calls": 2}
+
+    async def refresh(coin_id, days=30, vs_currency="usd", granularity=None):
+        state["refreshed"].append((coin_id, days))
+        call_counter.get()[0] += state["calls"]
+        return make_candles(60)
+
+    async def predict(coin_id, days=90, vs_currency="usd", timeframe=None):
+        state["predicted"].append((coin_id, timeframe))
+        return {}
+
+    monkeypatch.setattr(CoinGeckoService, "refresh_ohlcv", staticmethod(refresh))
+    monkeypatch.setattr(CoinGeckoService, "ohlcv_expires_in",
+                        staticmethod(lambda c, d=30, v="usd", g=None: state["expiry"].get((c, d))))
+    monkeypatch.setattr(CoinGeckoService, "upstream_stats", staticmethod(lambda: {
+        "queue_depth": {"INTERACTIVE": state["interactive"]}, "paused_for": state["paused"],
+    }))
+    monkeypatch.setattr(SignalService, "get_prediction", staticmethod(predict))
+    return state
+
+
+def test_hot_keys_follow_request_frequency():
+    scheduler = PrefetchScheduler(top_n=2)
+    for _ in range(5):
+        scheduler.record("bitcoin", 30)
+    for _ in range(3):
+        scheduler.record("ethereum", 90)
+    scheduler.record("dogecoin", 30)
+
+    assert scheduler.hot_keys() == [("bitcoin", 30, "usd", "4h"), ("ethereum", 90, "usd", "4d")]
+
+
+def test_refreshes_only_hot_keys_close_to_expiry(upstream):
+    scheduler = PrefetchScheduler(lead=30, calls_per_minute=600)
+    for coin in ("bitcoin", "ethereum", "solana"):
+        scheduler.record(coin, 30, timeframe="4h")
+    scheduler.record("bitcoin", 30, timeframe="1d")
+    scheduler.record("cardano", 30)
+    upstream["expiry"] = {("bitcoin", 30): 5, ("ethereum", 30): 200, ("cardano", 30): -3}  # solana: not cached
+
+    refreshed = asyncio.run(scheduler.run_once())
+
+    assert refreshed == 3
+    assert sorted(upstream["refreshed"]) == [("bitcoin", 30), ("cardano", 30), ("solana", 30)]
+    # Windows predictions were served from get the prediction of each of their timeframes
+    # precomputed; cardano was only charted
+    assert sorted(upstream["predicted"]) == [("bitcoin", "1d"), ("bitcoin", "4h"), ("solana", "4h")]
+
+
+def test_budget_bounds_refreshes(upstream):
+    # 12 calls per minute -> a burst of six calls, i.e. three window refreshes
+    scheduler = PrefetchScheduler(calls_per_minute=12)
+    for i in range(10):
+        scheduler.record(f"coin{i}", 30)
+
+    assert asyncio.run(scheduler.run_once()) == 3
+    assert scheduler.skipped_budget == 1
+
+
+def test_refreshes_served_without_upstream_calls_are_free(upstream):
+    scheduler = PrefetchScheduler(calls_per_minute=12)
+    for i in range(10):
+        scheduler.record(f"coin{i}", 30)
+    # The candle store or another worker already had every window
+    upstream["calls"] = 0
+
+    assert asyncio.run(scheduler.run_once()) == 10
+    assert scheduler.skipped_budget == 0
+    assert scheduler.upstream_calls == 0
+    assert scheduler.budget.tokens == pytest.approx(6, abs=0.01)
+
+
+def test_backs_off_while_interactive_requests_wait(upstream):
+    scheduler = PrefetchScheduler(calls_per_minute=600)
+    scheduler.record("bitcoin", 30)
+    upstream["interactive"] = 3
+
+    assert asyncio.run(scheduler.run_once()) == 0
+    assert scheduler.skipped_busy == 1
+    assert upstream["refreshed"] == []
+
+
+def test_prediction_reused_until_candles_change(monkeypatch):
+    frames = {"df": make_candles(80)}
+
+    async def get_ohlcv(coin_id, days=30, vs_currency="usd"):
+        return frames["df"]
+
+    monkeypatch.setattr(CoinGeckoService, "get_ohlcv", staticmethod(get_ohlcv))
+    first = asyncio.run(SignalService.get_prediction("testcoin"))
+    assert asyncio.run(SignalService.get_prediction("testcoin")) is first
+
+    frames["df"] = make_candles(81)
+    assert asyncio.run(SignalService.get_prediction("testcoin")) is not first
+
+
+def test_disabled_scheduler_does_not_start(monkeypatch):
+    monkeypatch.setattr(prefetch, "PREFETCH_ENABLED", False)
+    scheduler = PrefetchScheduler()
+
+    async def run():
+        scheduler.start()
+        return scheduler.stats()["running"]
+
+    assert asyncio.run(run()) is False
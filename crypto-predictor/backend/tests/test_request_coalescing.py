@@ -0,0 +1,96 @@
+import asyncio
+import httpx
+from services import coingecko
+from services.coingecko import CoinGeckoService
+from services.market_table import MarketTable
+from services.request_coalescing import SingleFlight, StaleWhileRevalidateCache
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(20)))
+
+    assert asyncio.run(run()) == ["value"] * 20
+    assert len(calls) == 1
+    assert flight.coalesced == 19
+    assert not flight.in_flight("key")
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = StaleWhileRevalidateCache(maxsize=10, ttl=60, max_stale=60)
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_fetch("k", failing) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(attempts) == 1
+    assert "k" not in cache
+    assert cache.stats()["refresh_errors"] == 1
+
+
+def test_expired_entry_is_served_while_one_background_refresh_runs():
+    cache = StaleWhileRevalidateCache(maxsize=10, ttl=0.05, max_stale=60)
+    version = [0]
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        version[0] += 1
+        return version[0]
+
+    async def run():
+        assert await cache.get_or_fetch("k", fetch) == 1
+        await asyncio.sleep(0.06)
+        # Expired: the old value comes back at once and only one refresh is started
+        stale = await asyncio.gather(*(cache.get_or_fetch("k", fetch) for _ in range(10)))
+        await asyncio.sleep(0.05)
+        fresh = await cache.get_or_fetch("k", fetch)
+        return stale, fresh
+
+    stale, fresh = asyncio.run(run())
+    assert stale == [1] * 10
+    assert fresh == 2
+    assert version[0] == 2
+    stats = cache.stats()
+    assert stats["stale_hits"] == 10
+    assert stats["upstream_fetches"] == 2
+    assert stats["hits"] == 1
+
+
+def test_overview_thundering_herd_hits_upstream_once(monkeypatch):
+    coingecko.overview_cache.clear()
+    monkeypatch.setattr(coingecko, "market_table", MarketTable(["bitcoin"]))
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, json=[{"id": "bitcoin", "name": "Bitcoin", "symbol": "btc"}])
+
+    async def run():
+        await CoinGeckoService.startup(transport=httpx.MockTransport(handler))
+        try:
+            return await asyncio.gather(*(CoinGeckoService.get_market_overview("bitcoin") for _ in range(50)))
+        finally:
+            await CoinGeckoService.shutdown()
+
+    before = CoinGeckoService.cache_stats()["overview"]["coalesced"]
+    results = asyncio.run(run())
+    assert len(requests) == 1
+    assert all(r["symbol"] == "BTC" for r in results)
+    assert CoinGeckoService.cache_stats()["overview"]["coalesced"] - before == 49
+    coingecko.overview_cache.clear()
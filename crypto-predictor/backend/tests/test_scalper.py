@@ -1,7 +1,12 @@
+import asyncio
+import time
+from unittest.mock import patch
+import numpy as np
 import pytest
 import pandas as pd
 import pandas_ta as ta
-from services.scalper_service import ScalperService
+from services.scalper_service import CANDLE_MS, ScalperService
+from services.scalper_strategy import EmaRsiCrossStrategy
 
 def test_scalper_strategy_logic():
     # Create mock OHLCV data that simulates a crossover
@@ -26,3 +31,170 @@ def test_scalper_singleton():
     s2 = ScalperService()
     assert s1 is s2
     assert s1.is_running is False
+
+def make_closes(n=300, seed=3):
+    rng = np.random.default_rng(seed)
+    return list(100 + np.cumsum(rng.normal(0, 1, n)))
+
+def test_incremental_strategy_matches_full_recompute():
+    closes = make_closes()
+    strategy = EmaRsiCrossStrategy()
+    signals = [strategy.update(c) for c in closes]
+
+    df = pd.DataFrame({'close': closes})
+    fast, slow, rsi = ta.ema(df['close'], length=9), ta.ema(df['close'], length=21), ta.rsi(df['close'], length=14)
+    expected = [None]
+    for i in range(1, len(closes)):
+        if fast[i - 1] <= slow[i - 1] and fast[i] > slow[i] and rsi[i] > 50:
+            expected.append("buy")
+        elif fast[i - 1] >= slow[i - 1] and fast[i] < slow[i] and rsi[i] < 50:
+            expected.append("sell")
+        else:
+            expected.append(None)
+    assert signals == expected
+    assert any(signals)
+    assert strategy.ema_fast == pytest.approx(fast.iloc[-1])
+    assert strategy.rsi == pytest.approx(rsi.iloc[-1])
+
+
+class FakeExchange:
+    """ccxt-like exchange serving 1m candles that end with the still forming one."""
+    id = "fakex"
+    rateLimit = 1
+
+    def __init__(self, count=100):
+        self.now = int(time.time() * 1000) // CANDLE_MS * CANDLE_MS
+        self.closes = make_closes(count)
+        self.calls = []
+
+    def candles(self):
+        start = self.now - (len(self.closes) - 1) * CANDLE_MS
+        return [[start + i * CANDLE_MS, c, c + 1, c - 1, c, 10.0] for i, c in enumerate(self.closes)]
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None):
+        self.calls.append((symbol, since))
+        rows = [r for r in self.candles() if since is None or r[0] >= since]
+        return rows[-limit:] if limit else rows
+
+
+class FakeExchangeService:
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self.closed = False
+
+    def stream_client(self):
+        return None
+
+    async def close(self):
+        self.closed = True
+
+
+def test_engine_runs_many_sessions_incrementally():
+    exchange = FakeExchange()
+    service = FakeExchangeService(exchange)
+    symbols = [f"COIN{i}/USDT" for i in range(200)]
+
+    async def run():
+        scalper = ScalperService()
+        started = scalper.start(service, symbols)
+        assert len(started) == 200 and scalper.is_running
+        # A symbol already running is not started twice
+        assert scalper.start(service, symbols[:1]) == []
+        # First round, paced by the exchange rate limit
+        sessions = scalper.sessions
+        for _ in range(100):
+            if len(exchange.calls) == 200:
+                break
+            await asyncio.sleep(0.02)
+        # The forming candle is left out
+        assert all(s.candles_processed == 99 for s in sessions.values())
+        assert all(since is None for _, since in exchange.calls)
+
+        # Next round: only candles after the last one seen are requested and folded
+        exchange.calls.clear()
+        exchange.closes.append(exchange.closes[-1] + 1)
+        exchange.now += CANDLE_MS
+        group = next(iter(scalper._groups.values()))
+        await scalper._poll(group)
+        assert {since for _, since in exchange.calls} == {exchange.now - CANDLE_MS}
+        assert all(s.candles_processed == 100 for s in sessions.values())
+
+        scalper.stop(f"fakex:{symbols[0]}")
+        assert len(scalper.sessions) == 199
+        scalper.stop()
+        await asyncio.sleep(0)
+        assert not scalper.is_running
+        assert scalper.get_status()["sessions"] == []
+
+    # Candle times are checked against the wall clock; pin it to the fake exchange's
+    with patch("services.scalper_service.time.time", side_effect=lambda: (exchange.now + 1000) / 1000):
+        asyncio.run(run())
+    assert service.closed
+
+
+def test_ring_buffer_keeps_the_newest_items():
+    from services.ring_buffer import RingBuffer
+    buffer = RingBuffer(3)
+    seqs = [buffer.append(i) for i in range(5)]
+    assert seqs == [1, 2, 3, 4, 5] and len(buffer) == 3
+    assert buffer.items() == [2, 3, 4]
+    assert buffer.items(since=3) == [3, 4]
+    assert buffer.items(limit=2) == [3, 4]
+    assert buffer.entries(since=5) == []
+
+
+def test_status_pages_with_a_cursor():
+    from services.scalper_coordinator import _page
+    from services.scalper_service import MAX_LOGS, ScalperSession
+    session = ScalperSession("fakex", "BTC/USDT")
+    candles = FakeExchange(count=300).candles()
+    for candle in candles[:200]:
+        session.on_candles([candle])
+    # Bounded however long it runs
+    assert len(session.logs) == MAX_LOGS and len(session.trades.items()) <= 100
+
+    status = session.status()
+    assert len(status["logs"]) == 20
+    cursor = max(e["seq"] for e in status["events"])
+    assert status["events"][-1]["event"] == "tick" and status["logs"][-1].endswith(
+        f"RSI: {session.strategy.rsi:.2f}")
+
+    for candle in candles[200:203]:
+        session.on_candles([candle])
+    newer = session.status(since=cursor)
+    assert [e["event"] for e in newer["events"]][:1] == ["tick"]
+    assert all(e["seq"] > cursor for e in newer["events"]) and len(newer["events"]) >= 3
+    assert all(t.seq > cursor for t in newer["recent_trades"])
+
+    # Followers page the status the leader published the same way
+    published = {**status, "recent_trades": [t.model_dump() for t in status["recent_trades"]], "sessions": []}
+    paged = _page(published, cursor - 5)
+    assert [e["seq"] for e in paged["events"]] == [e["seq"] for e in status["events"] if e["seq"] > cursor - 5]
+    assert paged["logs"] == [e["message"] for e in paged["events"]]
+
+
+def test_status_logs_include_session_events():
+    class FailingExchange(FakeExchange):
+        async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None):
+            raise ConnectionError("exchange unreachable")
+
+    async def run():
+        scalper = ScalperService()
+        # The engine is a singleton: only look at what this test logs
+        cursor = scalper.get_status()["cursor"]
+        scalper.start(FakeExchangeService(FakeExchange()), ["BTC/USDT"])
+        group = next(iter(scalper._groups.values()))
+        session = scalper.sessions["fakex:BTC/USDT"]
+        await scalper._fetch(group, session)
+        group.exchange_service.exchange = FailingExchange()
+        await scalper._fetch(group, session)
+        status = scalper.get_status(since=cursor)
+        scalper.stop()
+        return status
+
+    status = asyncio.run(run())
+    # Top-level logs are what the dashboard terminal shows: ticks and errors as well as engine events
+    events = [e["event"] for e in status["events"]]
+    assert events[0] == "started" and "tick" in events and events[-1] == "error"
+    assert [e["seq"] for e in status["events"]] == sorted(e["seq"] for e in status["events"])
+    assert status["logs"][-1].endswith("Error in scalper loop: exchange unreachable")
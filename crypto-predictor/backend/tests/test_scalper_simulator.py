@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services import scalper_simulator
+from services.candle_store import CandleStore
+from services.scalper_service import CANDLE_MS, ScalperSession
+from services.scalper_simulator import ScalperSimulator, load_candles
+from tests.candles import make_candles
+
+
+def test_replay_emits_the_live_sessions_signals():
+    candles = make_candles(3000, seed=5, interval=CANDLE_MS)
+    result = ScalperSimulator.run(candles, symbol="BTC/USDT")
+
+    session = ScalperSession("sim", "BTC/USDT")
+    live = []
+    rows = np.column_stack([candles[c] for c in ('time', 'open', 'high', 'low', 'close', 'volume')]).tolist()
+    for row in rows:
+        live += session.on_candles([row])
+    assert result["trade_signals"] == [s.model_copy(update={"seq": None}) for s in live]
+    assert result["signals"] == len(live) > 10
+    assert len(result["equity"]) == len(rows)
+
+
+class ScriptedStrategy:
+    """Buys on the close of candle 1 and sells on the close of candle 3."""
+    script = {1: "buy", 3: "sell"}
+
+    def __init__(self, *args):
+        self.i = -1
+
+    def update(self, close):
+        self.i += 1
+        return self.script.get(self.i)
+
+
+def test_fills_at_next_open_with_fee_and_slippage(monkeypatch):
+    monkeypatch.setattr(scalper_simulator, "EmaRsiCrossStrategy", ScriptedStrategy)
+    candles = {
+        'time': np.arange(5) * CANDLE_MS,
+        'open': np.array([10.0, 10.0, 11.0, 12.0, 14.0]),
+        'close': np.array([10.0, 10.5, 11.5, 13.0, 15.0]),
+    }
+    result = ScalperSimulator.run(candles, fee=0.01, slippage=0.02)
+
+    buy_price = 11.0 * 1.02
+    units = 10_000 / (buy_price * 1.01)
+    sell_price = 14.0 * 0.98
+    final = units * sell_price * 0.99
+    assert result["fills"] == 2 and result["round_trips"] == 1 and result["win_rate"] == 1.0
+    assert result["final_equity"] == pytest.approx(final, rel=1e-6)
+    assert result["fees_paid"] == pytest.approx(units * buy_price * 0.01 + units * sell_price * 0.01, rel=1e-6)
+    equity = result["equity"]["equity"].to_numpy()
+    # Marked to the close while long, flat after the exit
+    assert equity[2] == pytest.approx(units * 11.5)
+    assert equity[4] == pytest.approx(final)
+    assert [s.side for s in result["trade_signals"]] == ["buy", "sell"]
+
+
+def test_parallel_sweep_matches_single_runs():
+    candles = make_candles(2000, seed=5, interval=CANDLE_MS)
+    params = ScalperSimulator.grid(fast=[5, 9], slow=[9, 21])
+    assert {(p["fast"], p["slow"]) for p in params} == {(5, 9), (5, 21), (9, 21)}
+
+    results = ScalperSimulator.sweep(candles, params, workers=2, fee=0.0005)
+    assert [r["total_return"] for r in results] == sorted((r["total_return"] for r in results), reverse=True)
+    for r in results:
+        single = ScalperSimulator.run(candles, **r["params"], fee=0.0005, record=False)
+        assert r == single
+
+
+def test_loads_csv_and_candle_store_series(tmp_path):
+    candles = make_candles(50, seed=5, interval=CANDLE_MS)
+    df = pd.DataFrame(candles)
+    df.iloc[::-1].to_csv(tmp_path / "candles.csv", index=False)
+    store = CandleStore(str(tmp_path / "store"))
+    store.upsert(("BTC", "USDT", "1m"), df)
+
+    for path in (str(tmp_path / "candles.csv"), store._series_dir(("BTC", "USDT", "1m"))):
+        loaded = load_candles(path)
+        for column, values in candles.items():
+            np.testing.assert_allclose(loaded[column], values, rtol=1e-12)
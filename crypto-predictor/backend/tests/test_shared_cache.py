@@ -0,0 +1,255 @@
+import asyncio
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from services.exchange_service import ExchangePool
+from services.scalper_coordinator import ScalperCoordinator, ScalperCommandError
+from services.shared_cache import (
+    FileSharedStore, RedisSharedStore, SharedCache, SharedStore, decode_value, encode_value,
+)
+
+
+def make_frame(n=500):
+    return pd.DataFrame({
+        'time': np.arange(n, dtype=np.int64) * 60_000,
+        'open': np.linspace(1, 2, n),
+        'close': np.linspace(2, 1, n),
+        'volume': np.full(n, np.nan),
+    })
+
+
+def test_frame_round_trips_as_column_buffers():
+    df = make_frame()
+    data = encode_value(df)
+    # Header plus raw buffers: no per-value encoding
+    assert len(data) < df.memory_usage(index=False).sum() + 200
+    decoded = decode_value(data)
+    pd.testing.assert_frame_equal(decoded, df)
+    assert decode_value(encode_value({"price": 1.5, "name": "Bitcoin"})) == {"price": 1.5, "name": "Bitcoin"}
+
+
+def run_store_contract(store):
+    async def run():
+        assert await store.get("k") is None
+        await store.set("k", b"v", ttl=0.2)
+        assert await store.get("k") == b"v"
+        assert not await store.add("k", b"other", ttl=1)
+        await asyncio.sleep(0.3)
+        # Expired: gone, and free to add again
+        assert await store.get("k") is None
+        assert await store.add("k", b"other", ttl=1)
+        assert await store.get("k") == b"other"
+        # Compare-and-set only replaces the expected value
+        assert not await store.replace("k", b"v", b"new", ttl=1)
+        assert await store.replace("k", b"other", b"new", ttl=1)
+        assert await store.get("k") == b"new"
+        # Compare-and-delete only deletes the expected value
+        assert not await store.discard("k", b"other")
+        assert await store.discard("k", b"new")
+        assert await store.get("k") is None
+        await store.set("k", b"v")
+        await store.delete("k")
+        assert await store.get("k") is None
+        assert not await store.replace("k", b"new", b"newer", ttl=1)
+    asyncio.run(run())
+
+
+def test_file_store(tmp_path):
+    run_store_contract(FileSharedStore(str(tmp_path)))
+
+
+def test_store_backends_must_implement_every_operation():
+    class Partial(SharedStore):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_file_store_deletes_expired_entries(tmp_path):
+    root = tmp_path / "store"
+    store = FileSharedStore(str(root))
+
+    async def run():
+        await store.set("read", b"v", ttl=0.05)
+        await store.set("swept", b"v", ttl=0.05)
+        await store.set("kept", b"v", ttl=60)
+        await store.set("forever", b"v")
+        await asyncio.sleep(0.1)
+        assert await store.get("read") is None
+        assert len(os.listdir(root)) == 3
+        assert await store.sweep() == 1
+        assert sorted(os.listdir(root)) == sorted(
+            os.path.basename(store._path(key)) for key in ("kept", "forever"))
+
+    asyncio.run(run())
+
+
+def test_redis_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    # fakeredis runs the Lua compare-and-delete with lupa
+    pytest.importorskip("lupa")
+    run_store_contract(RedisSharedStore(client=fakeredis.FakeAsyncRedis()))
+
+
+def test_workers_sharing_a_store_load_once(tmp_path):
+    # Two SharedCache instances over one directory stand in for two worker processes
+    workers = [SharedCache(FileSharedStore(str(tmp_path))) for _ in range(2)]
+    loads = 0
+
+    async def load(lock):
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.05)
+        return make_frame(10)
+
+    async def run():
+        return await asyncio.gather(*(w.get_or_load("ohlcv_bitcoin_7_usd", 60, load) for w in workers * 3))
+
+    frames = asyncio.run(run())
+    assert loads == 1
+    for df in frames:
+        pd.testing.assert_frame_equal(df, make_frame(10))
+
+
+def test_lock_is_released_and_expires(tmp_path):
+    store = FileSharedStore(str(tmp_path))
+
+    async def run():
+        async with store.lock("series", ttl=0.2) as first:
+            assert first
+            async with store.lock("series", wait=0.05) as second:
+                # Held by someone else: proceeds without it
+                assert not second
+            started = time.monotonic()
+            async with store.lock("series", wait=1) as third:
+                # Taken over once the holder's ttl ran out
+                assert third
+                assert time.monotonic() - started < 0.5
+        async with store.lock("series", wait=0) as fourth:
+            assert fourth
+
+    asyncio.run(run())
+
+
+def test_expired_holder_neither_writes_nor_releases_the_new_holders_lock(tmp_path):
+    store = FileSharedStore(str(tmp_path))
+
+    async def run():
+        second = store.lock("series", wait=0)
+        async with store.lock("series", ttl=0.1) as first:
+            await asyncio.sleep(0.15)
+            # The first holder's ttl ran out and another worker took the lock over
+            assert await second.__aenter__()
+            assert not await first.renew()
+        # The first holder's release left the new holder's lock in place
+        async with store.lock("series", wait=0) as third:
+            assert not third
+        await second.__aexit__(None, None, None)
+
+    asyncio.run(run())
+
+
+class FakeScalper:
+    def __init__(self):
+        self.is_running = False
+        self.symbol = None
+
+    def start(self, exchange_service, symbols):
+        self.is_running = True
+        self.symbol = symbols[0]
+
+    def stop(self, session_id=None):
+        self.is_running = False
+
+    def get_status(self, since=None):
+        return {"is_running": self.is_running, "symbol": self.symbol, "recent_trades": [], "logs": [], "events": [],
+                "sessions": [], "cursor": 0}
+
+
+def test_scalper_is_pinned_to_one_worker(tmp_path, monkeypatch):
+    from services import scalper_coordinator as coordination
+
+    class FakeExchange:
+        def __init__(self, exchange_id, **kwargs):
+            if exchange_id == "bogus":
+                raise ValueError("unknown exchange")
+
+        async def load_markets(self):
+            return {}
+
+        async def get_balance(self):
+            return 100.0
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(coordination, "exchange_pool", ExchangePool(factory=FakeExchange))
+    commands = []
+
+    class RecordingStore(FileSharedStore):
+        async def add(self, key, value, ttl=None):
+            if key == coordination.COMMAND_KEY:
+                commands.append(value)
+            return await super().add(key, value, ttl)
+
+    store = RecordingStore(str(tmp_path))
+    leader, follower = (ScalperCoordinator(store, FakeScalper(), poll=0.01, timeout=2) for _ in range(2))
+    config = {"exchange_id": "binance", "api_key": "my-api-key", "secret": "my-secret", "passphrase": "my-phrase"}
+
+    async def run():
+        await leader.start()
+        await follower.start()
+        assert leader.is_leader and not follower.is_leader
+
+        status = await follower.start_scalper(config, ["ETH/USDT"])
+        assert status["is_running"] and status["symbol"] == "ETH/USDT"
+        # Only the leader's scalper runs
+        assert leader.scalper.is_running and not follower.scalper.is_running
+        # Credentials went through the store sealed to the leader's key
+        assert commands and not any(secret in command for command in commands
+                                    for secret in (b"my-api-key", b"my-secret", b"my-phrase"))
+        await asyncio.sleep(0.05)
+        assert (await follower.status())["symbol"] == "ETH/USDT"
+
+        with pytest.raises(ScalperCommandError):
+            await follower.start_scalper({**config, "exchange_id": "bogus"}, ["ETH/USDT"])
+
+        # A lease that another worker took over is not renewed
+        await store.set(coordination.LEADER_KEY, b"someone-else 00", 10)
+        leader._renewed = 0
+        assert not await leader.elect()
+        await store.set(coordination.LEADER_KEY, leader._lease, 10)
+        leader._renewed = 0
+        leader.is_leader = True
+        assert await leader.elect()
+
+        # Leader shuts down: the follower takes over
+        await leader.stop()
+        await asyncio.sleep(0.05)
+        assert follower.is_leader
+        assert not (await follower.stop_scalper())["is_running"]
+        await follower.stop()
+
+    asyncio.run(run())
+
+
+def test_failed_relayed_commands_map_to_400(monkeypatch):
+    from fastapi.testclient import TestClient
+    from main import app
+    from routers import trading
+
+    async def fail(*args):
+        raise ScalperCommandError("Unknown session")
+
+    monkeypatch.setattr(trading.scalper_coordinator, "stop_scalper", fail)
+    monkeypatch.setattr(trading.scalper_coordinator, "start_scalper", fail)
+    client = TestClient(app)
+
+    stopped = client.post("/api/trading/stop")
+    assert stopped.status_code == 400 and "Unknown session" in stopped.json()["detail"]
+    started = client.post("/api/trading/start", json={"exchange_id": "binance", "api_key": "k", "secret": "s"})
+    assert started.status_code == 400
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from services.ohlcv_encoding import OHLCVEncoder
+from services.stream_hub import StreamHub, stream_hub
+
+
+def make_state(n, last_close=100.0, signal="BUY"):
+    df = pd.DataFrame({
+        'time': np.arange(n) * 3_600_000,
+        'open': np.full(n, 100.0),
+        'high': np.full(n, 101.0),
+        'low': np.full(n, 99.0),
+        'close': np.full(n, 100.0),
+        'volume': np.full(n, 10.0),
+        'RSI': np.r_[np.nan, np.full(n - 1, 50.0)],
+    })
+    df.loc[n - 1, 'close'] = last_close
+    prediction = {
+        "overall_signal": signal,
+        "predicted_direction": "UP",
+        "signals": [{"indicator": "RSI (14)", "signal": signal}],
+    }
+    return {"symbol": "BTC", "candles": OHLCVEncoder.columns(df), "prediction": prediction, "overview": {"price": last_close}}
+
+
+def test_diff_reports_only_changed_candles_and_flips():
+    topic = ("bitcoin", 30)
+    previous = make_state(10)
+
+    assert StreamHub.diff(topic, previous, make_state(10)) is None
+
+    # Newest candle updated and one new candle appended
+    current = make_state(11, last_close=105.0, signal="SELL")
+    current["candles"]["close"] = current["candles"]["close"].copy()
+    current["candles"]["close"][9] = 103.0
+    delta = StreamHub.diff(topic, previous, current)
+
+    assert delta["type"] == "delta"
+    assert list(delta["candles"]["time"]) == [9 * 3_600_000, 10 * 3_600_000]
+    assert list(delta["candles"]["close"]) == [103.0, 105.0]
+    assert "start" not in delta
+    assert delta["overview"] == {"price": 105.0}
+    assert {"indicator": "overall_signal", "from": "BUY", "to": "SELL"} in delta["signal_flips"]
+    assert {"indicator": "RSI (14)", "from": "BUY", "to": "SELL"} in delta["signal_flips"]
+
+
+def test_one_computation_per_topic_fanned_out_to_all_subscribers():
+    computed = []
+
+    async def compute(topic):
+        computed.append(topic)
+        return make_state(5, last_close=100.0 + len(computed))
+
+    hub = StreamHub(compute=compute, interval=0.02)
+
+    async def run():
+        queues = [asyncio.Queue(maxsize=100) for _ in range(5)]
+        for q in queues[:4]:
+            hub.subscribe(("bitcoin", 30), q)
+        hub.subscribe(("ethereum", 30), queues[4])
+        await asyncio.sleep(0.09)
+        stats = hub.stats()
+        # A late subscriber gets the current state straight away
+        late = asyncio.Queue(maxsize=100)
+        hub.subscribe(("bitcoin", 30), late)
+        late_first = late.get_nowait()
+        await hub.close()
+        return queues, stats, late_first
+
+    queues, stats, late_first = asyncio.run(run())
+
+    bitcoin_runs = computed.count(("bitcoin", 30))
+    assert stats["topics"] == 2 and stats["subscribers"] == 5
+    assert bitcoin_runs < 10  # independent of the four subscribers
+    for q in queues[:4]:
+        messages = [json.loads(q.get_nowait()) for _ in range(q.qsize())]
+        assert messages[0]["type"] == "snapshot"
+        assert len(messages[0]["candles"]["time"]) == 5
+        assert messages[0]["candles"]["rsi"][0] is None
+        assert all(m["type"] == "delta" and len(m["candles"]["time"]) == 1 for m in messages[1:])
+    assert json.loads(late_first)["type"] == "snapshot"
+
+
+def test_slow_subscriber_is_resynced_with_snapshot():
+    version = [0]
+
+    async def compute(topic):
+        version[0] += 1
+        return make_state(5, last_close=100.0 + version[0])
+
+    hub = StreamHub(compute=compute, interval=0.01)
+
+    async def run():
+        slow = asyncio.Queue(maxsize=1)
+        hub.subscribe(("bitcoin", 30), slow)
+        await asyncio.sleep(0.05)
+        slow.get_nowait()  # the initial snapshot; later deltas were dropped
+        await asyncio.sleep(0.03)
+        message = json.loads(slow.get_nowait())
+        await hub.close()
+        return message
+
+    message = asyncio.run(run())
+    assert message["type"] == "snapshot"
+    assert hub.resyncs > 0
+
+
+def test_websocket_subscribe(monkeypatch):
+    from main import app
+
+    async def compute(topic):
+        return make_state(3)
+
+    monkeypatch.setattr(stream_hub, "_compute", compute)
+    with TestClient(app) as client:
+        with client.websocket_connect("/api/stream") as ws:
+            ws.send_text(json.dumps({"action": "subscribe", "coin_id": "bitcoin", "days": 7}))
+            message = ws.receive_json()
+            assert message["type"] == "snapshot"
+            assert message["topic"] == {"coin_id": "bitcoin", "days": 7}
+            assert message["symbol"] == "BTC"
+
+            ws.send_text("not json")
+            assert ws.receive_json()["type"] == "error"
+    assert stream_hub.stats()["topics"] == 0
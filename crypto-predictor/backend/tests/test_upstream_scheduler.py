@@ -0,0 +1,144 @@
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from services.coingecko import CoinGeckoService
+from services.upstream_scheduler import (
+    Priority, UpstreamRateLimited, UpstreamScheduler, count_upstream_calls, upstream_priority,
+)
+
+
+class ThrottlingUpstream:
+    """Fake upstream that answers the first `throttle` requests with 429."""
+
+    def __init__(self, throttle: int, retry_after: str = None):
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.times = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.times.append(time.monotonic())
+        if len(self.times) <= self.throttle:
+            headers = {"Retry-After": self.retry_after} if self.retry_after else {}
+            return httpx.Response(429, headers=headers)
+        return httpx.Response(200, json={"ok": True})
+
+
+def _send(scheduler: UpstreamScheduler, upstream: ThrottlingUpstream):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(upstream.handler), base_url="http://upstream") as client:
+            return await scheduler.request(client, "GET", "/coins/bitcoin")
+    return asyncio.run(run())
+
+
+def test_retry_after_is_honoured():
+    scheduler = UpstreamScheduler(calls_per_minute=6000, burst=10, max_retries=3)
+    upstream = ThrottlingUpstream(throttle=2, retry_after="0.05")
+
+    with count_upstream_calls() as calls:
+        response = _send(scheduler, upstream)
+
+    assert response.status_code == 200
+    assert len(upstream.times) == 3
+    # Retries are upstream calls too
+    assert calls[0] == 3
+    assert all(b - a >= 0.045 for a, b in zip(upstream.times, upstream.times[1:]))
+    stats = scheduler.stats()
+    assert stats["throttled"] == 2
+    assert stats["retries"] == 2
+
+
+def test_persistent_throttling_raises_after_exponential_backoff():
+    scheduler = UpstreamScheduler(calls_per_minute=6000, burst=10, max_retries=2, backoff_base=0.02)
+    upstream = ThrottlingUpstream(throttle=100)
+
+    with pytest.raises(UpstreamRateLimited) as exc:
+        _send(scheduler, upstream)
+
+    assert len(upstream.times) == 3
+    gaps = [b - a for a, b in zip(upstream.times, upstream.times[1:])]
+    # Jittered delays of base * 2**attempt, between half and the full value
+    assert gaps[0] >= 0.01 and gaps[1] >= 0.02
+    assert exc.value.retry_after > 0
+
+
+def test_retry_after_beyond_backoff_max_fails_fast():
+    scheduler = UpstreamScheduler(calls_per_minute=6000, burst=10, max_retries=3, backoff_max=5)
+    upstream = ThrottlingUpstream(throttle=100, retry_after="120")
+
+    with pytest.raises(UpstreamRateLimited) as exc:
+        _send(scheduler, upstream)
+
+    assert len(upstream.times) == 1
+    assert exc.value.retry_after == 120
+    assert scheduler.stats()["paused_for"] > 100
+
+
+def test_token_bucket_limits_rate():
+    scheduler = UpstreamScheduler(calls_per_minute=1200, burst=2)  # 20 per second
+
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(*(scheduler.acquire(Priority.INTERACTIVE) for _ in range(6)))
+        return time.monotonic() - started
+
+    # Two from the burst, then four more at 50ms each
+    assert asyncio.run(run()) >= 0.19
+    assert scheduler.stats()["granted"]["INTERACTIVE"] == 6
+
+
+def test_interactive_requests_jump_the_queue():
+    scheduler = UpstreamScheduler(calls_per_minute=1200, burst=1)
+    order = []
+
+    async def call(name, priority):
+        await scheduler.acquire(priority)
+        order.append(name)
+
+    async def run():
+        await scheduler.acquire(Priority.INTERACTIVE)  # drain the bucket
+        batch = [asyncio.ensure_future(call(f"batch{i}", Priority.BATCH)) for i in range(3)]
+        prefetch = asyncio.ensure_future(call("prefetch", Priority.PREFETCH))
+        await asyncio.sleep(0.01)
+        depth = scheduler.stats()["queue_depth"]
+        with upstream_priority(Priority.INTERACTIVE):
+            interactive = asyncio.ensure_future(call("interactive", Priority.INTERACTIVE))
+        await asyncio.gather(*batch, prefetch, interactive)
+        return depth
+
+    depth = asyncio.run(run())
+    assert depth == {"INTERACTIVE": 0, "PREFETCH": 1, "BATCH": 3}
+    assert order == ["interactive", "prefetch", "batch0", "batch1", "batch2"]
+    assert scheduler.stats()["max_wait_ms"]["BATCH"] > 0
+
+
+def test_full_queue_is_rejected():
+    scheduler = UpstreamScheduler(calls_per_minute=60, burst=1, max_queue=2)
+
+    async def run():
+        await scheduler.acquire(Priority.INTERACTIVE)
+        waiting = [asyncio.ensure_future(scheduler.acquire(Priority.BATCH)) for _ in range(2)]
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(UpstreamRateLimited):
+                await scheduler.acquire(Priority.BATCH)
+        finally:
+            for task in waiting:
+                task.cancel()
+
+    asyncio.run(run())
+    assert scheduler.rejected == 1
+
+
+def test_rate_limited_upstream_maps_to_503(monkeypatch):
+    from main import app
+
+    async def throttled(coin_id):
+        raise UpstreamRateLimited("Upstream returned 429", retry_after=12.3)
+
+    monkeypatch.setattr(CoinGeckoService, "get_market_overview", staticmethod(throttled))
+    response = TestClient(app).get("/api/market/overview", params={"coin_id": "bitcoin"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "13"
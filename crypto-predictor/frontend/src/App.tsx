@@ -12,10 +12,12 @@ import { useAppStore } from './store/appStore'
 import { clsx } from 'clsx'
 import { useOHLCV } from './hooks/useMarketData'
 import { usePrediction } from './hooks/usePrediction'
+import { useMarketStream } from './hooks/useMarketStream'
 import { Activity, Clock, ShieldAlert, Zap } from 'lucide-react'
 
 const App: React.FC = () => {
   const { selectedCoin, selectedTimeframe } = useAppStore()
+  useMarketStream(selectedCoin, selectedTimeframe)
   const { data: ohlcvData, isLoading: isLoadingOHLCV } = useOHLCV(selectedCoin, selectedTimeframe)
   const { data: predictionData, isLoading: isLoadingPrediction } = usePrediction(selectedCoin)
 
@@ -1,24 +1,32 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import axios from 'axios'
 import { useAppStore } from '../store/appStore'
 import { Play, Square, Key, ShieldCheck, Terminal as TerminalIcon } from 'lucide-react'
 import { clsx } from 'clsx'
 
 export const ScalperPanel: React.FC = () => {
-  const { isScalperRunning, setScalperRunning, scalperLogs, setScalperLogs } = useAppStore()
+  const { isScalperRunning, setScalperRunning, scalperLogs, setScalperLogs, appendScalperLogs } = useAppStore()
   const [exchangeId, setExchangeId] = useState('binance')
   const [apiKey, setApiKey] = useState('')
   const [secret, setSecret] = useState('')
   const [testnet, setTestnet] = useState(true)
   const [symbol, setSymbol] = useState('BTC/USDT')
+  // Cursor of the last status: each poll only fetches the logs added since
+  const cursor = useRef<number | null>(null)
 
   useEffect(() => {
     let interval: any;
     if (isScalperRunning) {
       interval = setInterval(async () => {
         try {
-          const { data } = await axios.get('/api/trading/status')
-          setScalperLogs(data.logs)
+          const since = cursor.current
+          const { data } = await axios.get('/api/trading/status', { params: since === null ? {} : { since } })
+          if (since === null) {
+            setScalperLogs(data.logs)
+          } else {
+            appendScalperLogs(data.logs)
+          }
+          cursor.current = data.cursor
           setScalperRunning(data.is_running)
         } catch (e) {
           console.error("Failed to fetch scalper status", e)
@@ -38,6 +46,7 @@ export const ScalperPanel: React.FC = () => {
       }, { params: { symbol } })
       setScalperRunning(true)
       setScalperLogs(data.status.logs)
+      cursor.current = data.status.cursor
     } catch (e: any) {
       alert(e.response?.data?.detail || "Failed to start scalper")
     }
@@ -8,6 +8,7 @@ const TIMEFRAMES = [
   { label: '14D', value: '14' },
   { label: '30D', value: '30' },
   { label: '90D', value: '90' },
+  { label: '1Y', value: '365' },
 ]
 
 export const TimeframeSelector: React.FC = () => {
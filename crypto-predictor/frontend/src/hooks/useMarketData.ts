@@ -1,23 +1,29 @@
 import { useQuery } from '@tanstack/react-query'
 import axios from 'axios'
 import { MarketOHLCVResponse, MarketOverviewResponse } from '../types'
+import { useAppStore } from '../store/appStore'
 
 const API_BASE = '/api'
+// Longer windows are downsampled by the server to about what the chart can draw
+const MAX_CHART_POINTS = 500
 
 export const useOHLCV = (coinId: string, days: string) => {
+  const streamConnected = useAppStore((state) => state.streamConnected)
   return useQuery<MarketOHLCVResponse>({
     queryKey: ['ohlcv', coinId, days],
     queryFn: async () => {
       const { data } = await axios.get(`${API_BASE}/market/ohlcv`, {
-        params: { coin_id: coinId, days }
+        params: { coin_id: coinId, days, max_points: MAX_CHART_POINTS }
       })
       return data
     },
-    refetchInterval: 60000,
+    // Updates are pushed over /api/stream while it is connected
+    refetchInterval: streamConnected ? false : 60000,
   })
 }
 
 export const useMarketOverview = (coinId: string) => {
+  const streamConnected = useAppStore((state) => state.streamConnected)
   return useQuery<MarketOverviewResponse>({
     queryKey: ['overview', coinId],
     queryFn: async () => {
@@ -26,6 +32,7 @@ export const useMarketOverview = (coinId: string) => {
       })
       return data
     },
-    refetchInterval: 60000,
+    // Updates are pushed over /api/stream while it is connected
+    refetchInterval: streamConnected ? false : 60000,
   })
 }
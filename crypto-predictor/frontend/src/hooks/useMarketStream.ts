@@ -0,0 +1,91 @@
+import { useEffect } from 'react'
+import { useQueryClient } from '@tanstack/react-query'
+import { MarketOHLCVResponse, OHLCVColumns, OHLCVData, StreamMessage } from '../types'
+import { useAppStore } from '../store/appStore'
+
+const STREAM_URL = `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${window.location.host}/api/stream`
+const MAX_RECONNECT_DELAY = 30000
+
+const toRows = (columns: OHLCVColumns): OHLCVData[] =>
+  columns.time.map((_, i) => {
+    const row = {} as Record<string, number | undefined>
+    for (const field of Object.keys(columns) as (keyof OHLCVData)[]) {
+      row[field] = columns[field][i] ?? undefined
+    }
+    return row as unknown as OHLCVData
+  })
+
+// Replaces updated candles, appends new ones and drops those that slid out of the window
+const mergeCandles = (prices: OHLCVData[], updates: OHLCVData[], start?: number): OHLCVData[] => {
+  const byTime = new Map<number, OHLCVData>()
+  for (const candle of prices) {
+    if (start === undefined || candle.time >= start) byTime.set(candle.time, candle)
+  }
+  for (const candle of updates) byTime.set(candle.time, candle)
+  return Array.from(byTime.values()).sort((a, b) => a.time - b.time)
+}
+
+/**
+ * Subscribes to server-pushed candles, indicators, predictions and overview for one
+ * coin and writes them into the react-query cache used by useOHLCV, usePrediction and
+ * useMarketOverview. Those hooks stop polling while the stream is connected.
+ */
+export const useMarketStream = (coinId: string, days: string) => {
+  const queryClient = useQueryClient()
+  const setStreamConnected = useAppStore((state) => state.setStreamConnected)
+
+  useEffect(() => {
+    let socket: WebSocket | null = null
+    let retryTimer: ReturnType<typeof setTimeout> | undefined
+    let attempts = 0
+    let closed = false
+
+    const apply = (message: StreamMessage) => {
+      if (message.type === 'error') {
+        console.warn('Market stream:', message.detail)
+        return
+      }
+      const ohlcvKey = ['ohlcv', coinId, days]
+      if (message.type === 'snapshot') {
+        queryClient.setQueryData<MarketOHLCVResponse>(ohlcvKey, { symbol: message.symbol, prices: toRows(message.candles) })
+        queryClient.setQueryData(['prediction', coinId], message.prediction)
+        queryClient.setQueryData(['overview', coinId], message.overview)
+        return
+      }
+      if (message.candles || message.start !== undefined) {
+        const updates = message.candles ? toRows(message.candles) : []
+        queryClient.setQueryData<MarketOHLCVResponse>(ohlcvKey, (current) =>
+          current && { ...current, prices: mergeCandles(current.prices, updates, message.start) }
+        )
+      }
+      if (message.prediction) queryClient.setQueryData(['prediction', coinId], message.prediction)
+      if (message.overview) queryClient.setQueryData(['overview', coinId], message.overview)
+    }
+
+    const connect = () => {
+      socket = new WebSocket(STREAM_URL)
+      socket.onopen = () => {
+        attempts = 0
+        setStreamConnected(true)
+        socket?.send(JSON.stringify({ action: 'subscribe', coin_id: coinId, days: Number(days) }))
+      }
+      socket.onmessage = (event) => apply(JSON.parse(event.data) as StreamMessage)
+      socket.onclose = () => {
+        // A socket closed by cleanup must not flag the next subscription as disconnected
+        if (closed) return
+        setStreamConnected(false)
+        // Fall back to polling and reconnect with exponential backoff
+        const delay = Math.min(MAX_RECONNECT_DELAY, 1000 * 2 ** attempts++)
+        retryTimer = setTimeout(connect, delay)
+      }
+    }
+
+    connect()
+    return () => {
+      closed = true
+      clearTimeout(retryTimer)
+      socket?.close()
+      setStreamConnected(false)
+    }
+  }, [coinId, days, queryClient, setStreamConnected])
+}
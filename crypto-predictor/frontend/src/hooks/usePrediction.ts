@@ -1,10 +1,12 @@
 import { useQuery } from '@tanstack/react-query'
 import axios from 'axios'
 import { PredictionResponse } from '../types'
+import { useAppStore } from '../store/appStore'
 
 const API_BASE = '/api'
 
 export const usePrediction = (coinId: string) => {
+  const streamConnected = useAppStore((state) => state.streamConnected)
   return useQuery<PredictionResponse>({
     queryKey: ['prediction', coinId],
     queryFn: async () => {
@@ -13,6 +15,7 @@ export const usePrediction = (coinId: string) => {
       })
       return data
     },
-    refetchInterval: 60000,
+    // Updates are pushed over /api/stream while it is connected
+    refetchInterval: streamConnected ? false : 60000,
   })
 }
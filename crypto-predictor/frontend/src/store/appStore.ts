@@ -5,10 +5,13 @@ interface AppState {
   selectedTimeframe: string;
   isScalperRunning: boolean;
   scalperLogs: string[];
+  streamConnected: boolean;
   setSelectedCoin: (coin: string) => void;
   setSelectedTimeframe: (timeframe: string) => void;
   setScalperRunning: (running: boolean) => void;
   setScalperLogs: (logs: string[]) => void;
+  appendScalperLogs: (logs: string[]) => void;
+  setStreamConnected: (connected: boolean) => void;
 }
 
 export const useAppStore = create<AppState>((set) => ({
@@ -16,8 +19,12 @@ export const useAppStore = create<AppState>((set) => ({
   selectedTimeframe: '30', // days
   isScalperRunning: false,
   scalperLogs: [],
+  streamConnected: false,
   setSelectedCoin: (coin) => set({ selectedCoin: coin }),
   setSelectedTimeframe: (timeframe) => set({ selectedTimeframe: timeframe }),
   setScalperRunning: (running) => set({ isScalperRunning: running }),
   setScalperLogs: (logs) => set({ scalperLogs: logs }),
+  // Keeps the terminal bounded however long the scalper runs
+  appendScalperLogs: (logs) => set((state) => ({ scalperLogs: [...state.scalperLogs, ...logs].slice(-200) })),
+  setStreamConnected: (connected) => set({ streamConnected: connected }),
 }))
@@ -55,3 +55,30 @@ export interface PredictionResponse {
   signals: SignalDetail[];
   summary: string;
 }
+
+export type OHLCVColumns = { [K in keyof OHLCVData]-?: (number | null)[] }
+
+export interface StreamTopic {
+  coin_id: string;
+  days: number;
+}
+
+export type StreamMessage =
+  | {
+      type: 'snapshot';
+      topic: StreamTopic;
+      symbol: string;
+      candles: OHLCVColumns;
+      prediction: PredictionResponse;
+      overview: MarketOverviewResponse;
+    }
+  | {
+      type: 'delta';
+      topic: StreamTopic;
+      start?: number;
+      candles?: OHLCVColumns;
+      prediction?: PredictionResponse;
+      signal_flips?: { indicator: string; from: string; to: string }[];
+      overview?: MarketOverviewResponse;
+    }
+  | { type: 'error'; topic?: StreamTopic; detail: string }